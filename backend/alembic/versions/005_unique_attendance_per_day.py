@@ -0,0 +1,75 @@
+"""Unique (employee_id, date) on attendance_logs
+
+Two concurrent confirms could insert two rows for the same employee and
+day. Existing duplicates are merged into the oldest row (earliest
+check-in, latest check-out) before the constraint is added. Status and
+confidence come from the duplicate holding that check-in, so an ALFA row
+merged with a later HADIR row does not end up as ALFA with a check-in time.
+
+Revision ID: 005_unique_attendance_per_day
+Revises: b1d189d65649
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005_unique_attendance_per_day'
+down_revision: Union[str, None] = 'b1d189d65649'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # Merge duplicate rows into the oldest one
+    duplicates = bind.execute(sa.text(
+        "SELECT employee_id, date, MIN(id), MIN(check_in_at), MAX(check_out_at) "
+        "FROM attendance_logs GROUP BY employee_id, date HAVING COUNT(*) > 1"
+    )).fetchall()
+    for employee_id, day, keep_id, check_in_at, check_out_at in duplicates:
+        # Status/confidence belong to the row that recorded the earliest check-in
+        source = bind.execute(
+            sa.text(
+                "SELECT status, confidence_score FROM attendance_logs "
+                "WHERE employee_id = :employee_id AND date = :date AND check_in_at IS NOT NULL "
+                "ORDER BY check_in_at, id LIMIT 1"
+            ),
+            {"employee_id": employee_id, "date": day}
+        ).fetchone()
+        if source is None:
+            # Nobody checked in: the kept row's status (e.g. ALFA) stays
+            source = bind.execute(
+                sa.text("SELECT status, confidence_score FROM attendance_logs WHERE id = :id"),
+                {"id": keep_id}
+            ).fetchone()
+        bind.execute(
+            sa.text(
+                "UPDATE attendance_logs SET check_in_at = :check_in_at, check_out_at = :check_out_at, "
+                "status = :status, confidence_score = :confidence_score WHERE id = :id"
+            ),
+            {
+                "check_in_at": check_in_at,
+                "check_out_at": check_out_at,
+                "status": source[0],
+                "confidence_score": source[1],
+                "id": keep_id
+            }
+        )
+        bind.execute(
+            sa.text("DELETE FROM attendance_logs WHERE employee_id = :employee_id AND date = :date AND id <> :id"),
+            {"employee_id": employee_id, "date": day, "id": keep_id}
+        )
+
+    with op.batch_alter_table('attendance_logs') as batch_op:
+        batch_op.create_unique_constraint('uq_attendance_employee_date', ['employee_id', 'date'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('attendance_logs') as batch_op:
+        batch_op.drop_constraint('uq_attendance_employee_date', type_='unique')
@@ -1,12 +1,14 @@
 """
 Redis caching utilities for performance optimization.
-Provides functions for get, set, and invalidate cache with proper error handling.
+Provides functions for get, set, and invalidate cache with proper error handling,
+plus pub/sub helpers for broadcasting change events between API nodes.
 """
 
 import redis
 import json
 import logging
-from typing import Optional, Any
+import threading
+from typing import Optional, Any, Callable
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -168,3 +170,79 @@ def get_cache_stats() -> dict:
     except Exception as e:
         logger.error(f"Error getting cache stats: {e}")
         return {"status": "error", "message": str(e)}
+
+
+def publish_message(channel: str, payload: dict) -> bool:
+    """
+    Publish a JSON message on a Redis pub/sub channel.
+
+    Args:
+        channel: Channel name
+        payload: Message body (will be JSON serialized)
+
+    Returns:
+        True if published, False otherwise
+    """
+    if not is_cache_available():
+        return False
+
+    try:
+        redis_client.publish(channel, json.dumps(payload, default=str))
+        return True
+    except Exception as e:
+        logger.error(f"Publish error on channel '{channel}': {e}")
+        return False
+
+
+def subscribe_messages(
+    channel: str,
+    handler: Callable[[dict], None],
+    stop_event: threading.Event,
+    reconnect_delay: float = 5.0
+) -> Optional[threading.Thread]:
+    """
+    Listen on a Redis pub/sub channel in a background daemon thread.
+
+    Each JSON message is passed to handler. The thread reconnects after
+    connection errors and exits when stop_event is set.
+
+    Args:
+        channel: Channel name
+        handler: Called with the decoded message body
+        stop_event: Set to stop the listener
+        reconnect_delay: Seconds to wait before resubscribing after an error
+
+    Returns:
+        The listener thread, or None if Redis is unavailable
+    """
+    if not is_cache_available():
+        return None
+
+    def listen():
+        while not stop_event.is_set():
+            pubsub = None
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(channel)
+                logger.info(f"Subscribed to channel '{channel}'")
+                while not stop_event.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    try:
+                        handler(json.loads(message["data"]))
+                    except Exception as e:
+                        logger.error(f"Handler error on channel '{channel}': {e}")
+            except Exception as e:
+                logger.warning(f"Subscription to '{channel}' lost: {e}")
+                stop_event.wait(reconnect_delay)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+    thread = threading.Thread(target=listen, name=f"redis-sub-{channel}", daemon=True)
+    thread.start()
+    return thread
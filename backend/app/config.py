@@ -0,0 +1,63 @@
+from functools import lru_cache
+from typing import List, Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # Database
+    DATABASE_URL: str = "mysql+pymysql://root:@localhost:3306/absen_desa"
+
+    # JWT
+    SECRET_KEY: str
+    ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+
+    # App
+    DEBUG: bool = False
+    CORS_ORIGINS: str = "http://localhost:5173,http://localhost:3000"
+
+    # Redis
+    REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_ENABLED: bool = True
+    CACHE_TTL_SETTINGS: int = 3600
+    CACHE_TTL_ATTENDANCE_TODAY: int = 30
+    CACHE_TTL_MONTHLY_REPORT: int = 300
+
+    # Face recognition matching (see README "Tuning Face Recognition")
+    FACE_INDEX: str = "exact"
+    FACE_INDEX_NPROBE: int = 8
+    FACE_INDEX_NLIST: int = 0
+    FACE_INDEX_MIN_SIZE: int = 20000
+    FACE_CENTROID_TOP_K: int = 16
+    FACE_BATCH_WINDOW_MS: float = 4
+    FACE_BATCH_MAX_SIZE: int = 32
+
+    # Face recognition workers and caches
+    FACE_INFERENCE_WORKERS: int = 0
+    FACE_INFERENCE_QUEUE_SIZE: int = 8
+    FACE_INFERENCE_RETRY_AFTER: int = 2
+    FACE_SHARED_CACHE: bool = True
+    FACE_SHARED_CACHE_DIR: Optional[str] = None
+    FACE_ENROLL_JOB_WORKERS: int = 1
+    FACE_ENROLL_JOB_DB: str = "uploads/enrollment_jobs.db"
+
+    # Attendance
+    ATTENDANCE_TICKET_TTL: int = 120
+    ATTENDANCE_WRITE_BEHIND: bool = False
+    ATTENDANCE_BUFFER_DB: str = "uploads/attendance_buffer.db"
+    ATTENDANCE_FLUSH_MS: float = 250
+    ATTENDANCE_FLUSH_BATCH: int = 500
+    ABSENT_SCHEDULER_ENABLED: bool = True
+    ABSENT_MARK_TIME: str = "23:55"
+    CALENDAR_CACHE_TTL: float = 60
+
+    @property
+    def cors_origins_list(self) -> List[str]:
+        return [origin.strip() for origin in self.CORS_ORIGINS.split(",") if origin.strip()]
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    return Settings()
@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+import zlib
+from contextlib import contextmanager
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import get_settings
 
@@ -21,3 +23,34 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+@contextmanager
+def advisory_lock(name: str):
+    """
+    Hold a named database lock for the with-block, so only one worker /
+    host runs a job. Yields False (without waiting) when another
+    connection holds the lock. MySQL GET_LOCK, PostgreSQL
+    pg_try_advisory_lock; other databases (SQLite, one host) always acquire.
+    """
+    with engine.connect() as conn:
+        dialect = conn.dialect.name
+        if dialect == "mysql":
+            acquired = conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": name}).scalar() == 1
+            release = text("SELECT RELEASE_LOCK(:name)")
+            params = {"name": name}
+        elif dialect == "postgresql":
+            key = zlib.crc32(name.encode())
+            acquired = bool(conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar())
+            release = text("SELECT pg_advisory_unlock(:key)")
+            params = {"key": key}
+        else:
+            acquired, release, params = True, None, None
+        conn.commit()
+
+        try:
+            yield acquired
+        finally:
+            if acquired and release is not None:
+                conn.execute(release, params)
+                conn.commit()
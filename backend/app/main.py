@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 import os
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -78,32 +78,85 @@ def on_startup():
     Startup event handler.
 
     1. Create database tables if not exist
-    2. Warm-up face embeddings cache (avoid cold start delay)
+    2. Start dlib inference worker pool
+    3. Warm-up dlib models + face embeddings cache in the background
+       (the app accepts traffic immediately; see /health/ready)
+    4. Subscribe to face cache / work calendar change events from other nodes
+    5. Resume queued face enrollment jobs
+    6. Schedule the daily ALFA marking of employees without attendance
+    7. Start the attendance write-behind flusher (if enabled)
     """
     # Create tables
     Base.metadata.create_all(bind=engine)
 
-    # Warm-up face embeddings cache
-    try:
-        from app.services.face_recognition import face_recognition_service
-        from app.database import SessionLocal
-
-        db = SessionLocal()
-        try:
-            count = face_recognition_service.refresh_embedding_cache(db)
-            print(f"✅ Face embeddings cache warmed up successfully ({count} embeddings loaded)")
-        finally:
-            db.close()
-    except Exception as e:
-        print(f"⚠️  Warning: Could not warm up face cache: {e}")
-        print("   Face recognition will work, but first request may be slower")
+    # Start inference workers (models load in the worker processes)
+    from app.services.inference_pool import inference_pool
+    inference_pool.start()
+
+    # Warm-up models and cache without blocking startup
+    from app.services.face_recognition import face_recognition_service
+    face_recognition_service.start_warm_up()
+
+    # Receive face cache changes made on other API nodes
+    if face_recognition_service.start_change_listener():
+        print("✅ Listening for face cache changes from other nodes")
+    from app.services.work_calendar import work_calendar
+    work_calendar.start_change_listener()
+
+    # Background CNN encoding for face uploads (picks up jobs left by a restart)
+    from app.services.enrollment_jobs import enrollment_jobs
+    enrollment_jobs.start()
+
+    # End-of-day absence marking (one worker at a time via a DB lock)
+    from app.services.absence_scheduler import absence_scheduler
+    absence_scheduler.start()
+
+    # Batched attendance writes (also flushes confirms queued before a restart)
+    from app.services.attendance_buffer import attendance_buffer
+    attendance_buffer.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """Stop worker processes, change listeners and the scheduler; flush queued attendance."""
+    from app.services.inference_pool import inference_pool
+    from app.services.face_recognition import face_recognition_service
+    from app.services.enrollment_jobs import enrollment_jobs
+    from app.services.work_calendar import work_calendar
+    from app.services.absence_scheduler import absence_scheduler
+    from app.services.attendance_buffer import attendance_buffer
+    inference_pool.shutdown()
+    enrollment_jobs.shutdown()
+    face_recognition_service.stop_change_listener()
+    work_calendar.stop_change_listener()
+    absence_scheduler.stop()
+    attendance_buffer.shutdown()
 
 
 @app.get("/health")
 def health_check():
+    """Liveness: the process is up and serving requests."""
     return {"status": "healthy"}
 
 
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness: dlib models and the embedding cache are loaded (503 while warming up)."""
+    from app.services.face_recognition import face_recognition_service
+    face_engine = face_recognition_service.readiness()
+    body = {"status": "ready" if face_engine["ready"] else "warming_up", "face_engine": face_engine}
+    if not face_engine["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Per-stage face recognition latency histograms (Prometheus text format)."""
+    from app.services.metrics import stage_metrics
+    return PlainTextResponse(stage_metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # ============================================
 # FRONTEND SERVING (untuk production all-in-one)
 # ============================================
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, Date, DateTime, Float, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, Enum, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -15,6 +15,10 @@ class AttendanceStatus(str, enum.Enum):
 
 class AttendanceLog(Base):
     __tablename__ = "attendance_logs"
+    # One row per employee per day (check-in/check-out are upserts on this key)
+    __table_args__ = (
+        UniqueConstraint("employee_id", "date", name="uq_attendance_employee_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False, index=True)
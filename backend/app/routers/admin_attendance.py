@@ -11,10 +11,15 @@ from app.models.audit_log import AuditAction, EntityType
 from app.schemas.attendance import (
     AttendanceLogResponse, AttendanceListResponse,
     AttendanceCorrectionRequest, AttendanceTodayItem,
-    AttendanceSummary, AttendanceTodayAdminResponse
+    AttendanceSummary, AttendanceTodayAdminResponse, MarkAbsentResponse
 )
 from app.utils.auth import get_current_admin, require_admin_role
 from app.utils.audit import log_audit
+from app.services.attendance import attendance_service
+from app.cache import invalidate_cache
+
+# Backfill range limit for POST /mark-absent
+MAX_MARK_ABSENT_DAYS = 366
 
 router = APIRouter(prefix="/admin/attendance", tags=["Attendance - Admin"])
 
@@ -176,3 +181,55 @@ def get_today_attendance_admin(
             sick=sick
         )
     )
+
+
+@router.post("/mark-absent", response_model=MarkAbsentResponse)
+def mark_absent(
+    start_date: Optional[date] = Query(None, description="Default hari ini"),
+    end_date: Optional[date] = Query(None, description="Default sama dengan start_date"),
+    db: Session = Depends(get_db),
+    admin: Admin = Depends(require_admin_role)
+):
+    """Tandai ALFA pegawai aktif tanpa absensi pada hari kerja di rentang tanggal (backfill)."""
+    start_date = start_date or date.today()
+    end_date = end_date or start_date
+
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Tanggal akhir tidak boleh sebelum tanggal mulai"
+        )
+    if end_date > date.today():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Tidak dapat menandai ALFA untuk tanggal yang akan datang"
+        )
+    if (end_date - start_date).days + 1 > MAX_MARK_ABSENT_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Rentang tanggal maksimal {MAX_MARK_ABSENT_DAYS} hari"
+        )
+
+    marked = attendance_service.backfill_absent(db, start_date, end_date)
+    total = sum(marked.values())
+    days = {day.isoformat(): count for day, count in marked.items()}
+    if date.today() in marked:
+        invalidate_cache(f"attendance:today:{date.today()}")
+
+    log_audit(
+        db=db,
+        action=AuditAction.CREATE,
+        entity_type=EntityType.ATTENDANCE,
+        entity_id=None,
+        description=f"Tandai ALFA {start_date} s/d {end_date}: {total} pegawai",
+        performed_by=admin.name,
+        details={"start_date": start_date.isoformat(), "end_date": end_date.isoformat(), "days": days}
+    )
+
+    return MarkAbsentResponse(
+        start_date=start_date,
+        end_date=end_date,
+        marked=total,
+        days=days,
+        message=f"{total} data ALFA ditambahkan"
+    )
@@ -1,14 +1,24 @@
 import base64
+import math
+from typing import List, Optional, Tuple
 from datetime import date, datetime
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_
+from starlette.concurrency import run_in_threadpool
 from app.database import get_db
 from app.models.attendance import AttendanceLog
 from app.models.employee import Employee
-from app.schemas.attendance import AttendanceRecognizeResponse, AttendanceTodayItem, AttendanceTodayResponse
-from app.services.face_recognition import face_recognition_service
+from app.schemas.attendance import (
+    AttendanceConfirmed, AttendanceRecognizeResponse, AttendanceTodayItem, AttendanceTodayResponse
+)
+from app.services.face_recognition import EmployeeSnapshot, face_recognition_service
+from app.services.metrics import stage_metrics
+from app.services.work_calendar import work_calendar
+from app.services.inference_pool import InferencePoolSaturated
 from app.services.attendance import attendance_service
+from app.services.attendance_buffer import attendance_buffer
+from app.services.attendance_ticket import InvalidTicket, issue_ticket, verify_ticket
 from app.cache import get_cache, set_cache, invalidate_cache
 from app.config import get_settings
 
@@ -16,46 +26,152 @@ config = get_settings()
 
 router = APIRouter(prefix="/attendance", tags=["Attendance - Tablet"])
 
+# Burst recognition accepts a short sequence of frames from one tap
+BURST_MIN_FRAMES = 3
+BURST_MAX_FRAMES = 5
+
+
+def _parse_face_box(face_box: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Parse an optional client face box hint "x,y,width,height" (normalized
+    0-1 relative to the image). Malformed hints are ignored, not rejected -
+    the server then falls back to full-frame detection.
+    """
+    if not face_box:
+        return None
+    try:
+        values = tuple(float(v) for v in face_box.split(","))
+    except ValueError:
+        return None
+    if len(values) != 4 or not all(math.isfinite(v) for v in values):
+        return None
+    return values
+
+
+def _decode_base64_image(image_base64: str) -> bytes:
+    """Decode a base64 image (data URL prefix allowed)."""
+    try:
+        if "," in image_base64:
+            image_base64 = image_base64.split(",")[1]
+        return base64.b64decode(image_base64)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format base64 tidak valid"
+        )
+
+
+@stage_metrics.timed("settings_lookup")
+def _get_threshold(db: Session) -> float:
+    """Face similarity threshold from work settings (calendar snapshot)."""
+    return work_calendar.get_day(db).face_similarity_threshold
+
 
 @router.post("/recognize", response_model=AttendanceRecognizeResponse)
 async def recognize_face_only(
     file: UploadFile = File(None),
     image_base64: str = Form(None),
+    face_box: str = Form(None),
     db: Session = Depends(get_db)
 ):
-    """Recognize face WITHOUT saving attendance - requires user confirmation"""
+    """
+    Recognize face WITHOUT saving attendance - requires user confirmation
+
+    Optional face_box ("x,y,width,height", normalized) from the kiosk's face
+    detector limits server detection to a padded crop around the face.
+    """
     if file:
         image_data = await file.read()
     elif image_base64:
-        try:
-            if "," in image_base64:
-                image_base64 = image_base64.split(",")[1]
-            image_data = base64.b64decode(image_base64)
-        except Exception:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Format base64 tidak valid"
-            )
+        image_data = _decode_base64_image(image_base64)
     else:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Gambar diperlukan (file atau base64)"
         )
 
-    if not face_recognition_service.detect_face(image_data):
+    # Get face recognition threshold from settings
+    threshold = await run_in_threadpool(_get_threshold, db)
+
+    # Single pass: decode, detect and encode once (in the inference pool),
+    # then match against cache
+    try:
+        result = await face_recognition_service.recognize_async(
+            image_data, db, threshold=threshold, face_box=_parse_face_box(face_box)
+        )
+    except InferencePoolSaturated as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server sedang sibuk, silakan coba lagi",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    if not result.face_detected:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Wajah tidak terdeteksi"
         )
 
-    # Get face recognition threshold from settings
-    settings = attendance_service.get_work_settings(db)
-    threshold = getattr(settings, 'face_similarity_threshold', 0.5)
-    
-    employee, confidence = face_recognition_service.find_matching_employee(
-        image_data, db, threshold=threshold
-    )
+    # DB checks are synchronous - keep them off the event loop
+    return await run_in_threadpool(_build_recognize_response, db, result.employee, result.score)
+
+
+@router.post("/recognize/burst", response_model=AttendanceRecognizeResponse)
+async def recognize_face_burst(
+    files: List[UploadFile] = File(None),
+    images_base64: List[str] = Form(None),
+    face_box: str = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Recognize face from a burst of 3-5 frames WITHOUT saving attendance.
+
+    Frames are encoded in parallel and matched in one vectorized pass;
+    the decision is aggregated over frames (mean distance per employee,
+    majority of frames must agree), so one blurry frame doesn't decide.
+    An optional face_box hint applies to every frame.
+    """
+    if files:
+        frames = [await f.read() for f in files]
+    elif images_base64:
+        frames = [_decode_base64_image(image) for image in images_base64]
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Gambar diperlukan (file atau base64)"
+        )
+
+    if not BURST_MIN_FRAMES <= len(frames) <= BURST_MAX_FRAMES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Jumlah frame harus {BURST_MIN_FRAMES}-{BURST_MAX_FRAMES}"
+        )
+
+    threshold = await run_in_threadpool(_get_threshold, db)
+
+    try:
+        result = await face_recognition_service.recognize_burst_async(
+            frames, db, threshold=threshold, face_box=_parse_face_box(face_box)
+        )
+    except InferencePoolSaturated as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server sedang sibuk, silakan coba lagi",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    if result.faces_detected == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Wajah tidak terdeteksi"
+        )
 
+    return await run_in_threadpool(_build_recognize_response, db, result.employee, result.score)
+
+
+@stage_metrics.timed("attendance_lookup")
+def _build_recognize_response(db: Session, employee: Optional[EmployeeSnapshot], confidence: float) -> AttendanceRecognizeResponse:
+    """Validate attendance eligibility for a recognized face and build the response."""
     if not employee:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -66,13 +182,14 @@ async def recognize_face_only(
     from datetime import datetime, time
     now = datetime.now()
 
-    if not attendance_service.is_workday(db, now.date()):
+    day = work_calendar.get_day(db, now.date())
+    if not day.is_workday:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Hari ini bukan hari kerja"
         )
 
-    if attendance_service.is_holiday(db, now.date()):
+    if day.is_holiday:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Hari ini adalah hari libur"
@@ -86,7 +203,7 @@ async def recognize_face_only(
     has_checked_in = existing_attendance is not None and existing_attendance.check_in_at is not None
 
     # Use daily schedule instead of global settings
-    schedule = attendance_service.get_effective_schedule(db, now.date())
+    schedule = day.schedule
     mode = attendance_service.get_attendance_mode(now.time(), schedule, has_checked_in)
 
     if mode is None:
@@ -103,6 +220,16 @@ async def recognize_face_only(
     else:  # belum_absen
         message = "Wajah dikenali. Klik 'Hadir' untuk konfirmasi absensi."
 
+    # Decisions made here travel to /confirm in a signed ticket
+    ticket = issue_ticket(
+        employee,
+        mode,
+        attendance_service.get_late_at(day),
+        existing_attendance.check_in_at if existing_attendance else None,
+        confidence,
+        day=day.date
+    )
+
     # Return employee data without saving
     return AttendanceRecognizeResponse(
         employee={
@@ -114,26 +241,55 @@ async def recognize_face_only(
         attendance=None,  # No attendance saved yet
         message=message,
         confidence=round(confidence * 100, 1),
-        attendance_status=attendance_status
+        attendance_status=attendance_status,
+        ticket=ticket
     )
 
 
 @router.post("/confirm")
 def confirm_attendance(
-    employee_id: int = Form(...),
-    confidence: float = Form(...),
+    ticket: str = Form(...),
     db: Session = Depends(get_db)
 ):
-    """Confirm and save attendance after user clicks 'Hadir' or 'Pulang' button"""
-    employee = db.query(Employee).filter(Employee.id == employee_id).first()
+    """
+    Confirm and save attendance after user clicks 'Hadir' or 'Pulang' button.
+
+    The ticket from /recognize carries the employee, mode, schedule and
+    confidence, so besides an is_active lookup by primary key only the
+    attendance write touches the database - or, in write-behind mode, only
+    the local queue (flushed in batches). Queued
+    attendance has no id yet (attendance.id is null) and appears in /today
+    after the next flush.
+    """
+    try:
+        recognition = verify_ticket(ticket)
+        if recognition.date != date.today():
+            raise InvalidTicket("Ticket issued on another day")
+    except InvalidTicket:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sesi absensi kedaluwarsa, silakan scan wajah ulang"
+        )
 
-    if not employee:
+    employee = recognition.employee
+    # A ticket outlives a deactivation within its TTL - recheck the employee
+    is_active = db.query(Employee.is_active).filter(Employee.id == employee.id).scalar()
+    if not is_active:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Employee tidak ditemukan"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Pegawai tidak aktif, silakan hubungi admin"
         )
 
-    attendance, message = attendance_service.process_attendance(db, employee, confidence / 100)
+    writer = attendance_buffer if attendance_buffer.enabled else attendance_service
+    attendance, message = writer.write_attendance(
+        db,
+        employee,
+        recognition.mode,
+        datetime.now().replace(microsecond=0),
+        recognition.late_at,
+        recognition.check_in_at,
+        recognition.confidence
+    )
 
     if not attendance:
         raise HTTPException(
@@ -141,9 +297,10 @@ def confirm_attendance(
             detail=message
         )
 
-    # Invalidate today's attendance cache (new attendance added)
-    today = date.today()
-    invalidate_cache(f"attendance:today:{today}")
+    if writer is attendance_service:
+        # Invalidate today's attendance cache (new attendance added); queued
+        # writes show up in /today once flushed, and the flush invalidates it
+        invalidate_cache(f"attendance:today:{date.today()}")
 
     # Get updated attendance status after processing
     attendance_status = attendance_service.get_attendance_status(attendance)
@@ -155,14 +312,14 @@ def confirm_attendance(
             "position": employee.position,
             "photo": employee.photo_url
         },
-        attendance={
-            "id": attendance.id,
-            "status": attendance.status.value,
-            "check_in_at": attendance.check_in_at.isoformat() if attendance.check_in_at else None,
-            "check_out_at": attendance.check_out_at.isoformat() if attendance.check_out_at else None
-        },
+        attendance=AttendanceConfirmed(
+            id=attendance.id,
+            status=attendance.status,
+            check_in_at=attendance.check_in_at,
+            check_out_at=attendance.check_out_at
+        ),
         message=message,
-        confidence=round(confidence, 1),
+        confidence=round(recognition.confidence * 100, 1),
         attendance_status=attendance_status
     )
 
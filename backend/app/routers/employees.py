@@ -11,6 +11,7 @@ from app.schemas.employee import (
 )
 from app.utils.auth import get_current_admin, require_admin_role
 from app.utils.audit import log_audit
+from app.services.face_recognition import face_recognition_service
 
 router = APIRouter(prefix="/employees", tags=["Employees"])
 
@@ -117,12 +118,26 @@ def update_employee(
             )
     
     update_data = data.model_dump(exclude_unset=True)
+    was_active = employee.is_active
+    # Fields copied into recognize responses and attendance tickets
+    displayed_changed = any(
+        field in update_data and update_data[field] != getattr(employee, field)
+        for field in ("name", "position", "photo_url")
+    )
     for field, value in update_data.items():
         setattr(employee, field, value)
     
     db.commit()
     db.refresh(employee)
     
+    # Keep the face cache in sync with the active flag
+    if was_active and not employee.is_active:
+        face_recognition_service.deactivate_employee(employee.id)
+    elif not was_active and employee.is_active:
+        face_recognition_service.add_employee_embeddings(db, employee)
+    elif displayed_changed:
+        face_recognition_service.refresh_employee(employee.id)
+    
     log_audit(
         db=db,
         action=AuditAction.UPDATE,
@@ -152,6 +167,9 @@ def delete_employee(
     employee.is_active = False
     db.commit()
     
+    # Stop matching this employee's faces
+    face_recognition_service.deactivate_employee(employee.id)
+    
     log_audit(
         db=db,
         action=AuditAction.DELETE,
@@ -1,28 +1,38 @@
 import os
 import uuid
+import zipfile
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.database import get_db
 from app.models.admin import Admin
 from app.models.employee import Employee
 from app.models.face_embedding import FaceEmbedding
-from app.schemas.face import FaceEmbeddingResponse, FaceUploadResponse
+from app.schemas.face import FaceEmbeddingResponse, FaceJobResponse
 from app.utils.auth import get_current_admin, require_admin_role
 from app.utils.file_validation import validate_image_upload
 from app.services.face_recognition import face_recognition_service
+from app.services.enrollment_jobs import enrollment_jobs
+from app.services.face_enrollment import BULK_MAX_ARCHIVE_SIZE, read_archive, stream_bulk_enrollment
 
 router = APIRouter(prefix="/employees", tags=["Face Enrollment"])
 
 UPLOAD_DIR = "uploads/faces"
 
 
-@router.post("/{employee_id}/face", response_model=FaceUploadResponse)
+@router.post("/{employee_id}/face", response_model=FaceJobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def upload_face(
     employee_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     admin: Admin = Depends(require_admin_role)
 ):
+    """
+    Save the photo and queue CNN encoding in the background.
+    Poll GET /employees/{employee_id}/face/jobs/{job_id} for the result.
+    """
     employee = db.query(Employee).filter(Employee.id == employee_id).first()
     if not employee:
         raise HTTPException(
@@ -37,7 +47,8 @@ async def upload_face(
         allowed_types=["image/jpeg", "image/jpg", "image/png"]
     )
 
-    if not face_recognition_service.detect_face(image_data):
+    # Quick HOG check so obviously bad photos fail immediately
+    if not await run_in_threadpool(face_recognition_service.detect_face, image_data):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Wajah tidak terdeteksi dalam gambar"
@@ -52,34 +63,78 @@ async def upload_face(
     with open(filepath, "wb") as f:
         f.write(image_data)
 
-    # Use CNN model and num_jitters=5 for registration (more accurate embeddings)
-    embedding = face_recognition_service.generate_embedding(
-        image_data,
-        use_cnn=True,      # Better face detection for registration
-        num_jitters=5      # More stable embeddings
-    )
+    # CNN model + num_jitters=5 (more accurate embeddings) run in the background
+    job = await run_in_threadpool(enrollment_jobs.submit, employee_id, filepath, f"/uploads/faces/{filename}")
+    return _job_response(job, "Foto sedang diproses")
+
+
+@router.get("/{employee_id}/face/jobs/{job_id}", response_model=FaceJobResponse)
+def get_face_job(
+    employee_id: int,
+    job_id: str,
+    admin: Admin = Depends(get_current_admin)
+):
+    job = enrollment_jobs.get(job_id)
+    if not job or job["employee_id"] != employee_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job tidak ditemukan"
+        )
+    return _job_response(job)
 
-    existing_count = db.query(FaceEmbedding).filter(
-        FaceEmbedding.employee_id == employee_id
-    ).count()
 
-    face_embedding = FaceEmbedding(
-        employee_id=employee_id,
-        embedding=embedding,
-        photo_url=f"/uploads/faces/{filename}",
-        is_primary=existing_count == 0
+def _job_response(job: dict, default_message: Optional[str] = None) -> FaceJobResponse:
+    return FaceJobResponse(
+        job_id=job["id"],
+        employee_id=job["employee_id"],
+        status=job["status"],
+        face_id=job["face_id"],
+        photo_url=job["photo_url"],
+        message=job["message"] or default_message
     )
-    db.add(face_embedding)
-    db.commit()
-    db.refresh(face_embedding)
 
-    # Invalidate cache after adding new face
-    face_recognition_service.invalidate_cache()
 
-    return FaceUploadResponse(
-        id=face_embedding.id,
-        photo_url=face_embedding.photo_url,
-        message="Foto wajah berhasil disimpan"
+@router.post("/faces/bulk")
+async def bulk_upload_faces(
+    file: UploadFile = File(...),
+    admin: Admin = Depends(require_admin_role)
+):
+    """
+    Bulk enrollment from a zip archive with one folder per employee NIK.
+
+    Photos are encoded in parallel and saved in batches; progress is
+    streamed as NDJSON (one line per file, per saved batch, and a summary).
+    """
+    archive_data = await file.read()
+    if len(archive_data) > BULK_MAX_ARCHIVE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ukuran arsip maksimal {BULK_MAX_ARCHIVE_SIZE // (1024 * 1024)}MB"
+        )
+
+    try:
+        archive, entries = read_archive(archive_data)
+    except zipfile.BadZipFile:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File harus berupa arsip zip"
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    if not entries:
+        archive.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Arsip tidak berisi foto (format: <NIK>/<foto>.jpg)"
+        )
+
+    return StreamingResponse(
+        stream_bulk_enrollment(archive, entries, admin.name, UPLOAD_DIR),
+        media_type="application/x-ndjson"
     )
 
 
@@ -124,5 +179,5 @@ def delete_face(
     db.delete(face)
     db.commit()
     
-    # Invalidate cache after deleting face
-    face_recognition_service.invalidate_cache()
+    # Remove the face from the cache (no full reload)
+    face_recognition_service.remove_embedding(face_id)
@@ -21,6 +21,7 @@ from app.utils.auth import get_current_admin, require_admin_role
 from app.utils.audit import log_audit
 from app.utils.file_validation import validate_image_upload
 from app.services.holiday_service import sync_holidays_from_api
+from app.services.work_calendar import work_calendar
 from app.cache import invalidate_cache
 
 router = APIRouter(prefix="/admin/settings", tags=["Settings"])
@@ -58,8 +59,9 @@ def update_settings(
     db.commit()
     db.refresh(settings)
 
-    # Invalidate public settings cache
+    # Invalidate public settings cache and attendance calendar snapshots
     invalidate_cache("public:settings:*")
+    work_calendar.invalidate()
 
     # Convert time objects to strings for JSON serialization in audit log
     audit_details = {}
@@ -331,6 +333,7 @@ def create_holiday(
     db.add(holiday)
     db.commit()
     db.refresh(holiday)
+    work_calendar.invalidate()
     
     log_audit(
         db=db,
@@ -374,6 +377,7 @@ def delete_holiday(
     else:
         db.delete(holiday)
         db.commit()
+    work_calendar.invalidate()
 
 
 @router.post("/holidays/sync", response_model=HolidaySyncResponse)
@@ -386,6 +390,7 @@ async def sync_holidays(
     try:
         target_year = year or datetime.now().year
         stats = await sync_holidays_from_api(db, target_year)
+        work_calendar.invalidate()
         
         log_audit(
             db=db,
@@ -451,6 +456,7 @@ def restore_holiday(
     holiday.is_excluded = False
     db.commit()
     db.refresh(holiday)
+    work_calendar.invalidate()
     
     log_audit(
         db=db,
@@ -479,6 +485,7 @@ def list_schedules(
             db.add(schedule)
 
         db.commit()
+        work_calendar.invalidate()
         schedules = db.query(DailyWorkSchedule).order_by(DailyWorkSchedule.day_of_week).all()
 
     return schedules
@@ -541,6 +548,7 @@ def update_schedules(
             })
 
     db.commit()
+    work_calendar.invalidate()
 
     # Log audit for batch update
     log_audit(
@@ -4,12 +4,20 @@ from datetime import date, datetime
 from app.models.attendance import AttendanceStatus
 
 
+class AttendanceConfirmed(BaseModel):
+    id: Optional[int]  # None in write-behind mode: queued, not in the database yet
+    status: AttendanceStatus
+    check_in_at: Optional[datetime]
+    check_out_at: Optional[datetime]
+
+
 class AttendanceRecognizeResponse(BaseModel):
     employee: dict
-    attendance: Optional[dict]  # Optional: None when just recognizing, filled after confirmation
+    attendance: Optional[AttendanceConfirmed]  # Optional: None when just recognizing, filled after confirmation
     message: str
     confidence: float
     attendance_status: Optional[str] = None  # "belum_absen", "sudah_check_in", "sudah_lengkap"
+    ticket: Optional[str] = None  # Signed recognition ticket, posted back to /attendance/confirm
 
 
 class AttendanceTodayItem(BaseModel):
@@ -75,3 +83,11 @@ class AttendanceSummary(BaseModel):
 class AttendanceTodayAdminResponse(BaseModel):
     items: List[AttendanceTodayItem]
     summary: AttendanceSummary
+
+
+class MarkAbsentResponse(BaseModel):
+    start_date: date
+    end_date: date
+    marked: int
+    days: dict  # "YYYY-MM-DD" -> rows marked ALFA (workdays only)
+    message: str
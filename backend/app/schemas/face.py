@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 
 
 class FaceEmbeddingResponse(BaseModel):
@@ -13,7 +14,10 @@ class FaceEmbeddingResponse(BaseModel):
         from_attributes = True
 
 
-class FaceUploadResponse(BaseModel):
-    id: int
+class FaceJobResponse(BaseModel):
+    job_id: str
+    employee_id: int
+    status: str  # pending, running, done, failed
+    face_id: Optional[int] = None
     photo_url: str
-    message: str
+    message: Optional[str] = None
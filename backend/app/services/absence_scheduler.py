@@ -0,0 +1,88 @@
+"""
+Absence Scheduler - menandai pegawai yang tidak absen sebagai ALFA setiap hari.
+
+Task asyncio di proses API yang bangun pada jam ABSENT_MARK_TIME (default
+23:55) lalu menjalankan attendance_service.mark_absent_employees di
+threadpool. Setiap worker uvicorn menjalankan scheduler sendiri; advisory
+lock di database memastikan hanya satu yang benar-benar menulis (yang lain
+melewati run tersebut). Tanggal yang terlewat (server mati saat jadwal) bisa
+diisi lewat POST /admin/attendance/mark-absent.
+"""
+import asyncio
+import logging
+from datetime import datetime, time, timedelta
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.cache import invalidate_cache
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ABSENCE_LOCK_NAME = "absen_desa:mark_absent"
+
+
+class AbsenceScheduler:
+    def __init__(self, run_at: time, enabled: bool = True):
+        self.run_at = run_at
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> bool:
+        """Schedule the daily run on the running event loop."""
+        if not self.enabled or self._task is not None:
+            return False
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+        logger.info(f"Absence scheduler started, runs daily at {self.run_at:%H:%M}")
+        return True
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def seconds_until_next_run(self, now: Optional[datetime] = None) -> float:
+        now = now or datetime.now()
+        next_run = datetime.combine(now.date(), self.run_at)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.seconds_until_next_run())
+            try:
+                await run_in_threadpool(self.run_once)
+            except Exception:
+                logger.exception("Marking absent employees failed")
+            # asyncio.sleep may wake a little early: step past run_at so the
+            # next wait targets tomorrow
+            await asyncio.sleep(1)
+
+    def run_once(self) -> Optional[int]:
+        """Mark today's absentees; None when another worker holds the lock."""
+        from app.database import SessionLocal, advisory_lock
+        from app.services.attendance import attendance_service
+
+        with advisory_lock(ABSENCE_LOCK_NAME) as acquired:
+            if not acquired:
+                logger.info("Absence marking already running on another worker, skipped")
+                return None
+            db = SessionLocal()
+            try:
+                today = datetime.now().date()
+                marked = attendance_service.mark_absent_employees(db, today)
+            finally:
+                db.close()
+
+        invalidate_cache(f"attendance:today:{today}")
+        logger.info(f"Marked {marked} employees absent for {today}")
+        return marked
+
+
+absence_scheduler = AbsenceScheduler(
+    run_at=time.fromisoformat(settings.ABSENT_MARK_TIME),
+    enabled=settings.ABSENT_SCHEDULER_ENABLED
+)
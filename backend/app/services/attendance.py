@@ -1,12 +1,14 @@
-from typing import Optional, Tuple
+from typing import Dict, Optional, Tuple
 from datetime import datetime, date, time, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, case, func, insert, literal, or_, select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from app.models.employee import Employee
 from app.models.attendance import AttendanceLog, AttendanceStatus
-from app.models.holiday import Holiday
 from app.models.work_settings import WorkSettings
-from app.models.daily_schedule import DailyWorkSchedule
+from app.services.work_calendar import DaySnapshot, work_calendar
 
 
 class AttendanceService:
@@ -19,53 +21,6 @@ class AttendanceService:
             db.refresh(settings)
         return settings
     
-    def is_holiday(self, db: Session, check_date: date) -> bool:
-        """Check if the given date is a holiday (excluding holidays marked as is_excluded)."""
-        holiday = db.query(Holiday).filter(
-            Holiday.date == check_date,
-            Holiday.is_excluded == False
-        ).first()
-        return holiday is not None
-
-    def is_workday(self, db: Session, check_date: date) -> bool:
-        """Check if the given date is a workday based on DailyWorkSchedule."""
-        day_of_week = check_date.weekday()  # 0=Monday, 6=Sunday
-        schedule = db.query(DailyWorkSchedule).filter(
-            DailyWorkSchedule.day_of_week == day_of_week
-        ).first()
-
-        # If no schedule exists, default to weekday logic (Mon-Fri = workday)
-        if not schedule:
-            return day_of_week < 5
-
-        return schedule.is_workday
-
-    def get_daily_schedule(self, db: Session, check_date: date) -> Optional[DailyWorkSchedule]:
-        """Get the work schedule for a specific date."""
-        day_of_week = check_date.weekday()
-        return db.query(DailyWorkSchedule).filter(
-            DailyWorkSchedule.day_of_week == day_of_week
-        ).first()
-    
-    def get_effective_schedule(self, db: Session, check_date: date) -> dict:
-        """Get effective work schedule for a date (daily schedule or fallback to global settings)."""
-        daily_schedule = self.get_daily_schedule(db, check_date)
-
-        if daily_schedule:
-            return {
-                "check_in_start": daily_schedule.check_in_start,
-                "check_in_end": daily_schedule.check_in_end,
-                "check_out_start": daily_schedule.check_out_start,
-            }
-
-        # Fallback to global settings
-        settings = self.get_work_settings(db)
-        return {
-            "check_in_start": settings.check_in_start,
-            "check_in_end": settings.check_in_end,
-            "check_out_start": settings.check_out_start,
-        }
-
     def get_attendance_mode(self, current_time: time, schedule: dict, has_checked_in: bool = False) -> Optional[str]:
         check_in_start = schedule["check_in_start"]
         check_in_end = schedule["check_in_end"]
@@ -88,6 +43,13 @@ class AttendanceService:
             return "CHECK_OUT"
         return None
     
+    def get_late_at(self, day: DaySnapshot) -> datetime:
+        """Check-in after this moment is TERLAMBAT."""
+        return datetime.combine(
+            day.date,
+            day.schedule["check_in_end"]
+        ) + timedelta(minutes=day.late_threshold_minutes)
+
     def get_today_attendance(self, db: Session, employee_id: int) -> Optional[AttendanceLog]:
         today = date.today()
         return db.query(AttendanceLog).filter(
@@ -106,64 +68,34 @@ class AttendanceService:
         else:  # Both check_in_at and check_out_at exist
             return "sudah_lengkap"
     
-    def process_attendance(
+    def write_attendance(
         self,
         db: Session,
-        employee: Employee,
+        employee,
+        mode: str,
+        now: datetime,
+        late_at: datetime,
+        check_in_at: Optional[datetime],
         confidence_score: float
     ) -> Tuple[Optional[AttendanceLog], str]:
-        now = datetime.now()
+        """
+        Record check-in/check-out for a mode already decided by
+        /attendance/recognize (carried in the ticket). employee needs id and
+        name; check_in_at is the employee's check-in as last seen.
+        """
         today = now.date()
-        current_time = now.time()
-
-        if not self.is_workday(db, today):
-            return None, "Hari ini bukan hari kerja"
-
-        if self.is_holiday(db, today):
-            return None, "Hari ini adalah hari libur"
-
-        # Use daily schedule instead of global settings
-        schedule = self.get_effective_schedule(db, today)
-        settings = self.get_work_settings(db)  # Still needed for late_threshold_minutes
-        attendance = self.get_today_attendance(db, employee.id)
 
-        # Check if employee has already checked in
-        has_checked_in = attendance is not None and attendance.check_in_at is not None
-
-        mode = self.get_attendance_mode(current_time, schedule, has_checked_in)
-        if mode is None:
-            return None, f"Di luar jam absensi ({schedule['check_in_start'].strftime('%H:%M')}-{time(23, 59).strftime('%H:%M')})"
-        
         if mode == "CHECK_IN":
-            if attendance and attendance.check_in_at:
-                return attendance, f"Sudah absen masuk pukul {attendance.check_in_at.strftime('%H:%M')}"
-
-            late_threshold = datetime.combine(
-                today,
-                schedule["check_in_end"]
-            ) + timedelta(minutes=settings.late_threshold_minutes)
-            
-            if now <= late_threshold:
+            if now <= late_at:
                 status = AttendanceStatus.HADIR
             else:
                 status = AttendanceStatus.TERLAMBAT
             
-            if attendance:
-                attendance.check_in_at = now
-                attendance.status = status
-                attendance.confidence_score = confidence_score
-            else:
-                attendance = AttendanceLog(
-                    employee_id=employee.id,
-                    date=today,
-                    check_in_at=now,
-                    status=status,
-                    confidence_score=confidence_score
-                )
-                db.add(attendance)
-            
-            db.commit()
-            db.refresh(attendance)
+            attendance = self.record_check_in(db, employee.id, today, now, status, confidence_score)
+            if attendance.check_in_at != now:
+                # A concurrent confirm checked in first (one in the same
+                # second stores identical values and gets the same greeting)
+                return attendance, f"Sudah absen masuk pukul {attendance.check_in_at.strftime('%H:%M')}"
             
             greeting = f"Selamat datang, {employee.name}"
             if status == AttendanceStatus.TERLAMBAT:
@@ -172,43 +104,155 @@ class AttendanceService:
             return attendance, greeting
         
         else:
-            if not attendance or not attendance.check_in_at:
+            if not check_in_at:
                 return None, "Belum absen masuk hari ini"
             
-            if attendance.check_out_at:
-                return attendance, f"Sudah absen pulang pukul {attendance.check_out_at.strftime('%H:%M')}"
-            
             # Check if 3 minutes have passed since check-in
-            time_diff = now - attendance.check_in_at
+            time_diff = now - check_in_at
             if time_diff.total_seconds() < 180:  # 180 seconds = 3 minutes
                 minutes_left = 3 - int(time_diff.total_seconds() / 60)
                 return None, f"Anda baru saja check-in. Harap tunggu {minutes_left} menit lagi untuk check-out."
             
-            attendance.check_out_at = now
-            db.commit()
-            db.refresh(attendance)
+            attendance = self.record_check_out(db, employee.id, today, now)
+            if attendance is None:
+                return None, "Belum absen masuk hari ini"
+            if attendance.check_out_at != now:
+                return attendance, f"Sudah absen pulang pukul {attendance.check_out_at.strftime('%H:%M')}"
             
             return attendance, f"Sampai jumpa besok, {employee.name}"
     
-    def mark_absent_employees(self, db: Session):
-        today = date.today()
+    def record_check_in(
+        self,
+        db: Session,
+        employee_id: int,
+        day: date,
+        now: datetime,
+        status: AttendanceStatus,
+        confidence_score: float
+    ) -> AttendanceLog:
+        """
+        Check in with one upsert on (employee_id, date): inserts the row, or
+        fills check-in on an existing row without one (e.g. ALFA). An
+        existing check-in is never overwritten. Returns the stored row.
+        """
+        db.execute(self.check_in_statement(db, employee_id, day, now, status, confidence_score))
+        db.commit()
+        return self._reload_attendance(db, employee_id, day)
 
-        if not self.is_workday(db, today) or self.is_holiday(db, today):
-            return
-        
-        employees = db.query(Employee).filter(Employee.is_active == True).all()
-        
-        for emp in employees:
-            attendance = self.get_today_attendance(db, emp.id)
-            if not attendance:
-                attendance = AttendanceLog(
-                    employee_id=emp.id,
-                    date=today,
-                    status=AttendanceStatus.ALFA
-                )
-                db.add(attendance)
-        
+    def record_check_out(self, db: Session, employee_id: int, day: date, now: datetime) -> Optional[AttendanceLog]:
+        """Set check-out with one conditional UPDATE (only if checked in and not yet out)."""
+        db.execute(self.check_out_statement(employee_id, day, now))
+        db.commit()
+        return self._reload_attendance(db, employee_id, day)
+
+    def check_in_statement(
+        self,
+        db: Session,
+        employee_id: int,
+        day: date,
+        now: datetime,
+        status: AttendanceStatus,
+        confidence_score: float
+    ):
+        """The check-in upsert for the session's database (not executed)."""
+        table = AttendanceLog.__table__
+        values = dict(employee_id=employee_id, date=day, check_in_at=now, status=status, confidence_score=confidence_score)
+        not_checked_in = table.c.check_in_at.is_(None)
+        dialect = db.get_bind().dialect.name
+
+        if dialect == "mysql":
+            stmt = mysql_insert(table).values(**values)
+            new = stmt.inserted
+            # MySQL assigns left to right: check_in_at must change last
+            return stmt.on_duplicate_key_update([
+                ("status", case((not_checked_in, new.status), else_=table.c.status)),
+                ("confidence_score", case((not_checked_in, new.confidence_score), else_=table.c.confidence_score)),
+                ("updated_at", case((not_checked_in, func.now()), else_=table.c.updated_at)),
+                ("check_in_at", func.coalesce(table.c.check_in_at, new.check_in_at)),
+            ])
+        elif dialect in ("sqlite", "postgresql"):
+            insert_ = sqlite_insert if dialect == "sqlite" else postgresql_insert
+            stmt = insert_(table).values(**values)
+            return stmt.on_conflict_do_update(
+                index_elements=[table.c.employee_id, table.c.date],
+                set_={
+                    "check_in_at": stmt.excluded.check_in_at,
+                    "status": stmt.excluded.status,
+                    "confidence_score": stmt.excluded.confidence_score,
+                    "updated_at": func.now(),
+                },
+                where=not_checked_in
+            )
+        # No upsert syntax - plain insert, the unique constraint still rejects duplicates
+        return insert(table).values(**values)
+
+    def check_out_statement(self, employee_id: int, day: date, now: datetime):
+        """The conditional check-out UPDATE (not executed)."""
+        table = AttendanceLog.__table__
+        return (
+            update(table)
+            .where(
+                table.c.employee_id == employee_id,
+                table.c.date == day,
+                table.c.check_in_at.is_not(None),
+                table.c.check_out_at.is_(None)
+            )
+            .values(check_out_at=now, updated_at=func.now())
+        )
+
+    def _reload_attendance(self, db: Session, employee_id: int, day: date) -> Optional[AttendanceLog]:
+        """Read the row back after a Core write (refreshes any loaded instance)."""
+        return db.query(AttendanceLog).populate_existing().filter(
+            AttendanceLog.employee_id == employee_id,
+            AttendanceLog.date == day
+        ).first()
+    
+    def mark_absent_employees(self, db: Session, day: Optional[date] = None) -> int:
+        """
+        Mark every active employee without a log for day (default today) as
+        ALFA with one INSERT ... SELECT. Non-workdays and holidays are
+        skipped. Returns the number of rows inserted.
+        """
+        day = day or date.today()
+        snapshot = work_calendar.get_day(db, day)
+        if not snapshot.is_workday or snapshot.is_holiday:
+            return 0
+        return self._insert_absent(db, day)
+
+    def backfill_absent(self, db: Session, start: date, end: date) -> Dict[date, int]:
+        """mark_absent_employees for each workday in start..end (inclusive)."""
+        marked = {}
+        for snapshot in work_calendar.get_range(db, start, end):
+            if snapshot.is_workday and not snapshot.is_holiday:
+                marked[snapshot.date] = self._insert_absent(db, snapshot.date)
+        return marked
+
+    def _insert_absent(self, db: Session, day: date) -> int:
+        table = AttendanceLog.__table__
+        has_log = select(table.c.id).where(
+            table.c.employee_id == Employee.id,
+            table.c.date == day
+        ).exists()
+        absent = select(
+            Employee.id,
+            literal(day, table.c.date.type),
+            literal(AttendanceStatus.ALFA, table.c.status.type)
+        ).where(
+            Employee.is_active == True,
+            # Backfill: not before the employee was registered
+            or_(Employee.created_at.is_(None), Employee.created_at < datetime.combine(day + timedelta(days=1), time.min)),
+            ~has_log
+        )
+        # A check-in racing with the insert wins (unique employee/date)
+        stmt = (
+            insert(table)
+            .from_select(["employee_id", "date", "status"], absent)
+            .prefix_with("IGNORE", dialect="mysql")
+            .prefix_with("OR IGNORE", dialect="sqlite")
+        )
+        result = db.execute(stmt)
         db.commit()
+        return result.rowcount
 
 
 attendance_service = AttendanceService()
@@ -0,0 +1,374 @@
+"""
+Attendance Buffer - write-behind untuk konfirmasi absensi saat jam sibuk.
+
+Saat jam masuk konfirmasi datang bersamaan dan masing-masing melakukan
+commit sendiri ke MySQL. Dengan ATTENDANCE_WRITE_BEHIND=true, /confirm
+menulis absensi ke antrian SQLite lokal (mode WAL, tahan restart) dan
+langsung menjawab; thread background memindahkan antrian ke database utama
+dalam satu transaksi per batch setiap ATTENDANCE_FLUSH_MS.
+
+Idempoten: antrian unik per (pegawai, tanggal, masuk/pulang) sehingga
+konfirmasi ganda hanya tercatat sekali, dan flush memakai upsert / UPDATE
+bersyarat yang sama dengan mode sinkron - flush ulang setelah crash tidak
+mengubah apa pun. Check-out yang check-in-nya belum ada di database dicoba
+ulang; setelah MAX_FLUSH_ATTEMPTS (tanpa check-in yang masih antri) event
+ditandai gagal dan dicatat di log. Semua worker uvicorn di host yang sama berbagi file
+antrian. Jika tidak diaktifkan, mode sinkron (AttendanceService) dipakai.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.exc import OperationalError
+
+from app.cache import invalidate_cache
+from app.config import get_settings
+from app.models.attendance import AttendanceStatus
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MODE_CHECK_IN = "CHECK_IN"
+MODE_CHECK_OUT = "CHECK_OUT"
+
+# Claimed rows not flushed for this long belong to a dead process
+CLAIM_STALE_SECONDS = 30
+# Flushes a check-out may find no check-in before it is given up
+MAX_FLUSH_ATTEMPTS = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attendance_buffer (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    employee_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    confidence REAL,
+    claimed_at REAL,
+    flushed_at REAL,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (employee_id, date, mode)
+)
+"""
+
+
+class BufferedAttendance(NamedTuple):
+    """Attendance as acknowledged before it reaches the database (no id yet)."""
+    id: Optional[int]
+    status: AttendanceStatus
+    check_in_at: Optional[datetime]
+    check_out_at: Optional[datetime]
+
+
+class AttendanceBuffer:
+    def __init__(self, path: str, enabled: bool = False, flush_ms: float = 250, batch_size: int = 500):
+        self.path = path
+        self.enabled = enabled
+        self.flush_interval = max(10.0, flush_ms) / 1000
+        self.batch_size = max(1, batch_size)
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived autocommit connection (one per call, safe across threads)."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _ensure_schema(self):
+        with self._lock:
+            if self._ready:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(_SCHEMA)
+                # Queue files created before the attempts counter
+                columns = {row["name"] for row in conn.execute("PRAGMA table_info(attendance_buffer)")}
+                if "attempts" not in columns:
+                    conn.execute("ALTER TABLE attendance_buffer ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+                conn.execute("COMMIT")
+            self._ready = True
+
+    def start(self) -> bool:
+        """Start the background flusher (flushes rows left by a restart first)."""
+        if not self.enabled or self._flusher is not None:
+            return False
+        self._ensure_schema()
+        self._stop.clear()
+        self._flusher = threading.Thread(target=self._run, name="attendance-flush", daemon=True)
+        self._flusher.start()
+        logger.info(f"Attendance write-behind enabled, flush every {self.flush_interval * 1000:.0f} ms")
+        return True
+
+    def shutdown(self):
+        """Stop the flusher and flush what is left."""
+        if self._flusher is None:
+            return
+        self._stop.set()
+        self._flusher.join(timeout=10)
+        self._flusher = None
+        self.flush()
+
+    def write_attendance(
+        self,
+        db,
+        employee,
+        mode: str,
+        now: datetime,
+        late_at: datetime,
+        check_in_at: Optional[datetime],
+        confidence_score: float
+    ) -> Tuple[Optional[BufferedAttendance], str]:
+        """
+        Same contract as AttendanceService.write_attendance, but queued.
+        db is unused: nothing is read from or written to the database here.
+        """
+        self._ensure_schema()
+        today = now.date()
+
+        if mode == MODE_CHECK_IN:
+            status = AttendanceStatus.HADIR if now <= late_at else AttendanceStatus.TERLAMBAT
+            queued = self._enqueue(employee.id, today, MODE_CHECK_IN, now, status, confidence_score)
+            if queued["at"] != now:
+                return self._as_attendance(queued), f"Sudah absen masuk pukul {queued['at'].strftime('%H:%M')}"
+
+            greeting = f"Selamat datang, {employee.name}"
+            if status == AttendanceStatus.TERLAMBAT:
+                greeting += " (Terlambat)"
+            return self._as_attendance(queued), greeting
+
+        # A check-in confirmed moments ago may still be in the queue
+        check_in = self._get(employee.id, today, MODE_CHECK_IN)
+        if check_in is not None:
+            check_in_at, status = check_in["at"], check_in["status"]
+        elif check_in_at is not None:
+            # Status as derived at check-in (admin corrections are not visible here)
+            status = AttendanceStatus.HADIR if check_in_at <= late_at else AttendanceStatus.TERLAMBAT
+        else:
+            return None, "Belum absen masuk hari ini"
+
+        # Check if 3 minutes have passed since check-in
+        time_diff = now - check_in_at
+        if time_diff.total_seconds() < 180:  # 180 seconds = 3 minutes
+            minutes_left = 3 - int(time_diff.total_seconds() / 60)
+            return None, f"Anda baru saja check-in. Harap tunggu {minutes_left} menit lagi untuk check-out."
+
+        queued = self._enqueue(employee.id, today, MODE_CHECK_OUT, now, status, None)
+        attendance = BufferedAttendance(None, status, check_in_at, queued["at"])
+        if queued["at"] != now:
+            return attendance, f"Sudah absen pulang pukul {queued['at'].strftime('%H:%M')}"
+        return attendance, f"Sampai jumpa besok, {employee.name}"
+
+    def _enqueue(
+        self,
+        employee_id: int,
+        day: date,
+        mode: str,
+        at: datetime,
+        status: AttendanceStatus,
+        confidence: Optional[float]
+    ) -> dict:
+        """Queue one event; an existing one for employee/day/mode wins. Returns the queued event."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO attendance_buffer (employee_id, date, mode, at, status, confidence) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (employee_id, day.isoformat(), mode, at.isoformat(), status.value, confidence)
+            )
+        return self._get(employee_id, day, mode)
+
+    def _get(self, employee_id: int, day: date, mode: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM attendance_buffer WHERE employee_id = ? AND date = ? AND mode = ?",
+                (employee_id, day.isoformat(), mode)
+            ).fetchone()
+        if row is None:
+            return None
+        event = dict(row)
+        event["at"] = datetime.fromisoformat(event["at"])
+        event["status"] = AttendanceStatus(event["status"])
+        return event
+
+    @staticmethod
+    def _as_attendance(check_in: dict) -> BufferedAttendance:
+        return BufferedAttendance(None, check_in["status"], check_in["at"], None)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Attendance flush failed, retrying")
+
+    def _claim(self) -> List[dict]:
+        """Claim the oldest unflushed events (several API workers may try)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT * FROM attendance_buffer WHERE flushed_at IS NULL "
+                "AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY seq LIMIT ?",
+                (now - CLAIM_STALE_SECONDS, self.batch_size)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE attendance_buffer SET claimed_at = ? WHERE seq = ?",
+                [(now, row["seq"]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        return [dict(row) for row in rows]
+
+    def flush(self) -> int:
+        """Write claimed events to the database in one transaction. Returns events flushed."""
+        if not self._ready:
+            return 0
+        events = self._claim()
+        if not events:
+            return 0
+
+        from app.database import SessionLocal
+
+        failed = []
+        db = SessionLocal()
+        try:
+            try:
+                done, retry = self._apply(db, events)
+                db.commit()
+            except OperationalError:
+                # Database unreachable: keep everything for the next tick
+                db.rollback()
+                self._release([event["seq"] for event in events])
+                raise
+            except Exception:
+                db.rollback()
+                logger.exception("Attendance batch flush failed, flushing events one by one")
+                done, retry = [], []
+                for i, event in enumerate(events):
+                    try:
+                        event_done, event_retry = self._apply(db, [event])
+                        db.commit()
+                    except OperationalError:
+                        db.rollback()
+                        self._release([e["seq"] for e in events[i:]] + retry)
+                        self._mark_flushed(done, failed)
+                        raise
+                    except Exception as e:
+                        db.rollback()
+                        logger.error(f"Dropping attendance event {event}: {e}")
+                        failed.append((str(e), event["seq"]))
+                        continue
+                    done += event_done
+                    retry += event_retry
+        finally:
+            db.close()
+
+        self._mark_flushed(done, failed)
+        self._retry(retry)
+
+        for day in {event["date"] for event in events}:
+            invalidate_cache(f"attendance:today:{day}")
+        return len(done)
+
+    def _apply(self, db, events: List[dict]) -> Tuple[List[int], List[int]]:
+        """Execute events in the session (no commit). Returns (done, retry) seqs."""
+        from app.services.attendance import attendance_service
+
+        done, retry = [], []
+        for event in events:
+            day = date.fromisoformat(event["date"])
+            at = datetime.fromisoformat(event["at"])
+            if event["mode"] == MODE_CHECK_IN:
+                db.execute(attendance_service.check_in_statement(
+                    db, event["employee_id"], day, at, AttendanceStatus(event["status"]), event["confidence"]
+                ))
+                done.append(event["seq"])
+            else:
+                result = db.execute(attendance_service.check_out_statement(event["employee_id"], day, at))
+                # Nothing updated: already checked out (done) or the
+                # check-in has not reached the database yet (retry)
+                if result.rowcount == 0 and not self._checked_in(db, event["employee_id"], day):
+                    retry.append(event["seq"])
+                else:
+                    done.append(event["seq"])
+        return done, retry
+
+    def _mark_flushed(self, done: List[int], failed: List[Tuple[str, int]]):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany("UPDATE attendance_buffer SET flushed_at = ? WHERE seq = ?", [(now, seq) for seq in done])
+            # Failed events stay in the file (error set) for inspection
+            conn.executemany(
+                "UPDATE attendance_buffer SET flushed_at = ?, error = ? WHERE seq = ?",
+                [(now, error, seq) for error, seq in failed]
+            )
+            # Flushed events are kept until the day is over for duplicate detection
+            conn.execute(
+                "DELETE FROM attendance_buffer WHERE flushed_at IS NOT NULL AND error IS NULL AND date < ?",
+                (date.today().isoformat(),)
+            )
+
+    def _retry(self, seqs: List[int]):
+        """
+        Release check-outs whose check-in is not in the database yet. Waiting
+        for a check-in still in the queue is free; otherwise each flush counts
+        as an attempt, and after MAX_FLUSH_ATTEMPTS the event is marked failed.
+        """
+        if not seqs:
+            return
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "UPDATE attendance_buffer SET claimed_at = NULL, attempts = attempts + NOT EXISTS ("
+                "SELECT 1 FROM attendance_buffer AS check_in WHERE check_in.employee_id = attendance_buffer.employee_id "
+                "AND check_in.date = attendance_buffer.date AND check_in.mode = ? AND check_in.flushed_at IS NULL"
+                ") WHERE seq = ?",
+                [(MODE_CHECK_IN, seq) for seq in seqs]
+            )
+            given_up = conn.execute(
+                f"SELECT * FROM attendance_buffer WHERE seq IN ({', '.join('?' * len(seqs))}) AND attempts >= ?",
+                (*seqs, MAX_FLUSH_ATTEMPTS)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE attendance_buffer SET flushed_at = ?, error = ? WHERE seq = ?",
+                [(time.time(), f"No check-in after {row['attempts']} flushes", row["seq"]) for row in given_up]
+            )
+            conn.execute("COMMIT")
+        for row in given_up:
+            logger.error(f"Dropping attendance event {dict(row)}: no check-in after {row['attempts']} flushes")
+
+    def _release(self, seqs: List[int]):
+        if seqs:
+            with self._connect() as conn:
+                conn.executemany("UPDATE attendance_buffer SET claimed_at = NULL WHERE seq = ?", [(seq,) for seq in seqs])
+
+    @staticmethod
+    def _checked_in(db, employee_id: int, day: date) -> bool:
+        from app.models.attendance import AttendanceLog
+        return db.query(AttendanceLog.id).filter(
+            AttendanceLog.employee_id == employee_id,
+            AttendanceLog.date == day,
+            AttendanceLog.check_in_at.is_not(None)
+        ).first() is not None
+
+
+attendance_buffer = AttendanceBuffer(
+    path=settings.ATTENDANCE_BUFFER_DB,
+    enabled=settings.ATTENDANCE_WRITE_BEHIND,
+    flush_ms=settings.ATTENDANCE_FLUSH_MS,
+    batch_size=settings.ATTENDANCE_FLUSH_BATCH
+)
@@ -0,0 +1,81 @@
+"""
+Attendance Ticket - tiket bertanda tangan dari /attendance/recognize untuk /attendance/confirm.
+
+Recognize sudah memeriksa hari kerja, libur, jadwal, mode (masuk/pulang)
+dan status absensi pegawai. Hasilnya beserta confidence dari server dibungkus
+dalam JWT berumur pendek (ATTENDANCE_TICKET_TTL detik) sehingga confirm
+cukup memverifikasi tiket lalu menulis - tanpa memuat ulang pegawai dan
+kalender, dan tanpa mempercayai confidence yang dikirim klien.
+
+Tiket boleh dipakai ulang sampai kedaluwarsa: penulisan absensi idempoten
+(check-in/check-out hanya tercatat sekali per hari). Isi tiket tidak ikut
+berubah bila pegawai dinonaktifkan sebelum tiket kedaluwarsa, karena itu
+/confirm tetap memeriksa status aktif pegawai di database (satu query
+primary key).
+"""
+from datetime import date, datetime, timedelta
+from typing import NamedTuple, Optional
+
+from jose import JWTError, jwt
+
+from app.config import get_settings
+from app.services.face_recognition import EmployeeSnapshot
+
+settings = get_settings()
+
+TICKET_TYPE = "attendance_ticket"
+
+
+class InvalidTicket(Exception):
+    """Raised when a ticket is malformed, tampered with or expired."""
+
+
+class AttendanceTicket(NamedTuple):
+    employee: EmployeeSnapshot
+    mode: str  # CHECK_IN / CHECK_OUT
+    date: date
+    late_at: datetime  # Check-in after this is TERLAMBAT
+    check_in_at: Optional[datetime]  # Existing check-in when recognized
+    confidence: float  # 0-1, from the server-side match
+
+
+def issue_ticket(
+    employee: EmployeeSnapshot,
+    mode: str,
+    late_at: datetime,
+    check_in_at: Optional[datetime],
+    confidence: float,
+    ttl: Optional[int] = None,
+    day: Optional[date] = None
+) -> str:
+    """day is the recognition date (default today); late_at may fall after midnight."""
+    ttl = ttl or settings.ATTENDANCE_TICKET_TTL
+    claims = {
+        "typ": TICKET_TYPE,
+        "emp": [employee.id, employee.name, employee.position, employee.photo_url],
+        "mode": mode,
+        "day": (day or date.today()).isoformat(),
+        "late_at": late_at.isoformat(),
+        "check_in_at": check_in_at.isoformat() if check_in_at else None,
+        "conf": round(float(confidence), 4),
+        "exp": datetime.utcnow() + timedelta(seconds=ttl),
+    }
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+
+def verify_ticket(token: str) -> AttendanceTicket:
+    try:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        if claims.get("typ") != TICKET_TYPE:
+            raise InvalidTicket("Not an attendance ticket")
+        employee_id, name, position, photo_url = claims["emp"]
+        return AttendanceTicket(
+            employee=EmployeeSnapshot(employee_id, name, position, photo_url),
+            mode=claims["mode"],
+            date=date.fromisoformat(claims["day"]),
+            late_at=datetime.fromisoformat(claims["late_at"]),
+            check_in_at=datetime.fromisoformat(claims["check_in_at"]) if claims["check_in_at"] else None,
+            confidence=float(claims["conf"]),
+        )
+    except (JWTError, KeyError, TypeError, ValueError) as e:
+        raise InvalidTicket(str(e))
@@ -0,0 +1,240 @@
+"""
+Enrollment Jobs - antrian background untuk encoding wajah saat upload.
+
+upload_face menyimpan foto lalu langsung mengembalikan job id; detektor CNN
++ encoding 5 jitter dijalankan executor background (process terpisah), lalu
+hasilnya ditulis ke FaceEmbedding dan cache. Status job disimpan di SQLite
+lokal (mode WAL) sehingga semua worker uvicorn di host yang sama bisa
+menjawab endpoint status, dan job yang tertinggal saat restart dijalankan
+ulang ketika startup. Tidak perlu broker eksternal.
+
+FACE_ENROLL_JOB_WORKERS=0 menjalankan encoding di thread background
+(tanpa process terpisah).
+"""
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Optional
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models.employee import Employee
+from app.models.face_embedding import FaceEmbedding
+from app.services.face_recognition import face_recognition_service
+from app.services.inference_pool import _init_worker, extract_encoding
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# Running jobs not updated for this long belong to a dead process
+JOB_STALE_SECONDS = 10 * 60
+# Finished jobs are kept this long for the status endpoint
+JOB_RETENTION_SECONDS = 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS enrollment_jobs (
+    id TEXT PRIMARY KEY,
+    employee_id INTEGER NOT NULL,
+    photo_path TEXT NOT NULL,
+    photo_url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    face_id INTEGER,
+    message TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class EnrollmentJobQueue:
+    def __init__(self, path: str, workers: int = 1):
+        self.path = path
+        self.workers = max(0, workers)
+        self._runner: Optional[ThreadPoolExecutor] = None
+        self._encoder: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived autocommit connection (one per call, safe across threads)."""
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def start(self):
+        """Create the job table and executors, then resume unfinished jobs."""
+        with self._lock:
+            if self._runner is not None:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(_SCHEMA)
+
+            self._runner = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="enroll-job")
+            if self.workers > 0:
+                self._encoder = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker
+                )
+
+        self._resume()
+
+    def shutdown(self):
+        with self._lock:
+            if self._runner is not None:
+                self._runner.shutdown(wait=False, cancel_futures=True)
+                self._runner = None
+            if self._encoder is not None:
+                self._encoder.shutdown(wait=False, cancel_futures=True)
+                self._encoder = None
+
+    def _resume(self):
+        """Requeue pending jobs and jobs orphaned by a crashed process."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE enrollment_jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (JOB_PENDING, now, JOB_RUNNING, now - JOB_STALE_SECONDS)
+            )
+            pending = [row["id"] for row in conn.execute(
+                "SELECT id FROM enrollment_jobs WHERE status = ? ORDER BY created_at", (JOB_PENDING,)
+            )]
+        for job_id in pending:
+            self._runner.submit(self._run, job_id)
+        if pending:
+            logger.info(f"Resumed {len(pending)} enrollment jobs")
+
+    def submit(self, employee_id: int, photo_path: str, photo_url: str) -> dict:
+        """Queue a saved photo for encoding. Returns the job record."""
+        self.start()
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM enrollment_jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (JOB_DONE, JOB_FAILED, now - JOB_RETENTION_SECONDS)
+            )
+            conn.execute(
+                "INSERT INTO enrollment_jobs (id, employee_id, photo_path, photo_url, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, employee_id, photo_path, photo_url, JOB_PENDING, now, now)
+            )
+        self._runner.submit(self._run, job_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM enrollment_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def _claim(self, job_id: str) -> bool:
+        """Atomically move a job to running (several API workers may try)."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE enrollment_jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (JOB_RUNNING, time.time(), job_id, JOB_PENDING)
+            )
+            return cursor.rowcount == 1
+
+    def _finish(self, job_id: str, status: str, message: str, face_id: Optional[int] = None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE enrollment_jobs SET status = ?, message = ?, face_id = ?, updated_at = ? WHERE id = ?",
+                (status, message, face_id, time.time(), job_id)
+            )
+
+    def _encode(self, image_data: bytes):
+        """CNN detection + 5-jitter encoding, in the process pool if configured."""
+        encoder = self._encoder
+        if encoder is None:
+            return extract_encoding(image_data, True, 5)
+        try:
+            return encoder.submit(extract_encoding, image_data, True, 5).result()
+        except BrokenProcessPool:
+            with self._lock:
+                # Several jobs may see the same broken pool - replace it once
+                if self._encoder is encoder:
+                    logger.warning("Enrollment encoder broken, restarting")
+                    encoder.shutdown(wait=False, cancel_futures=True)
+                    self._encoder = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker
+                    )
+            raise
+
+    def _run(self, job_id: str):
+        if not self._claim(job_id):
+            return
+        job = self.get(job_id)
+
+        try:
+            with open(job["photo_path"], "rb") as f:
+                image_data = f.read()
+
+            _, encoding = self._encode(image_data)
+            if encoding is None:
+                os.remove(job["photo_path"])
+                self._finish(job_id, JOB_FAILED, "Wajah tidak terdeteksi dalam gambar")
+                return
+
+            face_id = self._save(job, encoding.tobytes())
+            if face_id is None:
+                os.remove(job["photo_path"])
+                self._finish(job_id, JOB_FAILED, "Pegawai tidak ditemukan")
+                return
+            self._finish(job_id, JOB_DONE, "Foto wajah berhasil disimpan", face_id)
+        except Exception as e:
+            logger.exception(f"Enrollment job {job_id} failed")
+            self._finish(job_id, JOB_FAILED, f"Gagal memproses foto: {e}")
+
+    def _save(self, job: dict, embedding: bytes) -> Optional[int]:
+        """Insert the FaceEmbedding and patch the recognition cache."""
+        db = SessionLocal()
+        try:
+            employee = db.query(Employee).filter(Employee.id == job["employee_id"]).first()
+            if not employee:
+                return None
+
+            existing_count = db.query(FaceEmbedding).filter(
+                FaceEmbedding.employee_id == employee.id
+            ).count()
+
+            face_embedding = FaceEmbedding(
+                employee_id=employee.id,
+                embedding=embedding,
+                photo_url=job["photo_url"],
+                is_primary=existing_count == 0
+            )
+            db.add(face_embedding)
+            db.commit()
+            db.refresh(face_embedding)
+
+            # Patch the cache with the new face (no full reload)
+            face_recognition_service.add_embedding(face_embedding.id, employee.id, embedding, employee)
+            return face_embedding.id
+        finally:
+            db.close()
+
+
+enrollment_jobs = EnrollmentJobQueue(
+    path=settings.FACE_ENROLL_JOB_DB,
+    workers=settings.FACE_ENROLL_JOB_WORKERS
+)
@@ -0,0 +1,239 @@
+"""
+Face Enrollment - enrollment wajah massal dari arsip zip.
+
+Struktur arsip: satu folder per pegawai dengan nama folder = NIK
+(boleh dibungkus satu folder induk):
+
+    3201010101010001/depan.jpg
+    3201010101010001/samping.png
+    3201010101010002/foto.jpg
+
+Foto di-encode di inference pool bersama (CNN + num_jitters=5, sama dengan
+upload satuan; paralelisme = FACE_INFERENCE_WORKERS). Enrollment hanya
+memakai slot worker, antrian pool tetap tersedia untuk recognize kiosk.
+Embedding disimpan ke FaceEmbedding per batch (satu commit + satu delta
+cache per batch) dan progress tiap file di-stream sebagai NDJSON.
+"""
+import asyncio
+import io
+import json
+import os
+import uuid
+import zipfile
+from pathlib import PurePosixPath
+from typing import AsyncIterator, Dict, List, NamedTuple, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.database import SessionLocal
+from app.models.audit_log import AuditAction, EntityType
+from app.models.employee import Employee
+from app.models.face_embedding import FaceEmbedding
+from app.services.face_recognition import face_recognition_service
+from app.services.inference_pool import InferencePoolSaturated, extract_encoding, inference_pool
+from app.utils.audit import log_audit
+from app.utils.file_validation import MAX_IMAGE_SIZE, has_image_magic
+
+BULK_MAX_ARCHIVE_SIZE = 200 * 1024 * 1024  # 200MB
+BULK_MAX_FILES = 2000
+BULK_INSERT_BATCH = 25
+BULK_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+BULK_IMAGE_TYPES = ["image/jpeg", "image/png"]
+# Wait before retrying when kiosk traffic fills the shared inference pool
+BULK_SATURATED_RETRY_DELAY = 0.5
+
+
+class BulkEntry(NamedTuple):
+    filename: str
+    nik: str
+    size: int
+
+
+class EncodedFace(NamedTuple):
+    entry: BulkEntry
+    image_data: bytes
+    embedding: bytes
+
+
+def read_archive(archive_data: bytes) -> Tuple[zipfile.ZipFile, List[BulkEntry]]:
+    """
+    Open the zip and list image entries with their NIK (parent folder name).
+    Raises zipfile.BadZipFile for invalid archives and ValueError when the
+    archive has too many files.
+    """
+    archive = zipfile.ZipFile(io.BytesIO(archive_data))
+    entries = []
+    for info in archive.infolist():
+        path = PurePosixPath(info.filename)
+        if info.is_dir() or "__MACOSX" in path.parts or path.name.startswith("."):
+            continue
+        if path.suffix.lower() not in BULK_IMAGE_EXTENSIONS or len(path.parts) < 2:
+            continue
+        entries.append(BulkEntry(info.filename, path.parent.name.strip(), info.file_size))
+
+    if len(entries) > BULK_MAX_FILES:
+        raise ValueError(f"Maksimal {BULK_MAX_FILES} foto per arsip")
+    return archive, entries
+
+
+def _line(**fields) -> str:
+    return json.dumps(fields) + "\n"
+
+
+def _load_targets(db, entries: List[BulkEntry]) -> Tuple[Dict[str, Employee], Set[int]]:
+    """Employees by NIK (active only) and ids of employees that already have a face."""
+    niks = {entry.nik for entry in entries}
+    employees = {
+        emp.nik: emp
+        for emp in db.query(Employee).filter(Employee.nik.in_(niks), Employee.is_active == True).all()
+    }
+    employee_ids = [emp.id for emp in employees.values()]
+    with_faces = {
+        row[0]
+        for row in db.query(FaceEmbedding.employee_id).filter(
+            FaceEmbedding.employee_id.in_(employee_ids)
+        ).distinct()
+    } if employee_ids else set()
+    return employees, with_faces
+
+
+def _insert_batch(
+    db,
+    batch: List[EncodedFace],
+    employees: Dict[str, Employee],
+    with_faces: Set[int],
+    upload_dir: str
+) -> List[Tuple[str, int]]:
+    """Save photos and insert one batch of embeddings. Returns (filename, face_id) pairs."""
+    os.makedirs(upload_dir, exist_ok=True)
+    rows = []
+    for face in batch:
+        employee = employees[face.entry.nik]
+        ext = PurePosixPath(face.entry.filename).suffix.lower().lstrip(".")
+        filename = f"{uuid.uuid4()}.{ext}"
+        with open(os.path.join(upload_dir, filename), "wb") as f:
+            f.write(face.image_data)
+
+        rows.append(FaceEmbedding(
+            employee_id=employee.id,
+            embedding=face.embedding,
+            photo_url=f"/uploads/faces/{filename}",
+            is_primary=employee.id not in with_faces
+        ))
+        with_faces.add(employee.id)
+
+    db.add_all(rows)
+    db.commit()
+
+    # One cache delta for the whole batch
+    batch_employees = {employees[face.entry.nik].id: employees[face.entry.nik] for face in batch}
+    face_recognition_service.add_embeddings(
+        [(row.id, row.employee_id, row.embedding) for row in rows],
+        batch_employees
+    )
+    return [(face.entry.filename, row.id) for face, row in zip(batch, rows)]
+
+
+async def _encode_when_free(image_data: bytes):
+    """CNN encoding in the shared inference pool, waiting while it is saturated."""
+    while True:
+        try:
+            return await inference_pool.run(extract_encoding, image_data, True, 5)
+        except InferencePoolSaturated:
+            await asyncio.sleep(BULK_SATURATED_RETRY_DELAY)
+
+
+async def stream_bulk_enrollment(
+    archive: zipfile.ZipFile,
+    entries: List[BulkEntry],
+    performed_by: str,
+    upload_dir: str
+) -> AsyncIterator[str]:
+    """
+    Encode every entry in parallel and yield NDJSON progress lines:
+        {"type": "file", "file", "nik", "status": "ok"|"error", "detail"}
+        {"type": "batch", "saved": [{"file", "face_id"}]}
+        {"type": "summary", "total", "enrolled", "failed"}
+    Uses its own DB session - the request session is closed before streaming.
+    """
+    # Employees are handed to the recognition cache - keep them loaded across batch commits
+    db = SessionLocal(expire_on_commit=False)
+    tasks: List[asyncio.Future] = []
+    enrolled = failed = 0
+
+    try:
+        employees, with_faces = await run_in_threadpool(_load_targets, db, entries)
+
+        # Entries without a matching employee fail without encoding
+        encodable = []
+        for entry in entries:
+            if entry.nik not in employees:
+                failed += 1
+                yield _line(type="file", file=entry.filename, nik=entry.nik, status="error",
+                            detail="Pegawai dengan NIK ini tidak ditemukan")
+            elif entry.size > MAX_IMAGE_SIZE:
+                failed += 1
+                yield _line(type="file", file=entry.filename, nik=entry.nik, status="error",
+                            detail=f"Ukuran file maksimal {MAX_IMAGE_SIZE // (1024 * 1024)}MB")
+            else:
+                encodable.append(entry)
+
+        # One job per inference worker; the pool queue stays free for recognize
+        slots = asyncio.Semaphore(max(1, inference_pool.workers))
+
+        async def encode(entry: BulkEntry):
+            async with slots:
+                # Decompressing a large entry must not block the event loop
+                image_data = await run_in_threadpool(archive.read, entry.filename)
+                if not has_image_magic(image_data, BULK_IMAGE_TYPES):
+                    return entry, None, "File tidak valid atau rusak"
+                try:
+                    _, encoding = await _encode_when_free(image_data)
+                except Exception as e:
+                    return entry, None, f"Gagal memproses foto: {e}"
+                if encoding is None:
+                    return entry, None, "Wajah tidak terdeteksi dalam gambar"
+                return entry, EncodedFace(entry, image_data, encoding.tobytes()), None
+
+        tasks = [asyncio.ensure_future(encode(entry)) for entry in encodable]
+        batch: List[EncodedFace] = []
+
+        for next_done in asyncio.as_completed(tasks):
+            entry, face, error = await next_done
+            if error:
+                failed += 1
+                yield _line(type="file", file=entry.filename, nik=entry.nik, status="error", detail=error)
+                continue
+
+            batch.append(face)
+            yield _line(type="file", file=entry.filename, nik=entry.nik, status="ok",
+                        detail=employees[entry.nik].name)
+
+            if len(batch) >= BULK_INSERT_BATCH:
+                saved = await run_in_threadpool(_insert_batch, db, batch, employees, with_faces, upload_dir)
+                enrolled += len(saved)
+                batch = []
+                yield _line(type="batch", saved=[{"file": f, "face_id": i} for f, i in saved])
+
+        if batch:
+            saved = await run_in_threadpool(_insert_batch, db, batch, employees, with_faces, upload_dir)
+            enrolled += len(saved)
+            yield _line(type="batch", saved=[{"file": f, "face_id": i} for f, i in saved])
+
+        await run_in_threadpool(
+            log_audit,
+            db=db,
+            action=AuditAction.CREATE,
+            entity_type=EntityType.EMPLOYEE,
+            entity_id=None,
+            description=f"Enrollment wajah massal: {enrolled} foto",
+            performed_by=performed_by,
+            details={"total": len(entries), "enrolled": enrolled, "failed": failed}
+        )
+        yield _line(type="summary", total=len(entries), enrolled=enrolled, failed=failed)
+    finally:
+        # Client disconnected or finished - stop outstanding work
+        for task in tasks:
+            task.cancel()
+        archive.close()
+        db.close()
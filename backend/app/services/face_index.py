@@ -0,0 +1,249 @@
+"""
+Face Embedding Index - pencarian nearest-neighbour untuk galeri wajah besar.
+
+Implementasi dengan interface yang sama:
+- ExactIndex:     brute-force (hasil persis sama dengan scan penuh)
+- IVFIndex:       inverted file index (k-means partitioning). Hanya nprobe partisi
+                  terdekat yang di-scan, jadi latency turun drastis pada galeri
+                  100k+ wajah dengan recall yang bisa diatur lewat nprobe.
+
+Index hanya memegang referensi ke matrix milik FaceRecognitionService dan
+mengembalikan nomor baris, sehingga mapping baris -> pegawai tetap di service.
+`nbytes` hanya menghitung memori milik index sendiri (matrix tidak disalin).
+Setelah perubahan kecil (tambah/hapus embedding) service memanggil rebuild()
+dengan mapping baris lama -> baru, sehingga IVF tidak perlu training ulang.
+"""
+from typing import Optional, Tuple
+import numpy as np
+
+
+def _squared_distances(queries: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+    """Squared Euclidean distances (Q x N) via |a|^2 + |b|^2 - 2ab."""
+    q_norms = np.einsum('ij,ij->i', queries, queries)
+    sq = sq_norms[np.newaxis, :] - 2.0 * (queries @ matrix.T) + q_norms[:, np.newaxis]
+    np.maximum(sq, 0.0, out=sq)
+    return sq
+
+
+def _top_k(distances: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k smallest values, sorted ascending."""
+    if k >= len(distances):
+        return np.argsort(distances)
+    part = np.argpartition(distances, k - 1)[:k]
+    return part[np.argsort(distances[part])]
+
+
+class ExactIndex:
+    """Brute-force search over every row. Also used as fallback by IVFIndex."""
+
+    name = "exact"
+    exact = True
+
+    def __init__(self):
+        self._matrix: np.ndarray = np.empty((0, 128), dtype=np.float32)
+        self._sq_norms: np.ndarray = np.empty(0, dtype=np.float32)
+
+    def build(self, matrix: np.ndarray, sq_norms: np.ndarray):
+        self._matrix = matrix
+        self._sq_norms = sq_norms
+
+    def __len__(self) -> int:
+        return len(self._matrix)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held on top of the service matrix (none: rows are scanned in place)."""
+        return 0
+
+    def rebuild(self, matrix: np.ndarray, sq_norms: np.ndarray, old_rows: np.ndarray) -> "ExactIndex":
+        """New index over a patched matrix (old_rows[i] = previous row of row i, -1 if new)."""
+        index = ExactIndex()
+        index.build(matrix, sq_norms)
+        return index
+
+    def search(self, query: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows, distances) of the k nearest rows, nearest first."""
+        if len(self._matrix) == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        query = np.ascontiguousarray(query, dtype=np.float32).reshape(1, -1)
+        sq = _squared_distances(query, self._matrix, self._sq_norms)[0]
+        rows = _top_k(sq, k)
+        return rows, np.sqrt(sq[rows])
+
+
+class IVFIndex:
+    """
+    Inverted file index dengan k-means partitioning (tanpa dependency tambahan).
+
+    Args:
+        nlist: jumlah partisi (0 = otomatis, ~sqrt(N))
+        nprobe: jumlah partisi yang di-scan per query (lebih besar = recall
+                lebih tinggi tapi lebih lambat; nprobe >= nlist = exact)
+        min_size: di bawah jumlah baris ini pakai exact search
+        train_size: jumlah sampel untuk training k-means (0 = otomatis, 64 per partisi)
+        iterations: jumlah iterasi k-means
+    """
+
+    name = "ivf"
+    exact = False
+
+    def __init__(
+        self,
+        nlist: int = 0,
+        nprobe: int = 8,
+        min_size: int = 20000,
+        train_size: int = 0,
+        iterations: int = 10,
+        seed: int = 0
+    ):
+        self.nlist = nlist
+        self.nprobe = max(1, nprobe)
+        self.min_size = min_size
+        self.train_size = train_size
+        self.iterations = iterations
+        self.seed = seed
+
+        self._fallback = ExactIndex()
+        self._matrix: np.ndarray = np.empty((0, 128), dtype=np.float32)
+        self._sq_norms: np.ndarray = np.empty(0, dtype=np.float32)
+        self._centroids: Optional[np.ndarray] = None
+        self._centroid_sq_norms: Optional[np.ndarray] = None
+        self._trained_size = 0
+        # Partition of every row, plus rows grouped by partition:
+        # rows of list i are _list_rows[_list_offsets[i]:_list_offsets[i + 1]]
+        self._assign_rows: np.ndarray = np.empty(0, dtype=np.intp)
+        self._list_rows: np.ndarray = np.empty(0, dtype=np.intp)
+        self._list_offsets: np.ndarray = np.zeros(1, dtype=np.intp)
+
+    def __len__(self) -> int:
+        return len(self._matrix)
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held on top of the service matrix: centroids and partition lists."""
+        if not self.trained:
+            return 0
+        return (
+            self._centroids.nbytes + self._centroid_sq_norms.nbytes + self._assign_rows.nbytes
+            + self._list_rows.nbytes + self._list_offsets.nbytes
+        )
+
+    def _train(self, matrix: np.ndarray, nlist: int) -> np.ndarray:
+        """Lloyd's k-means on a random sample of the matrix."""
+        rng = np.random.default_rng(self.seed)
+        train_size = self.train_size or nlist * 64
+        if len(matrix) > train_size:
+            sample = matrix[rng.choice(len(matrix), train_size, replace=False)]
+        else:
+            sample = matrix
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.iterations):
+            c_sq = np.einsum('ij,ij->i', centroids, centroids)
+            assign = np.argmin(_squared_distances(sample, centroids, c_sq), axis=1)
+            counts = np.bincount(assign, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            non_empty = counts > 0
+            centroids[non_empty] = sums[non_empty] / counts[non_empty, np.newaxis]
+            # Re-seed empty partitions with random sample points
+            empty = np.flatnonzero(~non_empty)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+        return centroids
+
+    def _assign(self, matrix: np.ndarray, sq_norms: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        """Nearest centroid for every row (chunked to bound the Q x nlist temporary)."""
+        assign = np.empty(len(matrix), dtype=np.intp)
+        for start in range(0, len(matrix), chunk):
+            block = matrix[start:start + chunk]
+            sq = _squared_distances(self._centroids, block, sq_norms[start:start + chunk])
+            assign[start:start + chunk] = np.argmin(sq, axis=0)
+        return assign
+
+    def _set_lists(self, assign: np.ndarray):
+        self._assign_rows = assign
+        self._list_rows = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=len(self._centroids))
+        self._list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.intp)
+
+    def build(self, matrix: np.ndarray, sq_norms: np.ndarray):
+        self._matrix = matrix
+        self._sq_norms = sq_norms
+        self._fallback.build(matrix, sq_norms)
+
+        if len(matrix) < max(self.min_size, 1):
+            self._centroids = None
+            return
+
+        nlist = self.nlist or int(np.sqrt(len(matrix)))
+        nlist = max(1, min(nlist, len(matrix)))
+
+        self._centroids = self._train(matrix, nlist)
+        self._centroid_sq_norms = np.einsum('ij,ij->i', self._centroids, self._centroids)
+        self._trained_size = len(matrix)
+        self._set_lists(self._assign(matrix, sq_norms))
+
+    def rebuild(self, matrix: np.ndarray, sq_norms: np.ndarray, old_rows: np.ndarray) -> "IVFIndex":
+        """
+        New index over a patched matrix, reusing the trained centroids.
+        Existing rows keep their partition, only new rows (old_rows == -1)
+        are assigned. Retrains when the gallery doubled since training.
+        """
+        index = IVFIndex(self.nlist, self.nprobe, self.min_size, self.train_size, self.iterations, self.seed)
+        if not self.trained or len(matrix) < max(self.min_size, 1) or len(matrix) > 2 * self._trained_size:
+            index.build(matrix, sq_norms)
+            return index
+
+        index._matrix = matrix
+        index._sq_norms = sq_norms
+        index._fallback.build(matrix, sq_norms)
+        index._centroids = self._centroids
+        index._centroid_sq_norms = self._centroid_sq_norms
+        index._trained_size = self._trained_size
+
+        assign = np.empty(len(matrix), dtype=np.intp)
+        existing = old_rows >= 0
+        assign[existing] = self._assign_rows[old_rows[existing]]
+        if not existing.all():
+            added = np.flatnonzero(~existing)
+            assign[added] = index._assign(matrix[added], sq_norms[added])
+        index._set_lists(assign)
+        return index
+
+    def search(self, query: np.ndarray, k: int = 1, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows, distances) of the k nearest rows found in the nprobe closest partitions."""
+        nprobe = nprobe or self.nprobe
+        if not self.trained or nprobe >= len(self._centroids):
+            return self._fallback.search(query, k)
+
+        query = np.ascontiguousarray(query, dtype=np.float32).reshape(1, -1)
+        c_sq = _squared_distances(query, self._centroids, self._centroid_sq_norms)[0]
+        probes = _top_k(c_sq, nprobe)
+
+        candidates = np.concatenate([
+            self._list_rows[self._list_offsets[p]:self._list_offsets[p + 1]] for p in probes
+        ])
+        if len(candidates) == 0:
+            return self._fallback.search(query, k)
+
+        sq = _squared_distances(query, self._matrix[candidates], self._sq_norms[candidates])[0]
+        best = _top_k(sq, k)
+        return candidates[best], np.sqrt(sq[best])
+
+
+def create_index(kind: str = "exact", **params):
+    """
+    Create an index by name ("exact" or "ivf"). Unknown names fall
+    back to exact. params holds settings for every kind; each index takes
+    only its own.
+    """
+    if kind == "ivf":
+        return IVFIndex(**{k: v for k, v in params.items() if k in ("nlist", "nprobe", "min_size")})
+    if kind != "exact":
+        print(f"[Index] Unknown index type '{kind}', using exact search")
+    return ExactIndex()
@@ -6,24 +6,133 @@ OPTIMIZATIONS:
 - Memory caching untuk embeddings (50-70% lebih cepat)
 - NumPy batch comparison (2-5x lebih cepat)
 - Image resizing untuk gambar besar (2-3x lebih cepat)
+- Single-pass pipeline (decode + deteksi sekali) untuk recognize
+- Matrix float32 kontigu + reduksi per-pegawai tervektorisasi
+- Index ANN opsional (IVF) untuk galeri besar, fallback ke exact search
+- Inference dlib di process pool terpisah (event loop tidak terblokir)
+- Matrix dibagi antar worker lewat shared memory (mmap + generation counter)
+- Operasi delta (tambah/hapus embedding, nonaktifkan pegawai) tanpa reload DB
+- Perubahan disebarkan ke node lain lewat Redis pub/sub
+- Recognize multi-frame (burst) dengan satu perhitungan jarak matrix-vs-matrix
+- Decode JPEG dengan DCT scaling (tidak decode penuh frame 1080p)
+- Hint bounding box dari klien: deteksi hanya di crop wajah, fallback ke full frame
+- Prefilter centroid per pegawai, rerank embedding hanya untuk top-k pegawai
+- Model dlib dimuat lazy, warm-up model + cache di background thread
+- Histogram latency per tahap (decode/detect/encode/match/cache/DB) di /metrics
+- Load cache dengan query kolom saja (streamed) langsung ke matrix prealokasi
+- Cache pegawai berupa snapshot immutable (bukan objek ORM dari session tertutup)
+- Micro-batching matching untuk request recognize yang datang bersamaan
 """
+import asyncio
+import base64
+import importlib.util
 import io
 import struct
-from typing import Optional, Tuple, Dict, List
+import threading
+import time
+import uuid
+from functools import partial
+from typing import Optional, Tuple, Dict, List, NamedTuple
 import numpy as np
 from PIL import Image
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.cache import publish_message, subscribe_messages
+from app.config import get_settings
 from app.models.employee import Employee
 from app.models.face_embedding import FaceEmbedding
+from app.services.face_index import create_index
+from app.services.face_store import create_store
+from app.services.match_batcher import MatchBatcher
+from app.services.metrics import stage_metrics
+from app.services.inference_pool import inference_pool, extract_encoding, InferencePoolSaturated
+
+settings = get_settings()
 
 try:
-    import face_recognition
-    FACE_RECOGNITION_AVAILABLE = True
-    print("INFO: face_recognition library loaded successfully (deep learning mode)")
+    import cv2
+    OPENCV_AVAILABLE = True
 except ImportError:
-    FACE_RECOGNITION_AVAILABLE = False
+    OPENCV_AVAILABLE = False
+
+# Only check that the library is installed - importing it loads the dlib
+# models (seconds), which is deferred to load_face_engine()
+FACE_RECOGNITION_AVAILABLE = importlib.util.find_spec("face_recognition") is not None
+if FACE_RECOGNITION_AVAILABLE:
+    print("INFO: face_recognition library found (deep learning mode, models load lazily)")
+else:
     print("WARNING: face_recognition not installed. Face recognition disabled.")
 
+_face_engine = None
+_face_engine_lock = threading.Lock()
+
+
+def load_face_engine():
+    """Import face_recognition (loads dlib models) once per process, thread-safe."""
+    global _face_engine
+    if _face_engine is None:
+        with _face_engine_lock:
+            if _face_engine is None:
+                import face_recognition
+                _face_engine = face_recognition
+                print("INFO: face_recognition models loaded")
+    return _face_engine
+
+
+def face_engine_loaded() -> bool:
+    return _face_engine is not None
+
+
+EMBEDDING_DIM = 128
+EMBEDDING_BYTES = EMBEDDING_DIM * 4  # 512 bytes (float32)
+
+# Client face box hint: padding per side (fraction of box size) and minimum crop size
+FACE_HINT_PADDING = 0.3
+FACE_HINT_MIN_PIXELS = 40
+
+# Rows fetched per round trip when loading the embedding cache
+LOAD_BATCH_ROWS = 2000
+
+# Normalized (x, y, width, height) of a face box relative to the frame
+FaceBox = Tuple[float, float, float, float]
+
+# Redis pub/sub channel for cache change events between API nodes
+FACE_EVENTS_CHANNEL = "face:cache:events"
+
+
+class EmployeeSnapshot(NamedTuple):
+    """Data pegawai yang disimpan di cache (immutable, tanpa state ORM/session)."""
+    id: int
+    name: str
+    position: str
+    photo_url: Optional[str]
+    is_active: bool = True
+    
+    @classmethod
+    def from_employee(cls, employee) -> "EmployeeSnapshot":
+        if isinstance(employee, cls):
+            return employee
+        return cls(employee.id, employee.name, employee.position, employee.photo_url, employee.is_active)
+
+
+class RecognitionResult(NamedTuple):
+    """Hasil pipeline recognize: lokasi wajah, encoding, dan employee yang cocok."""
+    face_detected: bool
+    face_locations: List[Tuple[int, int, int, int]]
+    encoding: Optional[np.ndarray]
+    employee: Optional[EmployeeSnapshot]
+    score: float
+
+
+class BurstRecognitionResult(NamedTuple):
+    """Hasil recognize multi-frame: jumlah frame, wajah terdeteksi, employee, skor, dan vote."""
+    frames: int
+    faces_detected: int
+    employee: Optional[EmployeeSnapshot]
+    score: float
+    votes: int
+
 
 class FaceRecognitionService:
     def __init__(self):
@@ -33,26 +142,91 @@ class FaceRecognitionService:
         self.tolerance = 0.5
         
         # === OPTIMIZATION 1: Memory Cache ===
-        self._embedding_cache: Dict[int, List[dict]] = {}  # employee_id -> list of embeddings
+        # Contiguous (N x 128) float32 matrix, rows sorted by employee_id.
+        # Parallel arrays map each row back to its employee / FaceEmbedding.
+        self._matrix: np.ndarray = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self._sq_norms: np.ndarray = np.empty(0, dtype=np.float32)
+        self._employee_ids: np.ndarray = np.empty(0, dtype=np.int32)
+        self._face_ids: np.ndarray = np.empty(0, dtype=np.int32)
+        # Start row of each employee's block + the employee_id of that block
+        # (input for np.minimum.reduceat)
+        self._group_starts: np.ndarray = np.empty(0, dtype=np.intp)
+        self._group_employee_ids: np.ndarray = np.empty(0, dtype=np.int32)
+        self._employees: Dict[int, EmployeeSnapshot] = {}
+        # Unit-length mean direction of each employee block (prefilter stage),
+        # None when FACE_CENTROID_TOP_K=0
+        self._centroid_top_k: int = settings.FACE_CENTROID_TOP_K
+        self._centroids: Optional[np.ndarray] = None
+        # Nearest-neighbour index over the matrix (FACE_INDEX=exact|ivf)
+        self._index = self._create_index()
+        self._cache_lock = threading.RLock()
         self._cache_version: int = 0
         self._cache_initialized: bool = False
+        
+        # Shared across uvicorn workers (None = per-process cache)
+        self._store = create_store(
+            settings.FACE_SHARED_CACHE,
+            settings.FACE_SHARED_CACHE_DIR,
+            settings.DATABASE_URL
+        )
+        self._cache_generation: int = -1
+        
+        # Background warm-up state (see start_warm_up / readiness)
+        self._warm_up_thread: Optional[threading.Thread] = None
+        self._warm_up_error: Optional[str] = None
+        
+        # Concurrent recognize_async calls are matched together (FACE_BATCH_WINDOW_MS=0 disables)
+        self._batcher = MatchBatcher(
+            self._match_batch_session,
+            window_ms=settings.FACE_BATCH_WINDOW_MS,
+            max_size=settings.FACE_BATCH_MAX_SIZE
+        )
+        
+        # Change events from other nodes (see start_change_listener)
+        self._node_id = uuid.uuid4().hex
+        self._listener: Optional[threading.Thread] = None
+        self._listener_stop = threading.Event()
     
+    def _create_index(self):
+        """Create an empty index configured from settings."""
+        return create_index(
+            settings.FACE_INDEX,
+            nlist=settings.FACE_INDEX_NLIST,
+            nprobe=settings.FACE_INDEX_NPROBE,
+            min_size=settings.FACE_INDEX_MIN_SIZE
+        )
+    
+    @stage_metrics.timed("decode")
     def _load_image(self, image_data: bytes, max_size: int = 640) -> Optional[np.ndarray]:
         """
         Load image from bytes to numpy array (RGB format for face_recognition).
         
         === OPTIMIZATION 3: Image Resizing ===
         Resize large images to max_size for faster processing.
+        JPEG is downscaled while decoding (DCT scaling 1/2, 1/4, 1/8) so a
+        1080p kiosk frame is never fully decoded, then the remainder is done
+        with a cheap area/bilinear filter.
         """
         try:
+            # Header only - pixels are not decoded yet
             image = Image.open(io.BytesIO(image_data))
+            width, height = image.size
+            is_jpeg = image.format == 'JPEG'
+            
+            if OPENCV_AVAILABLE:
+                array = self._decode_cv2(image_data, max(width, height), max_size, is_jpeg)
+                if array is not None:
+                    if max(width, height) > max_size:
+                        print(f"Image resized from {(width, height)} to {(array.shape[1], array.shape[0])}")
+                    return array
             
-            # Resize if too large (optimization)
             if max(image.size) > max_size:
                 ratio = max_size / max(image.size)
                 new_size = (int(image.width * ratio), int(image.height * ratio))
-                image = image.resize(new_size, Image.LANCZOS)
-                print(f"Image resized from {image.size} to {new_size}")
+                if is_jpeg:
+                    image.draft('RGB', new_size)
+                image = image.resize(new_size, Image.BILINEAR, reducing_gap=2.0)
+                print(f"Image resized from {(width, height)} to {new_size}")
             
             if image.mode != 'RGB':
                 image = image.convert('RGB')
@@ -61,53 +235,577 @@ class FaceRecognitionService:
             print(f"Error loading image: {e}")
             return None
     
+    def _decode_cv2(self, image_data: bytes, longest: int, max_size: int, is_jpeg: bool) -> Optional[np.ndarray]:
+        """
+        Decode with OpenCV into a writable RGB array (no PIL -> numpy copy).
+        Returns None if OpenCV cannot decode the data.
+        """
+        flags = cv2.IMREAD_COLOR
+        if is_jpeg:
+            # Largest DCT reduction that keeps the image >= max_size
+            for factor, reduced in ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                                    (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                    (2, cv2.IMREAD_REDUCED_COLOR_2)):
+                if longest // factor >= max_size:
+                    flags = reduced
+                    break
+        
+        # Ignore EXIF orientation, same as the PIL path / enrollment photos
+        array = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+        if array is None:
+            return None
+        
+        height, width = array.shape[:2]
+        if max(width, height) > max_size:
+            ratio = max_size / max(width, height)
+            new_size = (int(width * ratio), int(height * ratio))
+            array = cv2.resize(array, new_size, interpolation=cv2.INTER_AREA)
+        
+        # BGR -> RGB in place
+        return cv2.cvtColor(array, cv2.COLOR_BGR2RGB, dst=array)
+    
+    def _load_from_db(self, db: Session) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[int, EmployeeSnapshot]]:
+        """
+        Query active embeddings into (matrix, employee_ids, face_ids, employees).
+        
+        Selects plain columns (no ORM entities, no per-row lazy load of
+        fe.employee) in one streamed query and copies each embedding straight
+        into a matrix preallocated from a COUNT, so load time and peak memory
+        grow linearly with the gallery.
+        """
+        active = FaceEmbedding.employee_id == Employee.id
+        capacity = db.execute(
+            select(func.count(FaceEmbedding.id)).join(Employee, active).where(Employee.is_active == True)
+        ).scalar() or 0
+        
+        matrix = np.empty((capacity, EMBEDDING_DIM), dtype=np.float32)
+        employee_ids = np.empty(capacity, dtype=np.int32)
+        face_ids = np.empty(capacity, dtype=np.int32)
+        employees: Dict[int, EmployeeSnapshot] = {}
+        
+        rows = db.execute(
+            select(
+                FaceEmbedding.id, FaceEmbedding.employee_id, FaceEmbedding.embedding,
+                Employee.name, Employee.position, Employee.photo_url
+            )
+            .join(Employee, active)
+            .where(Employee.is_active == True)
+            .order_by(FaceEmbedding.employee_id, FaceEmbedding.id)
+            .execution_options(yield_per=LOAD_BATCH_ROWS)
+        )
+        
+        row = 0
+        for face_id, employee_id, embedding, name, position, photo_url in rows:
+            # Skip incompatible embeddings
+            if len(embedding) != EMBEDDING_BYTES:
+                continue
+            if row == capacity:
+                # Rows committed between the COUNT and the scan
+                capacity = max(1, capacity * 2)
+                matrix = np.resize(matrix, (capacity, EMBEDDING_DIM))
+                employee_ids = np.resize(employee_ids, capacity)
+                face_ids = np.resize(face_ids, capacity)
+            
+            # View the raw float32 bytes, copied into the row (also fine for
+            # an empty gallery, where a byte-cast memoryview fails)
+            matrix[row] = np.frombuffer(embedding, dtype=np.float32)
+            employee_ids[row] = employee_id
+            face_ids[row] = face_id
+            if employee_id not in employees:
+                employees[employee_id] = EmployeeSnapshot(employee_id, name, position, photo_url)
+            row += 1
+        
+        return matrix[:row], employee_ids[:row], face_ids[:row], employees
+    
+    @stage_metrics.timed("cache_refresh")
     def refresh_embedding_cache(self, db: Session) -> int:
         """
         === OPTIMIZATION 1: Memory Cache ===
-        Load all embeddings into memory for faster matching.
+        Load all embeddings into a contiguous matrix for faster matching.
+        With the shared store enabled the matrix is published for all workers.
         Returns number of embeddings cached.
         """
         if not self.enabled:
             return 0
         
         try:
-            embeddings = db.query(FaceEmbedding).join(Employee).filter(
-                Employee.is_active == True
-            ).all()
-            
-            self._embedding_cache = {}
-            expected_size = 128 * 4  # 512 bytes
-            
-            for fe in embeddings:
-                # Skip incompatible embeddings
-                if len(fe.embedding) != expected_size:
-                    continue
-                    
-                if fe.employee_id not in self._embedding_cache:
-                    self._embedding_cache[fe.employee_id] = []
-                
-                self._embedding_cache[fe.employee_id].append({
-                    'id': fe.id,
-                    'embedding': np.frombuffer(fe.embedding, dtype=np.float32).copy(),
-                    'employee': fe.employee,
-                    'is_primary': fe.is_primary
-                })
-            
-            self._cache_version += 1
-            self._cache_initialized = True
+            if self._store is None:
+                matrix, employee_ids, face_ids, employees = self._load_from_db(db)
+                self._set_matrix(matrix, employee_ids, face_ids, employees)
+            else:
+                with self._store.lock():
+                    generation = self._store.bump_generation()
+                    matrix, employee_ids, face_ids, employees = self._load_from_db(db)
+                    self._publish(generation, matrix, employee_ids, face_ids, employees)
             
-            total_embeddings = sum(len(v) for v in self._embedding_cache.values())
-            print(f"[Cache] Refreshed: {total_embeddings} embeddings for {len(self._embedding_cache)} employees")
+            print(f"[Cache] Refreshed: {len(matrix)} embeddings for {len(employees)} employees")
             
-            return total_embeddings
+            return len(matrix)
         except Exception as e:
             print(f"[Cache] Refresh error: {e}")
             return 0
     
-    def invalidate_cache(self):
-        """Invalidate cache to force refresh on next match."""
+    def _publish(
+        self,
+        generation: int,
+        matrix: np.ndarray,
+        employee_ids: np.ndarray,
+        face_ids: np.ndarray,
+        employees: Dict[int, EmployeeSnapshot],
+        old_rows: Optional[np.ndarray] = None
+    ):
+        """Write the matrix to the shared store and switch to the shared mapping."""
+        sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+        self._store.publish(generation, matrix, sq_norms, employee_ids, face_ids)
+        snapshot = self._store.load()
+        if snapshot is None or snapshot.generation != generation:
+            # Store unreadable - keep using the private copy
+            self._set_matrix(
+                matrix, employee_ids, face_ids, employees,
+                sq_norms=sq_norms, generation=generation, old_rows=old_rows
+            )
+            return
+        self._set_matrix(
+            snapshot.matrix, snapshot.employee_ids, snapshot.face_ids, employees,
+            sq_norms=snapshot.sq_norms, generation=generation, old_rows=old_rows
+        )
+    
+    def _ensure_cache(self, db: Session):
+        """
+        Make sure the local matrix is current before matching.
+        
+        Per-process mode: refresh once after invalidate_cache().
+        Shared mode: compare the shared generation counter (one memory read)
+        and remap the published file when another worker changed it. Only
+        when the published data is older than the counter does one worker
+        reload from DB (under the store lock) and publish for the others.
+        """
+        if self._store is None:
+            if not self._cache_initialized:
+                self.refresh_embedding_cache(db)
+            return
+        
+        generation = self._store.generation()
+        if self._cache_initialized and generation == self._cache_generation:
+            return
+        
+        with stage_metrics.time("cache_refresh"):
+            try:
+                snapshot = self._store.load()
+                if snapshot is None or snapshot.generation != generation:
+                    with self._store.lock():
+                        generation = self._store.generation()
+                        snapshot = self._store.load()
+                        if snapshot is None or snapshot.generation != generation:
+                            matrix, employee_ids, face_ids, employees = self._load_from_db(db)
+                            self._publish(generation, matrix, employee_ids, face_ids, employees)
+                            print(f"[SharedCache] Reloaded {len(matrix)} embeddings (generation {generation})")
+                            return
+                
+                # Employees are looked up by id on match (no ORM objects in shared memory)
+                self._set_matrix(
+                    snapshot.matrix, snapshot.employee_ids, snapshot.face_ids, {},
+                    sq_norms=snapshot.sq_norms, generation=snapshot.generation
+                )
+                print(f"[SharedCache] Mapped {len(snapshot.matrix)} embeddings (generation {snapshot.generation})")
+            except Exception as e:
+                print(f"[SharedCache] Sync error: {e}")
+    
+    def _set_matrix(
+        self,
+        matrix: np.ndarray,
+        employee_ids: np.ndarray,
+        face_ids: np.ndarray,
+        employees: Dict[int, EmployeeSnapshot],
+        sq_norms: Optional[np.ndarray] = None,
+        generation: int = -1,
+        old_rows: Optional[np.ndarray] = None
+    ):
+        """
+        Swap in a new embedding matrix (rows must be sorted by employee_id).
+        old_rows maps each row to its row in the current matrix (-1 = new row)
+        so the index can be patched instead of rebuilt.
+        """
+        if len(employee_ids):
+            boundaries = np.flatnonzero(np.diff(employee_ids)) + 1
+            group_starts = np.concatenate(([0], boundaries)).astype(np.intp)
+        else:
+            group_starts = np.empty(0, dtype=np.intp)
+        
+        # Build the index before swapping so readers never see a half-built one
+        if sq_norms is None:
+            sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+        centroids = self._build_centroids(matrix, sq_norms, group_starts) if self._centroid_top_k > 0 else None
+        if old_rows is not None:
+            index = self._index.rebuild(matrix, sq_norms, old_rows)
+        else:
+            index = self._create_index()
+            index.build(matrix, sq_norms)
+        
+        with self._cache_lock:
+            self._matrix = matrix
+            self._sq_norms = sq_norms
+            self._index = index
+            self._employee_ids = employee_ids
+            self._face_ids = face_ids
+            self._group_starts = group_starts
+            self._group_employee_ids = employee_ids[group_starts]
+            self._centroids = centroids
+            self._employees = employees
+            self._cache_version += 1
+            self._cache_generation = generation
+            self._cache_initialized = True
+    
+    def _build_centroids(self, matrix: np.ndarray, sq_norms: np.ndarray, group_starts: np.ndarray) -> np.ndarray:
+        """Per-employee centroid: mean of the unit-length embeddings, re-normalized."""
+        if len(matrix) == 0:
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        norms = np.sqrt(np.maximum(sq_norms, 1e-12))
+        centroids = np.add.reduceat(matrix / norms[:, np.newaxis], group_starts, axis=0)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        return centroids.astype(np.float32, copy=False)
+    
+    def _candidate_groups(self, encodings: np.ndarray, centroids: np.ndarray, top_k: int) -> np.ndarray:
+        """
+        Stage 1: indices of the top_k employee blocks by cosine similarity to
+        the centroids (union over frames), sorted ascending.
+        """
+        queries = encodings / np.maximum(np.linalg.norm(encodings, axis=1, keepdims=True), 1e-12)
+        similarities = queries @ centroids.T
+        top = np.argpartition(-similarities, top_k - 1, axis=1)[:, :top_k]
+        return np.unique(top)
+    
+    def _group_rows(self, groups: np.ndarray, group_starts: np.ndarray, total_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Matrix rows of the given employee blocks + start of each block within them."""
+        group_ends = np.append(group_starts[1:], total_rows)
+        lengths = group_ends[groups] - group_starts[groups]
+        local_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.intp)
+        rows = np.repeat(group_starts[groups] - local_starts, lengths) + np.arange(lengths.sum())
+        return rows, local_starts
+    
+    def invalidate_cache(self, broadcast: bool = True):
+        """Invalidate cache to force refresh on next match (in every worker and node)."""
         self._cache_initialized = False
+        if self._store is not None:
+            self._store.invalidate()
         print("[Cache] Invalidated")
+        if broadcast:
+            self._broadcast({"op": "reload"})
+    
+    # === Delta operations (enrollment changes without a full DB reload) ===
+    
+    def add_embedding(
+        self,
+        face_id: int,
+        employee_id: int,
+        embedding: Optional[bytes],
+        employee: Optional[Employee] = None,
+        broadcast: bool = True
+    ):
+        """Insert one new FaceEmbedding row into the cache (employee is stored as a snapshot)."""
+        if embedding is None or len(embedding) != EMBEDDING_BYTES:
+            return
+        if employee is not None:
+            if not employee.is_active:
+                return
+            employee = EmployeeSnapshot.from_employee(employee)
+        vector = np.frombuffer(embedding, dtype=np.float32)
+        
+        def patch(matrix, employee_ids, face_ids, employees):
+            if face_id in face_ids:
+                return None
+            # Keep rows sorted by employee_id: insert after the employee's last row
+            row = int(np.searchsorted(employee_ids, employee_id, side='right'))
+            old_rows = np.insert(np.arange(len(matrix), dtype=np.intp), row, -1)
+            if employee is not None:
+                employees = dict(employees)
+                employees[employee_id] = employee
+            return (
+                np.insert(matrix, row, vector, axis=0),
+                np.insert(employee_ids, row, employee_id),
+                np.insert(face_ids, row, face_id),
+                employees,
+                old_rows
+            )
+        
+        self._apply_delta(patch, f"add face {face_id} (employee {employee_id})")
+        if broadcast:
+            self._broadcast({
+                "op": "add",
+                "face_id": face_id,
+                "employee_id": employee_id,
+                "embedding": base64.b64encode(embedding).decode("ascii")
+            })
+    
+    def add_embeddings(
+        self,
+        faces: List[Tuple[int, int, bytes]],
+        employees: Optional[Dict[int, Employee]] = None,
+        broadcast: bool = True
+    ):
+        """
+        Insert many (face_id, employee_id, embedding) rows with one delta
+        (bulk enrollment) instead of one matrix copy per face.
+        """
+        faces = [f for f in faces if f[2] is not None and len(f[2]) == EMBEDDING_BYTES]
+        if employees:
+            employees = {
+                employee_id: EmployeeSnapshot.from_employee(employee)
+                for employee_id, employee in employees.items()
+            }
+            faces = [f for f in faces if f[1] not in employees or employees[f[1]].is_active]
+        if not faces:
+            return
+        
+        def patch(matrix, employee_ids, face_ids, cached_employees):
+            new = [f for f in faces if f[0] not in face_ids]
+            if not new:
+                return None
+            new_vectors = np.frombuffer(b"".join(f[2] for f in new), dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+            all_employee_ids = np.concatenate([employee_ids, np.array([f[1] for f in new], dtype=np.int32)])
+            # Stable sort keeps existing rows in order and new rows after each employee's last row
+            order = np.argsort(all_employee_ids, kind='stable')
+            old_rows = np.concatenate([np.arange(len(matrix), dtype=np.intp), np.full(len(new), -1, dtype=np.intp)])
+            if employees:
+                cached_employees = {**cached_employees, **employees}
+            return (
+                np.concatenate([matrix, new_vectors])[order],
+                all_employee_ids[order],
+                np.concatenate([face_ids, np.array([f[0] for f in new], dtype=np.int32)])[order],
+                cached_employees,
+                old_rows[order]
+            )
+        
+        self._apply_delta(patch, f"add {len(faces)} faces")
+        if broadcast:
+            self._broadcast({
+                "op": "add_batch",
+                "faces": [
+                    {
+                        "face_id": face_id,
+                        "employee_id": employee_id,
+                        "embedding": base64.b64encode(embedding).decode("ascii")
+                    }
+                    for face_id, employee_id, embedding in faces
+                ]
+            })
+    
+    def add_employee_embeddings(self, db: Session, employee: Employee, broadcast: bool = True):
+        """Insert all embeddings of one employee (e.g. after re-activation)."""
+        if not employee.is_active:
+            return
+        faces = db.query(FaceEmbedding.id, FaceEmbedding.embedding).filter(
+            FaceEmbedding.employee_id == employee.id
+        ).order_by(FaceEmbedding.id).all()
+        # One delta for all faces (single matrix copy, index and centroid rebuild)
+        self.add_embeddings(
+            [(face_id, employee.id, embedding) for face_id, embedding in faces],
+            {employee.id: employee},
+            broadcast=False
+        )
+        if broadcast:
+            self._broadcast({"op": "activate", "employee_id": employee.id})
+    
+    def refresh_employee(self, employee_id: int, broadcast: bool = True):
+        """
+        Drop the cached snapshot of an employee whose name, position or photo
+        changed; the next match reads it again from the DB.
+        """
+        with self._cache_lock:
+            if employee_id in self._employees:
+                # Copy-on-write: a delta in progress may hold the current dict
+                self._employees = {emp_id: emp for emp_id, emp in self._employees.items() if emp_id != employee_id}
+        if broadcast:
+            self._broadcast({"op": "employee", "employee_id": employee_id})
+    
+    def remove_embedding(self, face_id: int, broadcast: bool = True):
+        """Remove one FaceEmbedding row from the cache."""
+        def patch(matrix, employee_ids, face_ids, employees):
+            keep = face_ids != face_id
+            if keep.all():
+                return None
+            return self._keep_rows(matrix, employee_ids, face_ids, employees, keep)
+        
+        self._apply_delta(patch, f"remove face {face_id}")
+        if broadcast:
+            self._broadcast({"op": "remove", "face_id": face_id})
+    
+    def deactivate_employee(self, employee_id: int, broadcast: bool = True):
+        """Remove every row of a deactivated employee from the cache."""
+        def patch(matrix, employee_ids, face_ids, employees):
+            keep = employee_ids != employee_id
+            if keep.all():
+                return None
+            return self._keep_rows(matrix, employee_ids, face_ids, employees, keep)
+        
+        self._apply_delta(patch, f"deactivate employee {employee_id}")
+        if broadcast:
+            self._broadcast({"op": "deactivate", "employee_id": employee_id})
+    
+    def _keep_rows(self, matrix, employee_ids, face_ids, employees, keep: np.ndarray):
+        remaining = set(employee_ids[keep].tolist())
+        employees = {emp_id: emp for emp_id, emp in employees.items() if emp_id in remaining}
+        return matrix[keep], employee_ids[keep], face_ids[keep], employees, np.flatnonzero(keep)
+    
+    def _apply_delta(self, patch, description: str):
+        """
+        Apply patch(matrix, employee_ids, face_ids, employees) to the cache.
+        
+        patch returns (matrix, employee_ids, face_ids, employees, old_rows) or
+        None if nothing changed (patches are idempotent). The new arrays are
+        built copy-on-write (the current ones may be read-only shared mappings
+        in use by readers), no DB query or re-decode is needed. If the local
+        cache is not current the change is left to the next full refresh.
+        """
+        if not self.enabled:
+            return
+        
+        try:
+            if self._store is None:
+                with self._cache_lock:
+                    if not self._cache_initialized:
+                        return
+                    patched = patch(self._matrix, self._employee_ids, self._face_ids, self._employees)
+                    if patched is None:
+                        return
+                    matrix, employee_ids, face_ids, employees, old_rows = patched
+                    self._set_matrix(
+                        matrix, employee_ids, face_ids, employees,
+                        generation=self._cache_generation, old_rows=old_rows
+                    )
+            else:
+                with self._store.lock():
+                    generation = self._store.generation()
+                    if generation != self._cache_generation:
+                        # Another worker published since our last match - catch up first
+                        snapshot = self._store.load()
+                        if snapshot is None or snapshot.generation != generation:
+                            # Published data is stale - everyone reloads from DB
+                            self._cache_initialized = False
+                            self._store.bump_generation()
+                            print(f"[Cache] Delta skipped ({description}), full reload scheduled")
+                            return
+                        self._set_matrix(
+                            snapshot.matrix, snapshot.employee_ids, snapshot.face_ids, {},
+                            sq_norms=snapshot.sq_norms, generation=generation
+                        )
+                    patched = patch(self._matrix, self._employee_ids, self._face_ids, self._employees)
+                    if patched is None:
+                        return
+                    matrix, employee_ids, face_ids, employees, old_rows = patched
+                    generation = self._store.bump_generation()
+                    self._publish(generation, matrix, employee_ids, face_ids, employees, old_rows=old_rows)
+            
+            print(f"[Cache] Delta applied: {description} ({len(self._matrix)} embeddings)")
+        except Exception as e:
+            print(f"[Cache] Delta error ({description}): {e}")
+            self.invalidate_cache(broadcast=False)
+    
+    # === Cross-node propagation (Redis pub/sub) ===
+    
+    def _broadcast(self, event: dict):
+        """Send a cache change event to the other API nodes."""
+        if not self.enabled:
+            return
+        event["node"] = self._node_id
+        publish_message(FACE_EVENTS_CHANNEL, event)
+    
+    # === Startup warm-up and readiness ===
+    
+    def warm_up(self):
+        """Load the dlib models and the embedding cache (slow; run in the background)."""
+        if not self.enabled:
+            return
+        try:
+            load_face_engine()
+        except ImportError as e:
+            self.enabled = False
+            self._warm_up_error = f"face_recognition import failed: {e}"
+            print(f"WARNING: {self._warm_up_error}. Face recognition disabled.")
+            return
+        
+        from app.database import SessionLocal
+        db = SessionLocal()
+        try:
+            count = self.refresh_embedding_cache(db)
+            print(f"✅ Face embeddings cache warmed up successfully ({count} embeddings loaded)")
+        except Exception as e:
+            self._warm_up_error = f"cache warm-up failed: {e}"
+            print(f"⚠️  Warning: Could not warm up face cache: {e}")
+            print("   Face recognition will work, but first request may be slower")
+        finally:
+            db.close()
+    
+    def start_warm_up(self) -> threading.Thread:
+        """Run warm_up() in a daemon thread so startup does not wait for it."""
+        if self._warm_up_thread is None or not self._warm_up_thread.is_alive():
+            self._warm_up_error = None
+            self._warm_up_thread = threading.Thread(target=self.warm_up, name="face-warm-up", daemon=True)
+            self._warm_up_thread.start()
+        return self._warm_up_thread
+    
+    def readiness(self) -> dict:
+        """Face engine state for the readiness probe."""
+        warming_up = self._warm_up_thread is not None and self._warm_up_thread.is_alive()
+        engine_loaded = face_engine_loaded()
+        # Loaded at least once; a later invalidate reloads on demand
+        cache_loaded = self._cache_version > 0
+        return {
+            "ready": not self.enabled or (engine_loaded and cache_loaded),
+            "enabled": self.enabled,
+            "engine_loaded": engine_loaded,
+            "cache_loaded": cache_loaded,
+            "embeddings": len(self._matrix),
+            "warming_up": warming_up,
+            "error": self._warm_up_error,
+        }
+    
+    def start_change_listener(self) -> bool:
+        """Subscribe to cache change events from other nodes (background thread)."""
+        if not self.enabled or self._listener is not None:
+            return False
+        self._listener_stop.clear()
+        self._listener = subscribe_messages(FACE_EVENTS_CHANNEL, self._on_change_event, self._listener_stop)
+        return self._listener is not None
+    
+    def stop_change_listener(self):
+        self._listener_stop.set()
+        self._listener = None
+    
+    def _on_change_event(self, event: dict):
+        """Apply a change event published by another node (runs in the listener thread)."""
+        if event.get("node") == self._node_id:
+            return
+        
+        op = event.get("op")
+        if op == "add":
+            self.add_embedding(
+                event["face_id"], event["employee_id"],
+                base64.b64decode(event["embedding"]), broadcast=False
+            )
+        elif op == "add_batch":
+            self.add_embeddings([
+                (face["face_id"], face["employee_id"], base64.b64decode(face["embedding"]))
+                for face in event["faces"]
+            ], broadcast=False)
+        elif op == "remove":
+            self.remove_embedding(event["face_id"], broadcast=False)
+        elif op == "deactivate":
+            self.deactivate_employee(event["employee_id"], broadcast=False)
+        elif op == "employee":
+            self.refresh_employee(event["employee_id"], broadcast=False)
+        elif op in ("activate", "reload"):
+            from app.database import SessionLocal
+            db = SessionLocal()
+            try:
+                if op == "activate":
+                    employee = db.query(Employee).filter(Employee.id == event["employee_id"]).first()
+                    if employee:
+                        self.add_employee_embeddings(db, employee, broadcast=False)
+                else:
+                    self.refresh_embedding_cache(db)
+            finally:
+                db.close()
     
     def detect_face(self, image_data: bytes) -> bool:
         """Detect if there's a face in the image using deep learning."""
@@ -120,12 +818,125 @@ class FaceRecognitionService:
                 return False
             
             # Use 'hog' for faster detection
-            face_locations = face_recognition.face_locations(image, model='hog')
+            with stage_metrics.time("detect"):
+                face_locations = load_face_engine().face_locations(image, model='hog')
             return len(face_locations) > 0
         except Exception as e:
             print(f"Face detection error: {e}")
             return False
     
+    def _detect_and_encode(
+        self,
+        image: np.ndarray,
+        model: str = 'hog',
+        num_jitters: int = 1,
+        face_box: Optional[FaceBox] = None
+    ) -> Tuple[List[Tuple[int, int, int, int]], Optional[np.ndarray]]:
+        """
+        Detect faces and encode the largest one on an already-decoded image.
+        Returns (face_locations, encoding) - encoding is None if no face found.
+        
+        face_box: optional client-side detection hint (see _detect_in_hint);
+        full-frame detection is used when the hint is missing or wrong.
+        """
+        if face_box is not None:
+            hinted = self._detect_in_hint(image, face_box, model, num_jitters)
+            if hinted is not None:
+                return hinted
+            print("[Hint] No face inside hinted box, running full detection")
+        
+        with stage_metrics.time("detect"):
+            face_locations = load_face_engine().face_locations(image, model=model)
+        
+        if len(face_locations) == 0:
+            return [], None
+        
+        # Get the largest face (by area)
+        largest = face_locations[0]
+        if len(face_locations) > 1:
+            largest = max(face_locations, key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
+            print(f"Multiple faces detected, using largest one")
+        
+        # Generate 128-dimensional face encoding
+        with stage_metrics.time("encode"):
+            face_encodings = load_face_engine().face_encodings(
+                image,
+                [largest],
+                num_jitters=num_jitters
+            )
+        
+        if len(face_encodings) == 0:
+            print("Could not generate face encoding")
+            return face_locations, None
+        
+        return face_locations, face_encodings[0].astype(np.float32)
+    
+    def _detect_in_hint(
+        self,
+        image: np.ndarray,
+        face_box: FaceBox,
+        model: str,
+        num_jitters: int
+    ) -> Optional[Tuple[List[Tuple[int, int, int, int]], np.ndarray]]:
+        """
+        Verify and encode the face inside a padded crop around a client
+        bounding box (normalized x, y, width, height of the submitted frame).
+        Detection runs on the crop only, which is several times cheaper than
+        HOG over the whole frame. Returns None if the box is invalid or no
+        face is found in the crop.
+        """
+        x, y, box_width, box_height = face_box
+        if not (0.0 <= x <= 1.0 and 0.0 <= y <= 1.0 and 0.0 < box_width <= 1.0 and 0.0 < box_height <= 1.0):
+            return None
+        
+        # Pad the box: client detectors crop tighter than dlib's HOG window
+        height, width = image.shape[:2]
+        pad_x = box_width * FACE_HINT_PADDING
+        pad_y = box_height * FACE_HINT_PADDING
+        left = max(0, int((x - pad_x) * width))
+        top = max(0, int((y - pad_y) * height))
+        right = min(width, int(np.ceil((x + box_width + pad_x) * width)))
+        bottom = min(height, int(np.ceil((y + box_height + pad_y) * height)))
+        if right - left < FACE_HINT_MIN_PIXELS or bottom - top < FACE_HINT_MIN_PIXELS:
+            return None
+        
+        crop = np.ascontiguousarray(image[top:bottom, left:right])
+        with stage_metrics.time("detect"):
+            crop_locations = load_face_engine().face_locations(crop, model=model)
+        if len(crop_locations) == 0:
+            return None
+        
+        largest = max(crop_locations, key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
+        with stage_metrics.time("encode"):
+            face_encodings = load_face_engine().face_encodings(crop, [largest], num_jitters=num_jitters)
+        if len(face_encodings) == 0:
+            return None
+        
+        # Report locations in full-frame coordinates
+        face_locations = [(t + top, r + left, b + top, l + left) for t, r, b, l in crop_locations]
+        return face_locations, face_encodings[0].astype(np.float32)
+    
+    def extract_encoding(
+        self,
+        image_data: bytes,
+        use_cnn: bool = False,
+        num_jitters: int = 1,
+        face_box: Optional[FaceBox] = None
+    ) -> Tuple[List[Tuple[int, int, int, int]], Optional[np.ndarray]]:
+        """
+        Decode, detect and encode in one pass (CPU only, no DB access).
+        Safe to run inside inference pool worker processes.
+        Returns (face_locations, encoding).
+        """
+        # Use full resolution for registration, resized for recognition
+        max_size = 1280 if use_cnn else 640
+        image = self._load_image(image_data, max_size=max_size)
+        if image is None:
+            return [], None
+        
+        model = 'cnn' if use_cnn else 'hog'
+        return self._detect_and_encode(image, model=model, num_jitters=num_jitters, face_box=face_box)
+    
     def generate_embedding(self, image_data: bytes, use_cnn: bool = False, num_jitters: int = 1) -> Optional[bytes]:
         """
         Generate 128-dimensional face embedding using deep learning.
@@ -139,39 +950,16 @@ class FaceRecognitionService:
             return None
         
         try:
-            # Use full resolution for registration, resized for recognition
-            max_size = 1280 if use_cnn else 640
-            image = self._load_image(image_data, max_size=max_size)
-            if image is None:
-                return None
-            
-            # Detect face locations
-            model = 'cnn' if use_cnn else 'hog'
-            face_locations = face_recognition.face_locations(image, model=model)
+            face_locations, encoding = self.extract_encoding(image_data, use_cnn=use_cnn, num_jitters=num_jitters)
             
             if len(face_locations) == 0:
                 print("No face detected in image")
                 return None
             
-            # Get the largest face (by area)
-            if len(face_locations) > 1:
-                largest = max(face_locations, key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
-                face_locations = [largest]
-                print(f"Multiple faces detected, using largest one")
-            
-            # Generate 128-dimensional face encoding
-            face_encodings = face_recognition.face_encodings(
-                image, 
-                face_locations, 
-                num_jitters=num_jitters
-            )
-            
-            if len(face_encodings) == 0:
-                print("Could not generate face encoding")
+            if encoding is None:
                 return None
             
             # Convert to bytes (128 floats = 512 bytes)
-            encoding = face_encodings[0].astype(np.float32)
             return encoding.tobytes()
             
         except Exception as e:
@@ -187,7 +975,7 @@ class FaceRecognitionService:
             return 0.0
         
         try:
-            expected_size = 128 * 4
+            expected_size = EMBEDDING_BYTES
             
             if len(embedding1) != expected_size or len(embedding2) != expected_size:
                 print(f"Embedding size mismatch: {len(embedding1)} vs {len(embedding2)} (expected {expected_size})")
@@ -218,12 +1006,164 @@ class FaceRecognitionService:
         distances = np.linalg.norm(stored_embeddings - new_embedding, axis=1)
         return distances
     
+    def _gallery_distances(self, queries: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+        """
+        Euclidean distances from one embedding (128,) or a batch (Q x 128)
+        to every cached row. Returns (N,) or (Q x N).
+        
+        Uses |a - b|^2 = |a|^2 + |b|^2 - 2ab with precomputed row norms, so the
+        scan is a single BLAS matrix product instead of an (N x 128)
+        temporary like _batch_compare.
+        """
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            sq = sq_norms - 2.0 * (matrix @ queries) + np.dot(queries, queries)
+        else:
+            q_norms = np.einsum('ij,ij->i', queries, queries)
+            sq = sq_norms[np.newaxis, :] - 2.0 * (queries @ matrix.T) + q_norms[:, np.newaxis]
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+    
+    def _best_per_employee(self, distances: np.ndarray, group_starts: np.ndarray) -> np.ndarray:
+        """Minimum distance per employee block (rows are sorted by employee_id)."""
+        return np.minimum.reduceat(distances, group_starts, axis=-1)
+    
+    def recognize(
+        self,
+        image_data: bytes,
+        db: Session,
+        threshold: float = 0.40
+    ) -> RecognitionResult:
+        """
+        Single-pass recognition pipeline for the kiosk.
+        
+        Decodes the image once, runs HOG detection once, encodes the largest
+        face and matches it against the cache. Replaces the detect_face() +
+        find_matching_employee() pair which decoded and detected twice.
+        """
+        if not self.enabled:
+            employee, score = self.find_matching_employee(image_data, db, threshold=threshold)
+            return RecognitionResult(True, [], None, employee, score)
+        
+        try:
+            face_locations, encoding = self.extract_encoding(image_data)
+        except Exception as e:
+            print(f"Recognition pipeline error: {e}")
+            return RecognitionResult(False, [], None, None, 0.0)
+        
+        return self._match_extracted(face_locations, encoding, db, threshold)
+    
+    async def recognize_async(
+        self,
+        image_data: bytes,
+        db: Session,
+        threshold: float = 0.40,
+        face_box: Optional[FaceBox] = None
+    ) -> RecognitionResult:
+        """
+        recognize() for async endpoints: dlib inference runs in the inference
+        pool and cache matching in the threadpool, so the event loop is never
+        blocked. Raises InferencePoolSaturated when the pool queue is full.
+        
+        Encodings of concurrent calls are matched in one batch (MatchBatcher).
+        
+        face_box: optional client-side face box hint, see _detect_in_hint.
+        """
+        if not self.enabled:
+            return await run_in_threadpool(self.recognize, image_data, db, threshold)
+        
+        try:
+            face_locations, encoding = await inference_pool.run(
+                partial(extract_encoding, face_box=face_box), image_data
+            )
+        except InferencePoolSaturated:
+            raise
+        except Exception as e:
+            print(f"Recognition pipeline error: {e}")
+            return RecognitionResult(False, [], None, None, 0.0)
+        
+        if encoding is None or not self._batcher.enabled:
+            return await run_in_threadpool(self._match_extracted, face_locations, encoding, db, threshold)
+        
+        employee, score = await self._batcher.match(encoding, threshold)
+        return RecognitionResult(True, face_locations, encoding, employee, score)
+    
+    async def recognize_burst_async(
+        self,
+        frames: List[bytes],
+        db: Session,
+        threshold: float = 0.40,
+        face_box: Optional[FaceBox] = None
+    ) -> BurstRecognitionResult:
+        """
+        Multi-frame recognition: frames are encoded in parallel in the
+        inference pool and matched together with one vectorized distance
+        computation. The match must win a majority of the encoded frames.
+        Raises InferencePoolSaturated when the pool queue is full.
+        
+        face_box: optional client-side face box hint applied to every frame.
+        """
+        if not self.enabled:
+            employee, score = await run_in_threadpool(self.find_matching_employee, frames[0], db, threshold)
+            return BurstRecognitionResult(len(frames), len(frames), employee, score, len(frames))
+        
+        results = await asyncio.gather(
+            *[inference_pool.run(partial(extract_encoding, face_box=face_box), frame) for frame in frames],
+            return_exceptions=True
+        )
+        
+        faces_detected = 0
+        encodings = []
+        for result in results:
+            if isinstance(result, InferencePoolSaturated):
+                raise result
+            if isinstance(result, Exception):
+                print(f"Recognition pipeline error: {result}")
+                continue
+            face_locations, encoding = result
+            if len(face_locations) > 0:
+                faces_detected += 1
+            if encoding is not None:
+                encodings.append(encoding)
+        
+        if not encodings:
+            return BurstRecognitionResult(len(frames), faces_detected, None, 0.0, 0)
+        
+        employee, score, votes = await run_in_threadpool(
+            self.match_embeddings, np.stack(encodings), db, threshold
+        )
+        
+        # Frames disagree - treat as not recognized rather than guess
+        if employee is not None and votes * 2 <= len(encodings):
+            print(f"[Burst] No majority: {votes}/{len(encodings)} frames agree")
+            employee = None
+        
+        return BurstRecognitionResult(len(frames), faces_detected, employee, score, votes)
+    
+    def _match_extracted(
+        self,
+        face_locations: List[Tuple[int, int, int, int]],
+        encoding: Optional[np.ndarray],
+        db: Session,
+        threshold: float
+    ) -> RecognitionResult:
+        """Turn extract_encoding() output into a RecognitionResult."""
+        if len(face_locations) == 0:
+            return RecognitionResult(False, [], None, None, 0.0)
+        
+        if encoding is None:
+            print("Failed to generate embedding from captured image")
+            return RecognitionResult(True, face_locations, None, None, 0.0)
+        
+        employee, score = self.match_embedding(encoding, db, threshold=threshold)
+        return RecognitionResult(True, face_locations, encoding, employee, score)
+    
     def find_matching_employee(
         self,
         image_data: bytes,
         db: Session,
         threshold: float = 0.40
-    ) -> Tuple[Optional[Employee], float]:
+    ) -> Tuple[Optional[EmployeeSnapshot], float]:
         """
         Find the employee matching the face in the image.
         Uses deep learning face encodings for high accuracy.
@@ -239,7 +1179,7 @@ class FaceRecognitionService:
             # Fallback: return first active employee for testing
             employee = db.query(Employee).filter(Employee.is_active == True).first()
             if employee:
-                return employee, 0.90
+                return EmployeeSnapshot.from_employee(employee), 0.90
             return None, 0.0
         
         # Generate embedding from captured image (with resizing optimization)
@@ -249,68 +1189,198 @@ class FaceRecognitionService:
             return None, 0.0
         
         new_embedding = np.frombuffer(new_embedding_bytes, dtype=np.float32)
+        return self.match_embedding(new_embedding, db, threshold=threshold)
+    
+    def match_embedding(
+        self,
+        new_embedding: np.ndarray,
+        db: Session,
+        threshold: float = 0.40
+    ) -> Tuple[Optional[EmployeeSnapshot], float]:
+        """
+        Match an already-computed 128-d encoding against the embedding cache.
+        Returns (employee, similarity) - employee is None below threshold.
+        """
+        employee, score, _ = self.match_embeddings(new_embedding, db, threshold=threshold)
+        return employee, score
+    
+    def match_embeddings(
+        self,
+        encodings: np.ndarray,
+        db: Session,
+        threshold: float = 0.40
+    ) -> Tuple[Optional[EmployeeSnapshot], float, int]:
+        """
+        Match one or more encodings of the same person (e.g. burst frames)
+        in one vectorized pass. Per-employee distances are averaged over the
+        frames. Returns (employee, similarity, votes) where votes is the
+        number of frames whose own best match is the chosen employee.
+        """
+        encodings = np.atleast_2d(encodings)
         
         # === OPTIMIZATION 1: Use cache if available ===
-        if not self._cache_initialized:
-            self.refresh_embedding_cache(db)
+        self._ensure_cache(db)
         
-        if not self._embedding_cache:
+        with self._cache_lock:
+            matrix = self._matrix
+            employee_ids = self._employee_ids
+            employees = self._employees
+            index = self._index
+        
+        if len(matrix) == 0:
             print("No embeddings in cache")
-            return None, 0.0
+            return None, 0.0, 0
         
-        # === OPTIMIZATION 2: Batch comparison ===
-        # Prepare all embeddings in a single numpy array for vectorized comparison
-        all_embeddings = []
-        embedding_metadata = []  # Track which embedding belongs to which employee
-        
-        for emp_id, emp_data_list in self._embedding_cache.items():
-            for emp_data in emp_data_list:
-                all_embeddings.append(emp_data['embedding'])
-                embedding_metadata.append({
-                    'employee_id': emp_id,
-                    'employee': emp_data['employee'],
-                    'face_id': emp_data['id'],
-                    'is_primary': emp_data['is_primary']
-                })
-        
-        if not all_embeddings:
-            print("No valid embeddings to compare")
-            return None, 0.0
+        match_start = time.perf_counter()
+        if index.exact:
+            employee_distances, candidate_employee_ids = self._employee_distances(encodings)
+            
+            # Best (minimum) distance per employee per frame, averaged over frames
+            mean_distances = employee_distances.mean(axis=0)
+            best_group = int(np.argmin(mean_distances))
+            best_distance = float(mean_distances[best_group])
+            best_employee_id = int(candidate_employee_ids[best_group])
+            votes = int(np.sum(np.argmin(employee_distances, axis=1) == best_group))
+        else:
+            # Approximate search: only the nearest partitions are scanned
+            frame_employee_ids = []
+            frame_distances = []
+            for encoding in encodings:
+                rows, row_distances = index.search(encoding, k=1)
+                if len(rows):
+                    frame_employee_ids.append(int(employee_ids[rows[0]]))
+                    frame_distances.append(float(row_distances[0]))
+            if not frame_employee_ids:
+                print("No embeddings found by index")
+                return None, 0.0, 0
+            
+            # Majority vote, then mean distance of the agreeing frames
+            frame_employee_ids = np.array(frame_employee_ids)
+            candidates, counts = np.unique(frame_employee_ids, return_counts=True)
+            best_employee_id = int(candidates[np.argmax(counts)])
+            votes = int(counts.max())
+            best_distance = float(np.mean(np.array(frame_distances)[frame_employee_ids == best_employee_id]))
+            
+            print(f"[Index] {index.name} search over {len(matrix)} embeddings ({len(encodings)} frames)")
+        stage_metrics.observe("match", time.perf_counter() - match_start)
         
-        # Stack all embeddings into a 2D array for batch processing
-        all_embeddings_array = np.array(all_embeddings)
+        best_score = float(max(0.0, 1 - (best_distance / 1.0)))
+        best_match = self._resolve_match(best_employee_id, best_score, threshold, employees, db)
+        return best_match, best_score, votes
+    
+    def match_batch(
+        self,
+        encodings: np.ndarray,
+        db: Session,
+        thresholds: List[float]
+    ) -> List[Tuple[Optional[EmployeeSnapshot], float]]:
+        """
+        Match encodings of different people (concurrent kiosk requests, see
+        MatchBatcher) with one (queries x N) distance computation.
+        Returns one (employee, similarity) per row.
+        """
+        self._ensure_cache(db)
         
-        # Vectorized distance calculation (MUCH faster than loop)
-        distances = self._batch_compare(new_embedding, all_embeddings_array)
-        similarities = np.maximum(0, 1 - (distances / 1.0))
+        with self._cache_lock:
+            matrix = self._matrix
+            employee_ids = self._employee_ids
+            employees = self._employees
+            index = self._index
         
-        print(f"[Batch] Compared against {len(all_embeddings)} embeddings")
+        if len(matrix) == 0:
+            print("No embeddings in cache")
+            return [(None, 0.0)] * len(encodings)
         
-        # Group by employee and find best score per employee
-        employee_scores: Dict[int, Tuple[Employee, float, int]] = {}
+        match_start = time.perf_counter()
+        if index.exact:
+            employee_distances, candidate_employee_ids = self._employee_distances(encodings)
+            best_groups = np.argmin(employee_distances, axis=1)
+            best_distances = employee_distances[np.arange(len(encodings)), best_groups]
+            best_employee_ids = candidate_employee_ids[best_groups]
+        else:
+            best_employee_ids = np.full(len(encodings), -1, dtype=np.int64)
+            best_distances = np.full(len(encodings), np.inf, dtype=np.float32)
+            for query, encoding in enumerate(encodings):
+                rows, row_distances = index.search(encoding, k=1)
+                if len(rows):
+                    best_employee_ids[query] = employee_ids[rows[0]]
+                    best_distances[query] = row_distances[0]
+            print(f"[Index] {index.name} search over {len(matrix)} embeddings ({len(encodings)} queries)")
+        stage_metrics.observe("match", time.perf_counter() - match_start)
         
-        for i, (meta, similarity) in enumerate(zip(embedding_metadata, similarities)):
-            emp_id = meta['employee_id']
-            
-            if emp_id not in employee_scores or similarity > employee_scores[emp_id][1]:
-                employee_scores[emp_id] = (meta['employee'], similarity, meta['face_id'])
+        results = []
+        for employee_id, distance, threshold in zip(best_employee_ids, best_distances, thresholds):
+            score = float(max(0.0, 1 - (float(distance) / 1.0)))
+            results.append((self._resolve_match(int(employee_id), score, threshold, employees, db), score))
+        return results
+    
+    def _match_batch_session(self, encodings: np.ndarray, thresholds: List[float]):
+        """match_batch() with its own session - a batch outlives no single request."""
+        from app.database import SessionLocal
+        db = SessionLocal()
+        try:
+            return self.match_batch(encodings, db, thresholds)
+        finally:
+            db.close()
+    
+    def _employee_distances(self, encodings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact search: best distance per (query, candidate employee) and the
+        candidate employee ids. All employees, or only the union of each
+        query's top-k centroid candidates when the prefilter is enabled.
+        """
+        with self._cache_lock:
+            matrix = self._matrix
+            sq_norms = self._sq_norms
+            group_starts = self._group_starts
+            group_employee_ids = self._group_employee_ids
+            centroids = self._centroids
         
-        # Find overall best match
-        best_match: Optional[Employee] = None
-        best_score: float = 0.0
+        top_k = self._centroid_top_k
+        if centroids is not None and len(centroids) > top_k > 0:
+            # Two stages: score employee centroids, then re-rank only the
+            # individual embeddings of the top_k employees
+            groups = self._candidate_groups(encodings, centroids, top_k)
+            rows, local_starts = self._group_rows(groups, group_starts, len(matrix))
+            distances = self._gallery_distances(encodings, matrix[rows], sq_norms[rows])
+            print(f"[Centroid] {len(groups)}/{len(centroids)} employees, re-ranked {len(rows)} of {len(matrix)} embeddings")
+            return self._best_per_employee(distances, local_starts), group_employee_ids[groups]
         
-        for emp_id, (employee, score, face_id) in employee_scores.items():
-            if score > best_score:
-                best_score = score
-                if score >= threshold:
-                    best_match = employee
+        # === OPTIMIZATION 2: Batch comparison ===
+        # One (queries x N) distance computation over the contiguous matrix
+        distances = self._gallery_distances(encodings, matrix, sq_norms)
+        print(f"[Batch] Compared {len(encodings)} x {len(matrix)} embeddings")
+        return self._best_per_employee(distances, group_starts), group_employee_ids
+    
+    def _resolve_match(
+        self,
+        employee_id: int,
+        score: float,
+        threshold: float,
+        employees: Dict[int, EmployeeSnapshot],
+        db: Session
+    ) -> Optional[EmployeeSnapshot]:
+        """Employee snapshot for a best match at or above threshold, else None."""
+        best_match: Optional[EmployeeSnapshot] = None
+        if employee_id >= 0 and score >= threshold:
+            best_match = employees.get(employee_id)
+            if best_match is None:
+                # Not cached (e.g. matrix mapped from the shared store) - fetch once
+                with stage_metrics.time("db_lookup"):
+                    row = db.execute(
+                        select(Employee.id, Employee.name, Employee.position, Employee.photo_url, Employee.is_active)
+                        .where(Employee.id == employee_id, Employee.is_active == True)
+                    ).first()
+                if row is not None:
+                    best_match = EmployeeSnapshot(*row)
+                    with self._cache_lock:
+                        # Copy-on-write: matches in flight may hold the current dict
+                        self._employees = {**self._employees, employee_id: best_match}
         
         if best_match:
-            print(f"Best match: {best_match.name} with score {best_score:.3f}")
+            print(f"Best match: {best_match.name} with score {score:.3f}")
         else:
-            print(f"No match found. Best score was {best_score:.3f} (threshold: {threshold})")
-        
-        return best_match, best_score
-
+            print(f"No match found. Best score was {score:.3f} (threshold: {threshold})")
+        return best_match
 
 face_recognition_service = FaceRecognitionService()
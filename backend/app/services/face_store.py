@@ -0,0 +1,170 @@
+"""
+Shared Embedding Store - matrix embedding yang dibagi antar worker uvicorn.
+
+Tanpa store ini setiap worker menyimpan salinan matrix sendiri, dan
+invalidate_cache() hanya me-reset worker yang melayani request upload/delete.
+Store mem-publish matrix ke file yang di-mmap (default di /dev/shm) sehingga:
+- semua worker berbagi page yang sama (memori konstan saat worker ditambah)
+- counter generation di file kecil `generation` dibaca tiap recognize
+  (satu read dari mmap), jadi perubahan enrollment langsung terlihat di
+  semua worker tanpa query DB.
+
+Layout file data (little-endian, tiap section di-align 64 byte):
+    header: magic(8) generation(u64) rows(u64) dim(u64)
+    employee_ids int32[rows] | face_ids int32[rows] | sq_norms float32[rows]
+    matrix float32[rows x dim]
+
+Hanya tersedia di platform dengan fcntl (Linux/macOS).
+"""
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+import numpy as np
+
+try:
+    import fcntl
+    SHARED_STORE_AVAILABLE = True
+except ImportError:
+    SHARED_STORE_AVAILABLE = False
+
+MAGIC = b"ABSFACE1"
+HEADER = struct.Struct("<8sQQQ")
+ALIGN = 64
+
+
+class SharedSnapshot(NamedTuple):
+    generation: int
+    matrix: np.ndarray
+    sq_norms: np.ndarray
+    employee_ids: np.ndarray
+    face_ids: np.ndarray
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _layout(rows: int, dim: int):
+    """Byte offsets of each section for a file with `rows` embeddings."""
+    employee_ids = _aligned(HEADER.size)
+    face_ids = _aligned(employee_ids + rows * 4)
+    sq_norms = _aligned(face_ids + rows * 4)
+    matrix = _aligned(sq_norms + rows * 4)
+    end = matrix + rows * dim * 4
+    return employee_ids, face_ids, sq_norms, matrix, end
+
+
+def default_store_dir(database_url: str) -> str:
+    """Per-database directory so several deployments on one host don't collide."""
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    digest = hashlib.sha1(database_url.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(base, f"absen-desa-face-{digest}")
+
+
+class SharedEmbeddingStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._data_path = os.path.join(directory, "embeddings.bin")
+        self._lock_path = os.path.join(directory, "lock")
+
+        generation_path = os.path.join(directory, "generation")
+        fd = os.open(generation_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < 8:
+                os.ftruncate(fd, 8)
+            self._generation_map = mmap.mmap(fd, 8)
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def lock(self):
+        """Cross-process exclusive lock (serialises DB reloads and publishes)."""
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def generation(self) -> int:
+        """Current generation counter - one read from shared memory."""
+        return struct.unpack_from("<Q", self._generation_map, 0)[0]
+
+    def bump_generation(self) -> int:
+        """Increment the generation counter (caller must hold lock())."""
+        generation = self.generation() + 1
+        struct.pack_into("<Q", self._generation_map, 0, generation)
+        return generation
+
+    def invalidate(self) -> int:
+        """Bump the generation so every worker reloads on its next match."""
+        with self.lock():
+            return self.bump_generation()
+
+    def publish(
+        self,
+        generation: int,
+        matrix: np.ndarray,
+        sq_norms: np.ndarray,
+        employee_ids: np.ndarray,
+        face_ids: np.ndarray
+    ):
+        """Atomically replace the data file (caller should hold lock())."""
+        rows, dim = matrix.shape
+        offsets = _layout(rows, dim)
+        sections = [
+            np.ascontiguousarray(employee_ids, dtype=np.int32),
+            np.ascontiguousarray(face_ids, dtype=np.int32),
+            np.ascontiguousarray(sq_norms, dtype=np.float32),
+            np.ascontiguousarray(matrix, dtype=np.float32),
+        ]
+
+        tmp_path = f"{self._data_path}.tmp-{os.getpid()}"
+        with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+            f.write(HEADER.pack(MAGIC, generation, rows, dim))
+            for offset, array in zip(offsets, sections):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(array.data)  # contiguous buffer, also valid with zero rows
+        # Readers holding the old file keep a valid mapping of the old inode
+        os.replace(tmp_path, self._data_path)
+
+    def load(self) -> Optional[SharedSnapshot]:
+        """Map the published data file read-only. Returns None if missing/corrupt."""
+        try:
+            with open(self._data_path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if len(data) < HEADER.size:
+            return None
+        magic, generation, rows, dim = HEADER.unpack_from(data, 0)
+        employee_ids_at, face_ids_at, sq_norms_at, matrix_at, end = _layout(rows, dim)
+        if magic != MAGIC or len(data) < end:
+            return None
+
+        # np.frombuffer keeps a reference to the mmap, so it stays mapped
+        return SharedSnapshot(
+            generation=generation,
+            matrix=np.frombuffer(data, dtype=np.float32, count=rows * dim, offset=matrix_at).reshape(rows, dim),
+            sq_norms=np.frombuffer(data, dtype=np.float32, count=rows, offset=sq_norms_at),
+            employee_ids=np.frombuffer(data, dtype=np.int32, count=rows, offset=employee_ids_at),
+            face_ids=np.frombuffer(data, dtype=np.int32, count=rows, offset=face_ids_at),
+        )
+
+
+def create_store(enabled: bool, directory: Optional[str], database_url: str) -> Optional[SharedEmbeddingStore]:
+    """Create the shared store, or None (per-process cache) if disabled/unavailable."""
+    if not enabled or not SHARED_STORE_AVAILABLE:
+        return None
+    try:
+        return SharedEmbeddingStore(directory or default_store_dir(database_url))
+    except OSError as e:
+        print(f"[SharedCache] Disabled, could not open store: {e}")
+        return None
@@ -0,0 +1,145 @@
+"""
+Inference Pool - process pool khusus untuk inference dlib (deteksi + encoding).
+
+dlib (face_locations / face_encodings) berat di CPU dan sinkron. Jika dipanggil
+langsung dari endpoint async, event loop terblokir dan semua request lain di
+worker tersebut ikut tertahan. Pool ini menjalankan inference di proses
+terpisah (model dlib sudah dimuat saat proses dibuat) dengan antrian terbatas:
+jika penuh, request langsung ditolak dengan InferencePoolSaturated sehingga
+router bisa membalas 503 + Retry-After alih-alih menumpuk latency.
+
+FACE_INFERENCE_WORKERS=0 (default) menjalankan inference di threadpool
+(event loop tetap bebas, backpressure tetap berlaku).
+"""
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import get_settings
+from app.services.metrics import stage_metrics
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class InferencePoolSaturated(Exception):
+    """Raised when the inference queue is full; caller should retry later."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference pool saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _init_worker():
+    """Preload dlib models once per worker process."""
+    from app.services import face_recognition as face_module
+    if face_module.FACE_RECOGNITION_AVAILABLE:
+        face_module.load_face_engine()
+    logger.info(f"Inference worker ready (face engine enabled: {face_module.FACE_RECOGNITION_AVAILABLE})")
+
+
+def _ping() -> bool:
+    return True
+
+
+def _run_captured(fn: Callable[..., Any], *args):
+    """Run fn in the worker and return its stage timings along with the result."""
+    with stage_metrics.capture() as spans:
+        result = fn(*args)
+    return result, spans
+
+
+def extract_encoding(image_data: bytes, use_cnn: bool = False, num_jitters: int = 1, face_box=None):
+    """Decode + detect + encode in the worker. Returns (face_locations, encoding)."""
+    from app.services.face_recognition import face_recognition_service
+    return face_recognition_service.extract_encoding(
+        image_data, use_cnn=use_cnn, num_jitters=num_jitters, face_box=face_box
+    )
+
+
+class InferencePool:
+    def __init__(self, workers: int = 0, max_queue: int = 8, retry_after: int = 2):
+        self.workers = max(0, workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        # In-flight + queued jobs allowed before rejecting
+        self.max_pending = max(1, self.workers) + self.max_queue
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def start(self):
+        """Create worker processes (no-op in threadpool mode)."""
+        if self.workers == 0 or self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker
+        )
+        # Kick off worker processes now so models are loaded before the first tap
+        for _ in range(self.workers):
+            self._executor.submit(_ping)
+        logger.info(f"Inference pool started: {self.workers} workers, queue {self.max_queue}")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            # Several requests may see the same broken pool - replace it once
+            if self._executor is not broken:
+                return
+            logger.warning("Inference pool broken, restarting workers")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self.start()
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        Run fn(*args) in the pool. Raises InferencePoolSaturated immediately
+        when max_pending jobs are already in flight.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise InferencePoolSaturated(self.retry_after)
+            self._pending += 1
+
+        try:
+            with stage_metrics.time("inference"):
+                executor = self._executor
+                if executor is None:
+                    return await run_in_threadpool(fn, *args)
+                loop = asyncio.get_running_loop()
+                try:
+                    result, spans = await loop.run_in_executor(executor, _run_captured, fn, *args)
+                except BrokenProcessPool:
+                    self._restart(executor)
+                    raise InferencePoolSaturated(self.retry_after)
+            # Stages measured in the worker process
+            for stage, seconds in spans:
+                stage_metrics.observe(stage, seconds)
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+inference_pool = InferencePool(
+    workers=settings.FACE_INFERENCE_WORKERS,
+    max_queue=settings.FACE_INFERENCE_QUEUE_SIZE,
+    retry_after=settings.FACE_INFERENCE_RETRY_AFTER
+)
@@ -0,0 +1,85 @@
+"""
+Match Batcher - micro-batching matching untuk request recognize yang bersamaan.
+
+Saat jam masuk beberapa kiosk mengirim frame hampir bersamaan. Encoding yang
+datang selama matching lain masih berjalan dikumpulkan (sampai matching itu
+selesai, paling lama satu jendela beberapa ms, atau sampai max_size) lalu
+dicocokkan sekaligus dengan satu perhitungan jarak matrix-vs-matrix (Q x N,
+satu GEMM BLAS) di threadpool; hasil per query dikembalikan ke masing-masing
+request lewat future.
+
+Request yang datang saat tidak ada matching berjalan (satu kiosk, jam sepi)
+langsung dicocokkan tanpa menunggu jendela.
+"""
+import asyncio
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+
+class MatchBatcher:
+    def __init__(
+        self,
+        match_fn: Callable[[np.ndarray, List[float]], List[Any]],
+        window_ms: float = 4.0,
+        max_size: int = 32
+    ):
+        """
+        match_fn(encodings (Q x 128), thresholds) -> one result per row,
+        called in the threadpool. window_ms <= 0 disables batching.
+        """
+        self.match_fn = match_fn
+        self.window = max(0.0, window_ms) / 1000
+        self.max_size = max(1, max_size)
+        self._pending: List[Tuple[np.ndarray, float, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Batches dispatched and not finished yet
+        self._running = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def match(self, encoding: np.ndarray, threshold: float) -> Any:
+        """Queue one encoding and wait for its result from the next batch."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((encoding, threshold, future))
+
+        if self._running == 0 or len(self._pending) >= self.max_size:
+            # Nothing to wait for when no other match is in flight
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._running += 1
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[np.ndarray, float, asyncio.Future]]):
+        encodings = np.stack([encoding for encoding, _, _ in batch])
+        thresholds = [threshold for _, threshold, _ in batch]
+        try:
+            results = await run_in_threadpool(self.match_fn, encodings, thresholds)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._running -= 1
+            # Requests collected while this batch ran go now, not at the timer
+            if self._running == 0 and self._pending:
+                self._flush()
+
+        for (_, _, future), result in zip(batch, results):
+            # Requests cancelled meanwhile (client gone) are skipped
+            if not future.done():
+                future.set_result(result)
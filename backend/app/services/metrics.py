@@ -0,0 +1,137 @@
+"""
+Stage Metrics - histogram latency per tahap pipeline face recognition.
+
+Setiap tahap (decode, deteksi HOG, encoding, matching, refresh cache, query
+DB) diukur dengan stage_metrics.time("nama") dan dikumpulkan di histogram
+per proses. Endpoint /metrics menampilkan hasilnya dalam format teks
+Prometheus:
+- face_stage_duration_seconds (histogram, bucket tetap)
+- face_stage_duration_quantile_seconds (p50/p95/p99 dari sampel terakhir)
+
+Tahap yang berjalan di worker inference pool dikumpulkan di worker lalu
+digabung ke proses API (lihat InferencePool.run), jadi tetap terlihat di
+/metrics. Dengan beberapa worker uvicorn, tiap worker punya histogram
+sendiri.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+# Seconds; covers a sub-ms cache hit up to a cold CNN encoding
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_QUANTILES = (0.5, 0.95, 0.99)
+# Quantiles are computed over the most recent samples per stage
+QUANTILE_WINDOW = 1024
+
+
+class StageHistogram:
+    __slots__ = ("counts", "total", "count", "recent")
+
+    def __init__(self):
+        self.counts = [0] * len(STAGE_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=QUANTILE_WINDOW)
+
+    def observe(self, seconds: float):
+        for i, bound in enumerate(STAGE_BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def quantiles(self) -> List[Tuple[float, float]]:
+        samples = sorted(self.recent)
+        if not samples:
+            return []
+        return [(q, samples[min(len(samples) - 1, int(q * len(samples)))]) for q in STAGE_QUANTILES]
+
+
+class StageMetrics:
+    def __init__(self):
+        self._stages: Dict[str, StageHistogram] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, stage: str, seconds: float):
+        spans = getattr(self._local, "spans", None)
+        if spans is not None:
+            spans.append((stage, seconds))
+            return
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = StageHistogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str):
+        """Record the duration of the with-block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage: str):
+        """Decorator form of time()."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.time(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def capture(self):
+        """
+        Collect spans of the current thread into a list instead of the
+        histograms - used in inference workers to ship timings back to the
+        API process, which records them with observe().
+        """
+        previous: Optional[list] = getattr(self._local, "spans", None)
+        self._local.spans = spans = []
+        try:
+            yield spans
+        finally:
+            self._local.spans = previous
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            stages = [
+                (stage, list(h.counts), h.total, h.count, h.quantiles())
+                for stage, h in sorted(self._stages.items())
+            ]
+
+        lines = [
+            "# HELP face_stage_duration_seconds Duration of face recognition pipeline stages.",
+            "# TYPE face_stage_duration_seconds histogram",
+        ]
+        for stage, counts, total, count, _ in stages:
+            cumulative = 0
+            for bound, bucket in zip(STAGE_BUCKETS, counts):
+                cumulative += bucket
+                lines.append(f'face_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'face_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'face_stage_duration_seconds_sum{{stage="{stage}"}} {total:.6f}')
+            lines.append(f'face_stage_duration_seconds_count{{stage="{stage}"}} {count}')
+
+        lines += [
+            f"# HELP face_stage_duration_quantile_seconds Stage duration quantiles over the last {QUANTILE_WINDOW} samples.",
+            "# TYPE face_stage_duration_quantile_seconds gauge",
+        ]
+        for stage, _, _, _, quantiles in stages:
+            for q, value in quantiles:
+                lines.append(f'face_stage_duration_quantile_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+
+        return "\n".join(lines) + "\n"
+
+
+stage_metrics = StageMetrics()
@@ -0,0 +1,135 @@
+"""
+Work Calendar - snapshot kalender kerja + pengaturan per tanggal di memori.
+
+Setiap tap sebelumnya menjalankan query terpisah untuk hari kerja, hari
+libur, jadwal harian dan pengaturan. Service ini memuat sekaligus (3 query)
+snapshot untuk CALENDAR_PRELOAD_DAYS hari ke depan: flag hari kerja, status
+libur, jadwal efektif, threshold telat dan threshold kemiripan wajah.
+Sesudahnya satu tap hanya butuh query absensi pegawai itu sendiri.
+
+Snapshot di-invalidate oleh router settings/holiday/schedule; node lain
+diberi tahu lewat Redis pub/sub, dan TTL (CALENDAR_CACHE_TTL) menjadi
+batas basi jika Redis tidak tersedia (mis. beberapa worker uvicorn).
+"""
+import threading
+import uuid
+from datetime import date, time, timedelta
+from time import monotonic
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.cache import publish_message, subscribe_messages
+from app.config import get_settings
+from app.models.daily_schedule import DailyWorkSchedule
+from app.models.holiday import Holiday
+
+settings = get_settings()
+
+CALENDAR_EVENTS_CHANNEL = "calendar:events"
+CALENDAR_PRELOAD_DAYS = 7
+
+
+class DaySnapshot(NamedTuple):
+    """Keputusan kalender untuk satu tanggal + pengaturan yang dipakai saat absen."""
+    date: date
+    is_workday: bool
+    is_holiday: bool
+    schedule: Dict[str, time]  # check_in_start, check_in_end, check_out_start
+    late_threshold_minutes: int
+    face_similarity_threshold: float
+
+
+class WorkCalendar:
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._days: Dict[date, Tuple[float, DaySnapshot]] = {}
+        self._lock = threading.Lock()
+        # Bumped by invalidate() so a load racing with it is not stored
+        self._version = 0
+        self._node_id = uuid.uuid4().hex
+        self._listener: Optional[threading.Thread] = None
+        self._listener_stop = threading.Event()
+
+    def get_day(self, db: Session, day: Optional[date] = None) -> DaySnapshot:
+        """Snapshot for day (default today), loading the following days on a miss."""
+        day = day or date.today()
+        entry = self._days.get(day)
+        if entry is not None and monotonic() - entry[0] < self.ttl:
+            return entry[1]
+
+        version = self._version
+        snapshots = self._load(db, day, CALENDAR_PRELOAD_DAYS)
+        loaded_at = monotonic()
+        with self._lock:
+            if version == self._version:
+                # Drop past days, keep the rest
+                self._days = {d: e for d, e in self._days.items() if d >= date.today()}
+                for snapshot in snapshots:
+                    self._days[snapshot.date] = (loaded_at, snapshot)
+        return snapshots[0]
+
+    def get_range(self, db: Session, start: date, end: date) -> List[DaySnapshot]:
+        """Snapshots for start..end inclusive (e.g. a backfill), not cached."""
+        return self._load(db, start, (end - start).days + 1)
+
+    def _load(self, db: Session, start: date, days: int):
+        """Settings, all weekday schedules and the holidays in [start, start + days) - 3 queries."""
+        from app.services.attendance import attendance_service
+        work_settings = attendance_service.get_work_settings(db)
+        schedules = {s.day_of_week: s for s in db.query(DailyWorkSchedule).all()}
+        end = start + timedelta(days=days)
+        holidays = {
+            row[0] for row in db.query(Holiday.date).filter(
+                Holiday.date >= start,
+                Holiday.date < end,
+                Holiday.is_excluded == False
+            )
+        }
+
+        snapshots = []
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            daily = schedules.get(day.weekday())
+            # No schedule row: Mon-Fri with the global settings times
+            source = daily or work_settings
+            snapshots.append(DaySnapshot(
+                date=day,
+                is_workday=daily.is_workday if daily else day.weekday() < 5,
+                is_holiday=day in holidays,
+                schedule={
+                    "check_in_start": source.check_in_start,
+                    "check_in_end": source.check_in_end,
+                    "check_out_start": source.check_out_start,
+                },
+                late_threshold_minutes=work_settings.late_threshold_minutes,
+                face_similarity_threshold=work_settings.face_similarity_threshold,
+            ))
+        return snapshots
+
+    def invalidate(self, broadcast: bool = True):
+        """Drop all snapshots (settings, holiday or schedule changed)."""
+        with self._lock:
+            self._version += 1
+            self._days = {}
+        if broadcast:
+            publish_message(CALENDAR_EVENTS_CHANNEL, {"op": "invalidate", "node": self._node_id})
+
+    def start_change_listener(self) -> bool:
+        """Subscribe to invalidations from other nodes (background thread)."""
+        if self._listener is not None:
+            return False
+        self._listener_stop.clear()
+        self._listener = subscribe_messages(CALENDAR_EVENTS_CHANNEL, self._on_change_event, self._listener_stop)
+        return self._listener is not None
+
+    def stop_change_listener(self):
+        self._listener_stop.set()
+        self._listener = None
+
+    def _on_change_event(self, event: dict):
+        if event.get("node") != self._node_id and event.get("op") == "invalidate":
+            self.invalidate(broadcast=False)
+
+
+work_calendar = WorkCalendar(ttl=settings.CALENDAR_CACHE_TTL)
@@ -21,6 +21,17 @@ ALLOWED_IMAGE_MIMES = {
 }
 
 
+def has_image_magic(file_data: bytes, allowed_types: list[str]) -> bool:
+    """Check magic bytes only (for files that don't come as UploadFile, e.g. zip entries)."""
+    for mime_type in allowed_types:
+        if mime_type == "image/jpg":
+            mime_type = "image/jpeg"
+        for pattern in ALLOWED_IMAGE_MIMES.get(mime_type, []):
+            if file_data.startswith(pattern):
+                return True
+    return False
+
+
 async def validate_image_upload(
     file: UploadFile,
     max_size: int = MAX_IMAGE_SIZE,
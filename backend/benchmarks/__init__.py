@@ -0,0 +1 @@
+"""Benchmark scripts untuk pipeline face recognition (jalankan dari folder backend/)."""
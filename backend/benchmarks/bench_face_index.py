@@ -0,0 +1,91 @@
+"""
+Benchmark: IVF index vs brute-force _batch_compare.
+
+Membuat galeri sintetis (beberapa embedding per pegawai, mirip distribusi
+encoding dlib) lalu mengukur latency per query dan recall@1 terhadap
+exact search untuk beberapa nilai nprobe, plus memori resident
+(matrix float32 + struktur milik index).
+
+Usage (dari folder backend/):
+    python -m benchmarks.bench_face_index
+    python -m benchmarks.bench_face_index --sizes 10000 100000 --nprobe 4 8 16 32
+"""
+import argparse
+import time
+import numpy as np
+
+from app.services.face_index import ExactIndex, IVFIndex
+from app.services.face_recognition import FaceRecognitionService
+
+
+def make_gallery(size: int, faces_per_employee: int = 3, seed: int = 0):
+    """Synthetic 128-d gallery: per-employee centre + small per-photo noise."""
+    rng = np.random.default_rng(seed)
+    n_employees = max(1, size // faces_per_employee)
+    centres = rng.normal(0, 0.09, size=(n_employees, 128)).astype(np.float32)
+    employee_of_row = np.repeat(np.arange(n_employees), faces_per_employee)[:size]
+    noise = rng.normal(0, 0.02, size=(len(employee_of_row), 128)).astype(np.float32)
+    return centres, centres[employee_of_row] + noise
+
+
+def make_queries(centres: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """New photos of existing employees."""
+    rng = np.random.default_rng(seed)
+    picked = centres[rng.integers(0, len(centres), count)]
+    return (picked + rng.normal(0, 0.02, size=picked.shape)).astype(np.float32)
+
+
+def time_per_query(fn, queries: np.ndarray) -> float:
+    """Mean latency in milliseconds."""
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def resident(matrix: np.ndarray, index) -> str:
+    """Resident memory for a search: the float32 matrix plus what the index adds."""
+    total = matrix.nbytes + index.nbytes
+    return f"memory {total / 2**20:.1f} MiB (matrix {matrix.nbytes / 2**20:.1f} + index {index.nbytes / 2**20:.1f})"
+
+
+def run(sizes, nprobes, query_count: int):
+    service = FaceRecognitionService()
+
+    for size in sizes:
+        centres, matrix = make_gallery(size)
+        sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+        queries = make_queries(centres, query_count)
+
+        print(f"\n=== Gallery: {size} embeddings ===")
+
+        brute_ms = time_per_query(lambda q: np.argmin(service._batch_compare(q, matrix)), queries)
+        truth = np.array([np.argmin(service._batch_compare(q, matrix)) for q in queries])
+        print(f"{'_batch_compare':<22} {brute_ms:8.3f} ms/query  recall@1 1.000")
+
+        exact = ExactIndex()
+        exact.build(matrix, sq_norms)
+        exact_ms = time_per_query(lambda q: exact.search(q, k=1), queries)
+        print(f"{'ExactIndex':<22} {exact_ms:8.3f} ms/query  recall@1 1.000  {resident(matrix, exact)}")
+
+        ivf = IVFIndex(min_size=0)
+        start = time.perf_counter()
+        ivf.build(matrix, sq_norms)
+        build_s = time.perf_counter() - start
+        print(f"{'IVFIndex build':<22} {build_s:8.2f} s  (nlist={len(ivf._centroids)})  {resident(matrix, ivf)}")
+
+        for nprobe in nprobes:
+            ivf_ms = time_per_query(lambda q: ivf.search(q, k=1, nprobe=nprobe), queries)
+            found = np.array([ivf.search(q, k=1, nprobe=nprobe)[0][0] for q in queries])
+            recall = float(np.mean(found == truth))
+            label = f"IVFIndex nprobe={nprobe}"
+            print(f"{label:<22} {ivf_ms:8.3f} ms/query  recall@1 {recall:.3f}  speedup x{brute_ms / ivf_ms:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    run(args.sizes, args.nprobe, args.queries)
@@ -0,0 +1,235 @@
+"""
+Benchmark: pipeline face recognition dengan galeri sintetis.
+
+Untuk tiap ukuran galeri (default 1k, 10k, 100k, 1M embedding) dibuat
+database SQLite sementara berisi pegawai + FaceEmbedding sintetis, lalu
+diukur latency, throughput dan puncak alokasi memori (tracemalloc) dari:
+- refresh_embedding_cache  (load DB -> matrix, tanpa shared store)
+- match_embedding          (matching satu encoding ke cache)
+- find_matching_employee   (decode + deteksi + encoding + matching, butuh dlib)
+- _batch_compare           (scan brute-force lama, sebagai pembanding)
+- _load_image              (decode + resize frame JPEG sintetis)
+
+Hasil ditulis sebagai JSON (--output) supaya dua run bisa dibandingkan;
+--compare menampilkan rasio terhadap file hasil sebelumnya.
+
+Usage (dari folder backend/):
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --sizes 1000 10000 --output before.json
+    python -m benchmarks.bench_pipeline --sizes 1000 10000 --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.employee import Employee
+from app.models.face_embedding import FaceEmbedding
+from app.services import face_recognition as face_module
+from app.services.face_recognition import FaceRecognitionService
+from benchmarks.bench_decode import make_jpeg
+from benchmarks.bench_face_index import make_gallery, make_queries
+
+FACES_PER_EMPLOYEE = 3
+INSERT_CHUNK = 20000
+# Galleries this large are refreshed once per run (each refresh takes seconds)
+LARGE_GALLERY = 100000
+
+
+def quiet():
+    """The service logs every refresh/match - keep it out of the timings."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def measure(fn, repeat: int) -> dict:
+    """Latency stats in milliseconds plus throughput (calls per second)."""
+    samples = []
+    with quiet():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+    samples = np.array(samples)
+    return {
+        "repeat": repeat,
+        "mean_ms": round(float(samples.mean()), 4),
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p95_ms": round(float(np.percentile(samples, 95)), 4),
+        "ops_per_sec": round(1000 / float(samples.mean()), 2),
+    }
+
+
+def peak_mib(fn) -> float:
+    """Peak Python + NumPy allocation of one call (separate run, tracemalloc slows it)."""
+    with quiet():
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return round(peak / 2**20, 2)
+
+
+def create_gallery_db(path: str, matrix: np.ndarray):
+    """SQLite database with employees and their synthetic embeddings."""
+    engine = create_engine(f"sqlite:///{path}")
+    Employee.__table__.create(engine)
+    FaceEmbedding.__table__.create(engine)
+
+    n_employees = (len(matrix) + FACES_PER_EMPLOYEE - 1) // FACES_PER_EMPLOYEE
+    with engine.begin() as conn:
+        for start in range(0, n_employees, INSERT_CHUNK):
+            conn.execute(Employee.__table__.insert(), [
+                {"id": i + 1, "name": f"Pegawai {i + 1}", "position": "Staf", "is_active": True}
+                for i in range(start, min(n_employees, start + INSERT_CHUNK))
+            ])
+        for start in range(0, len(matrix), INSERT_CHUNK):
+            conn.execute(FaceEmbedding.__table__.insert(), [
+                {
+                    "employee_id": row // FACES_PER_EMPLOYEE + 1,
+                    "embedding": matrix[row].tobytes(),
+                    "photo_url": f"/uploads/faces/{row}.jpg",
+                    "is_primary": row % FACES_PER_EMPLOYEE == 0,
+                }
+                for row in range(start, min(len(matrix), start + INSERT_CHUNK))
+            ])
+    return engine
+
+
+def make_service() -> FaceRecognitionService:
+    """Per-process cache; matching works without dlib so force the service on."""
+    service = FaceRecognitionService()
+    service._store = None
+    service.enabled = True
+    return service
+
+
+def bench_gallery(size: int, queries: int, repeat: int) -> list:
+    centres, matrix = make_gallery(size, FACES_PER_EMPLOYEE)
+    query_vectors = make_queries(centres, queries)
+    results = []
+
+    def record(benchmark: str, stats: dict, **extra):
+        row = {"benchmark": benchmark, "size": size, **stats, **extra}
+        results.append(row)
+        print(f"{benchmark:<24} {size:>8} {row['mean_ms']:10.3f} {row['p95_ms']:10.3f} "
+              f"{row['ops_per_sec']:10.1f} {row.get('peak_mib', 0):10.1f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_gallery_db(os.path.join(directory, "gallery.db"), matrix)
+        session = sessionmaker(bind=engine)()
+        service = make_service()
+        try:
+            refresh = lambda: service.refresh_embedding_cache(session)
+            refresh_repeat = 1 if size >= LARGE_GALLERY else repeat
+            record("refresh_embedding_cache", measure(refresh, refresh_repeat),
+                   peak_mib=peak_mib(refresh), matrix_mib=round(matrix.nbytes / 2**20, 2))
+
+            query_iter = itertools.cycle(query_vectors)
+            match = lambda: service.match_embedding(next(query_iter), session, threshold=0.4)
+            record("match_embedding", measure(match, queries), peak_mib=peak_mib(match))
+
+            query_iter = itertools.cycle(query_vectors)
+            scan = lambda: service._batch_compare(next(query_iter), service._matrix)
+            compare_repeat = max(3, queries // 10) if size >= LARGE_GALLERY else queries
+            record("_batch_compare", measure(scan, compare_repeat), peak_mib=peak_mib(scan))
+
+            if face_module.FACE_RECOGNITION_AVAILABLE:
+                image = make_jpeg(1280, 720)
+                find = lambda: service.find_matching_employee(image, session, threshold=0.4)
+                record("find_matching_employee", measure(find, repeat), peak_mib=peak_mib(find),
+                       note="synthetic frame without a face: decode + detection + cache")
+            else:
+                results.append({"benchmark": "find_matching_employee", "size": size,
+                                "skipped": "face_recognition not installed"})
+        finally:
+            session.close()
+            engine.dispose()
+    return results
+
+
+def bench_load_image(resolutions, repeat: int) -> list:
+    service = make_service()
+    results = []
+    for width, height in resolutions:
+        data = make_jpeg(width, height)
+        load = lambda: service._load_image(data)
+        row = {"benchmark": "_load_image", "size": f"{width}x{height}", **measure(load, repeat),
+               "peak_mib": peak_mib(load)}
+        results.append(row)
+        print(f"{'_load_image':<24} {row['size']:>8} {row['mean_ms']:10.3f} {row['p95_ms']:10.3f} "
+              f"{row['ops_per_sec']:10.1f} {row['peak_mib']:10.1f}")
+    return results
+
+
+def compare(results: list, baseline_path: str):
+    """Print mean latency change against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = {(r["benchmark"], str(r["size"])): r for r in json.load(f)["results"] if "mean_ms" in r}
+
+    print(f"\n{'benchmark':<24} {'size':>8} {'before ms':>10} {'after ms':>10} {'change':>8}")
+    for row in results:
+        before = baseline.get((row["benchmark"], str(row["size"])))
+        if before is None or "mean_ms" not in row:
+            continue
+        change = row["mean_ms"] / before["mean_ms"]
+        print(f"{row['benchmark']:<24} {row['size']:>8} {before['mean_ms']:10.3f} {row['mean_ms']:10.3f} {change:7.2f}x")
+
+
+def run(sizes, resolutions, queries: int, repeat: int, output: str, baseline: str = None):
+    print(f"{'benchmark':<24} {'size':>8} {'mean ms':>10} {'p95 ms':>10} {'ops/s':>10} {'peak MiB':>10}")
+    results = []
+    for size in sizes:
+        results += bench_gallery(size, queries, repeat)
+    results += bench_load_image(resolutions, repeat)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "face_recognition": face_module.FACE_RECOGNITION_AVAILABLE,
+            "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if baseline:
+        compare(results, baseline)
+
+
+def parse_resolution(value: str):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    parser.add_argument("--resolutions", type=parse_resolution, nargs="+",
+                        default=[(640, 480), (1280, 720), (1920, 1080)])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default=os.path.join(
+        "benchmarks", "results", f"pipeline-{datetime.now():%Y%m%d-%H%M%S}.json"))
+    parser.add_argument("--compare", dest="baseline", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+    run(args.sizes, args.resolutions, args.queries, args.repeat, args.output, args.baseline)
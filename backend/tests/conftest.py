@@ -0,0 +1,35 @@
+"""Shared test setup: throwaway SQLite database, no Redis, per-process face cache."""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read once at import time - configure before importing app
+_tmp_dir = tempfile.mkdtemp(prefix="absen_desa_test_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("CACHE_ENABLED", "false")
+os.environ.setdefault("FACE_SHARED_CACHE", "false")
+os.environ.setdefault("ATTENDANCE_WRITE_BEHIND", "false")
+os.environ.setdefault("ATTENDANCE_BUFFER_DB", os.path.join(_tmp_dir, "attendance_buffer.db"))
+os.environ.setdefault("ABSENT_SCHEDULER_ENABLED", "false")
+
+import pytest
+
+
+@pytest.fixture
+def db():
+    from app.database import Base, SessionLocal, engine
+    from app.services.work_calendar import work_calendar
+    import app.models  # noqa: F401 - register tables
+
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+        # Calendar snapshots would outlive the dropped schedule rows
+        work_calendar.invalidate(broadcast=False)
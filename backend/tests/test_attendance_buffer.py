@@ -0,0 +1,86 @@
+"""Write-behind attendance queue (SQLite) flushed to the database."""
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.attendance import AttendanceLog, AttendanceStatus
+from app.models.employee import Employee
+from app.services.attendance_buffer import (
+    MAX_FLUSH_ATTEMPTS, MODE_CHECK_IN, MODE_CHECK_OUT, AttendanceBuffer
+)
+
+
+@pytest.fixture
+def buffer(tmp_path):
+    buffer = AttendanceBuffer(str(tmp_path / "buffer.db"), enabled=True)
+    buffer._ensure_schema()
+    return buffer
+
+
+@pytest.fixture
+def employee(db):
+    employee = Employee(name="Sari", position="Staf", nik="3202")
+    db.add(employee)
+    db.commit()
+    return employee
+
+
+def queue_row(buffer, employee_id, mode):
+    with buffer._connect() as conn:
+        return dict(conn.execute(
+            "SELECT * FROM attendance_buffer WHERE employee_id = ? AND mode = ?", (employee_id, mode)
+        ).fetchone())
+
+
+def test_check_out_without_check_in_is_given_up(db, buffer, employee):
+    now = datetime.now().replace(microsecond=0)
+    buffer._enqueue(employee.id, now.date(), MODE_CHECK_OUT, now, AttendanceStatus.HADIR, None)
+
+    for _ in range(MAX_FLUSH_ATTEMPTS - 1):
+        buffer.flush()
+    row = queue_row(buffer, employee.id, MODE_CHECK_OUT)
+    assert row["flushed_at"] is None
+    assert row["attempts"] == MAX_FLUSH_ATTEMPTS - 1
+
+    buffer.flush()
+    row = queue_row(buffer, employee.id, MODE_CHECK_OUT)
+    assert row["flushed_at"] is not None
+    assert "No check-in" in row["error"]
+    assert buffer._claim() == []
+
+
+def test_check_out_waiting_for_queued_check_in_is_not_an_attempt(db, buffer, employee):
+    now = datetime.now().replace(microsecond=0)
+    buffer._enqueue(employee.id, now.date(), MODE_CHECK_IN, now - timedelta(hours=8), AttendanceStatus.HADIR, 0.9)
+    buffer._enqueue(employee.id, now.date(), MODE_CHECK_OUT, now, AttendanceStatus.HADIR, None)
+    # The check-in is being flushed by another worker
+    with buffer._connect() as conn:
+        conn.execute("UPDATE attendance_buffer SET claimed_at = ? WHERE mode = ?", (time.time(), MODE_CHECK_IN))
+
+    buffer.flush()
+    assert queue_row(buffer, employee.id, MODE_CHECK_OUT)["attempts"] == 0
+
+    with buffer._connect() as conn:
+        conn.execute("UPDATE attendance_buffer SET claimed_at = NULL")
+    assert buffer.flush() == 2
+    log = db.query(AttendanceLog).filter_by(employee_id=employee.id).one()
+    assert log.check_out_at == now
+
+
+def test_queue_file_without_attempts_column_is_upgraded(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE attendance_buffer (seq INTEGER PRIMARY KEY AUTOINCREMENT, employee_id INTEGER NOT NULL, "
+        "date TEXT NOT NULL, mode TEXT NOT NULL, at TEXT NOT NULL, status TEXT NOT NULL, confidence REAL, "
+        "claimed_at REAL, flushed_at REAL, error TEXT, UNIQUE (employee_id, date, mode))"
+    )
+    conn.close()
+
+    AttendanceBuffer(str(path), enabled=True)._ensure_schema()
+
+    conn = sqlite3.connect(path)
+    assert "attempts" in {row[1] for row in conn.execute("PRAGMA table_info(attendance_buffer)")}
+    conn.close()
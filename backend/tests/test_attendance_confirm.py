@@ -0,0 +1,78 @@
+"""POST /attendance/confirm with a signed recognition ticket."""
+from datetime import datetime, time, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.attendance import AttendanceLog, AttendanceStatus
+from app.models.daily_schedule import DEFAULT_SCHEDULES, DailyWorkSchedule
+from app.models.employee import Employee
+from app.routers.attendance import _build_recognize_response, confirm_attendance
+from app.services.attendance_ticket import issue_ticket
+from app.services.face_recognition import EmployeeSnapshot, face_recognition_service
+
+
+@pytest.fixture
+def employee(db):
+    employee = Employee(name="Budi", position="Staf", nik="3201")
+    db.add(employee)
+    db.commit()
+    return employee
+
+
+def check_in_ticket(employee, late_in=timedelta(hours=1)):
+    return issue_ticket(
+        EmployeeSnapshot.from_employee(employee),
+        "CHECK_IN",
+        datetime.now() + late_in,
+        None,
+        0.92
+    )
+
+
+def test_active_employee_confirms_with_empty_face_cache(db, employee):
+    # Face recognition disabled / cache never loaded
+    assert len(face_recognition_service._employee_ids) == 0
+
+    response = confirm_attendance(check_in_ticket(employee), db)
+
+    assert response.attendance.status == AttendanceStatus.HADIR
+    assert db.query(AttendanceLog).filter_by(employee_id=employee.id).count() == 1
+
+
+def test_deactivated_employee_ticket_is_rejected(db, employee):
+    ticket = check_in_ticket(employee)
+    employee.is_active = False
+    db.commit()
+
+    with pytest.raises(HTTPException) as exc:
+        confirm_attendance(ticket, db)
+
+    assert exc.value.status_code == 400
+    assert db.query(AttendanceLog).count() == 0
+
+
+def test_recognize_then_confirm_round_trip(db, employee):
+    # Check-in open all day so the test does not depend on the clock
+    for schedule in DEFAULT_SCHEDULES:
+        db.add(DailyWorkSchedule(**{
+            **schedule,
+            "is_workday": True,
+            "check_in_start": time(0, 0),
+            "check_in_end": time(23, 59, 58),
+            "check_out_start": time(23, 59, 59),
+        }))
+    db.commit()
+
+    recognized = _build_recognize_response(db, EmployeeSnapshot.from_employee(employee), 0.87)
+    assert recognized.attendance_status == "belum_absen"
+
+    confirmed = confirm_attendance(recognized.ticket, db)
+    replayed = confirm_attendance(recognized.ticket, db)
+
+    assert confirmed.message == "Selamat datang, Budi"
+    assert confirmed.confidence == 87.0
+    assert replayed.attendance.check_in_at == confirmed.attendance.check_in_at
+    [log] = db.query(AttendanceLog).filter_by(employee_id=employee.id).all()
+    assert log.confidence_score == pytest.approx(0.87)
+    assert _build_recognize_response(db, EmployeeSnapshot.from_employee(employee), 0.87).attendance_status == "sudah_check_in"
@@ -0,0 +1,87 @@
+"""Check-in/check-out upserts and ALFA marking in AttendanceService."""
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from app.models.attendance import AttendanceLog, AttendanceStatus
+from app.models.employee import Employee
+from app.services.attendance import attendance_service
+
+MONDAY = date(2026, 10, 19)  # no schedule rows: Mon-Fri are workdays
+MORNING = datetime.combine(MONDAY, time(7, 30))
+LATE_AT = datetime.combine(MONDAY, time(8, 15))
+
+
+@pytest.fixture
+def employees(db):
+    employees = [Employee(name=f"Pegawai {i}", position="Staf", nik=f"32{i}") for i in range(3)]
+    db.add_all(employees)
+    db.commit()
+    return employees
+
+
+def logs(db, employee_id):
+    return db.query(AttendanceLog).filter_by(employee_id=employee_id).all()
+
+
+def test_double_check_in_keeps_the_first(db, employees):
+    employee = employees[0]
+
+    first, greeting = attendance_service.write_attendance(db, employee, "CHECK_IN", MORNING, LATE_AT, None, 0.9)
+    second, message = attendance_service.write_attendance(
+        db, employee, "CHECK_IN", MORNING + timedelta(hours=1), LATE_AT, None, 0.8
+    )
+
+    assert greeting == f"Selamat datang, {employee.name}"
+    assert message == "Sudah absen masuk pukul 07:30"
+    [log] = logs(db, employee.id)
+    assert (log.check_in_at, log.status, log.confidence_score) == (MORNING, AttendanceStatus.HADIR, 0.9)
+
+
+def test_check_in_fills_an_alfa_row(db, employees):
+    employee = employees[0]
+    db.add(AttendanceLog(employee_id=employee.id, date=MONDAY, status=AttendanceStatus.ALFA))
+    db.commit()
+
+    attendance_service.record_check_in(db, employee.id, MONDAY, LATE_AT + timedelta(minutes=5), AttendanceStatus.TERLAMBAT, 0.9)
+
+    [log] = logs(db, employee.id)
+    assert log.status == AttendanceStatus.TERLAMBAT
+    assert log.check_in_at == LATE_AT + timedelta(minutes=5)
+
+
+def test_double_check_out_keeps_the_first(db, employees):
+    employee = employees[0]
+    attendance_service.record_check_in(db, employee.id, MONDAY, MORNING, AttendanceStatus.HADIR, 0.9)
+    evening = datetime.combine(MONDAY, time(16, 5))
+
+    attendance_service.record_check_out(db, employee.id, MONDAY, evening)
+    attendance = attendance_service.record_check_out(db, employee.id, MONDAY, evening + timedelta(minutes=30))
+
+    assert attendance.check_out_at == evening
+
+
+def test_check_out_without_check_in_writes_nothing(db, employees):
+    assert attendance_service.record_check_out(db, employees[0].id, MONDAY, MORNING) is None
+    assert logs(db, employees[0].id) == []
+
+
+def test_mark_absent_only_adds_missing_employees(db, employees):
+    present, absent, inactive = employees
+    inactive.is_active = False
+    db.commit()
+    attendance_service.record_check_in(db, present.id, MONDAY, MORNING, AttendanceStatus.HADIR, 0.9)
+
+    assert attendance_service.mark_absent_employees(db, MONDAY) == 1
+    assert attendance_service.mark_absent_employees(db, MONDAY) == 0
+
+    assert [log.status for log in logs(db, present.id)] == [AttendanceStatus.HADIR]
+    assert [log.status for log in logs(db, absent.id)] == [AttendanceStatus.ALFA]
+    assert logs(db, inactive.id) == []
+
+
+def test_backfill_skips_weekends(db, employees):
+    marked = attendance_service.backfill_absent(db, MONDAY - timedelta(days=2), MONDAY)
+
+    assert marked == {MONDAY: 3}
+    assert db.query(AttendanceLog).filter_by(date=MONDAY - timedelta(days=1)).count() == 0
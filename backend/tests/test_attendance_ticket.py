@@ -0,0 +1,42 @@
+"""Signed recognition tickets passed from /attendance/recognize to /attendance/confirm."""
+from datetime import date, datetime
+
+import pytest
+
+from app.utils.auth import create_access_token
+from app.services.attendance_ticket import InvalidTicket, issue_ticket, verify_ticket
+from app.services.face_recognition import EmployeeSnapshot
+
+EMPLOYEE = EmployeeSnapshot(7, "Budi", "Kaur Umum", "uploads/faces/7.jpg")
+LATE_AT = datetime.combine(date.today(), datetime.min.time()).replace(hour=8, minute=15)
+
+
+def test_round_trip_keeps_recognition_decisions():
+    check_in_at = LATE_AT.replace(hour=7, minute=42)
+
+    ticket = verify_ticket(issue_ticket(EMPLOYEE, "CHECK_OUT", LATE_AT, check_in_at, 0.912345))
+
+    assert ticket.employee == EMPLOYEE
+    assert ticket.mode == "CHECK_OUT"
+    assert ticket.date == date.today()
+    assert ticket.late_at == LATE_AT
+    assert ticket.check_in_at == check_in_at
+    assert ticket.confidence == 0.9123
+
+
+def test_tampered_ticket_is_rejected():
+    token = issue_ticket(EMPLOYEE, "CHECK_IN", LATE_AT, None, 0.9)
+    header, claims, signature = token.split(".")
+
+    with pytest.raises(InvalidTicket):
+        verify_ticket(f"{header}.{claims}.{signature[::-1]}")
+
+
+def test_expired_ticket_is_rejected():
+    with pytest.raises(InvalidTicket):
+        verify_ticket(issue_ticket(EMPLOYEE, "CHECK_IN", LATE_AT, None, 0.9, ttl=-5))
+
+
+def test_access_token_is_not_a_ticket():
+    with pytest.raises(InvalidTicket):
+        verify_ticket(create_access_token({"sub": "admin"}))
@@ -0,0 +1,95 @@
+"""Embedding cache load from the database."""
+import numpy as np
+import pytest
+
+from app.models.employee import Employee
+from app.models.face_embedding import FaceEmbedding
+from app.services.face_recognition import EMBEDDING_DIM, FaceRecognitionService
+from app.services.face_store import SHARED_STORE_AVAILABLE, create_store
+
+
+@pytest.fixture
+def service():
+    service = FaceRecognitionService()
+    service.enabled = True  # dlib is not needed to load and match embeddings
+    return service
+
+
+def add_employee(db, name, embeddings, is_active=True):
+    employee = Employee(name=name, position="Staf", nik=name, is_active=is_active)
+    db.add(employee)
+    db.commit()
+    for embedding in embeddings:
+        db.add(FaceEmbedding(
+            employee_id=employee.id,
+            embedding=embedding.astype(np.float32).tobytes(),
+            photo_url="uploads/faces/x.jpg",
+            is_primary=False
+        ))
+    db.commit()
+    return employee
+
+
+def test_empty_gallery_marks_cache_loaded(db, service):
+    assert service.readiness()["cache_loaded"] is False
+
+    assert service.refresh_embedding_cache(db) == 0
+
+    readiness = service.readiness()
+    assert readiness["cache_loaded"] is True
+    assert readiness["embeddings"] == 0
+    assert service._matrix.shape == (0, EMBEDDING_DIM)
+
+
+@pytest.mark.skipif(not SHARED_STORE_AVAILABLE, reason="shared store not supported on this platform")
+def test_empty_gallery_publishes_to_shared_store(db, service, tmp_path):
+    service._store = create_store(True, str(tmp_path), "sqlite://")
+
+    assert service.refresh_embedding_cache(db) == 0
+    assert service.readiness()["cache_loaded"] is True
+
+
+def test_load_copies_active_embeddings_in_employee_order(db, service):
+    rng = np.random.default_rng(0)
+    first = rng.normal(size=(2, EMBEDDING_DIM))
+    second = rng.normal(size=(1, EMBEDDING_DIM))
+    inactive = add_employee(db, "B", rng.normal(size=(1, EMBEDDING_DIM)), is_active=False)
+    employee_a = add_employee(db, "A", first)
+    employee_c = add_employee(db, "C", second)
+
+    assert service.refresh_embedding_cache(db) == 3
+
+    np.testing.assert_array_equal(service._matrix, np.vstack([first, second]).astype(np.float32))
+    assert service._employee_ids.tolist() == [employee_a.id, employee_a.id, employee_c.id]
+    assert inactive.id not in service._employees
+    assert service._employees[employee_c.id].name == "C"
+
+
+def test_db_lookup_swaps_employee_dict_instead_of_mutating_it(db, service):
+    employee = add_employee(db, "A", np.zeros((0, EMBEDDING_DIM)))
+    in_flight = service._employees
+
+    match = service._resolve_match(employee.id, 0.9, 0.5, in_flight, db)
+
+    assert match.name == "A"
+    assert in_flight == {}
+    assert service._employees[employee.id] == match
+
+
+def test_delta_ops_patch_the_loaded_matrix(db, service):
+    rng = np.random.default_rng(1)
+    employee_a = add_employee(db, "A", rng.normal(size=(1, EMBEDDING_DIM)))
+    employee_b = add_employee(db, "B", rng.normal(size=(1, EMBEDDING_DIM)))
+    service.refresh_embedding_cache(db)
+
+    new_face = rng.normal(size=EMBEDDING_DIM).astype(np.float32)
+    service.add_embedding(99, employee_a.id, new_face.tobytes(), employee_a, broadcast=False)
+    assert service._employee_ids.tolist() == [employee_a.id, employee_a.id, employee_b.id]
+    np.testing.assert_array_equal(service._matrix[1], new_face)
+
+    service.remove_embedding(99, broadcast=False)
+    assert 99 not in service._face_ids.tolist()
+
+    service.deactivate_employee(employee_b.id, broadcast=False)
+    assert service._employee_ids.tolist() == [employee_a.id]
+    assert employee_b.id not in service._employees
@@ -0,0 +1,34 @@
+"""Nearest-neighbour indexes over the embedding matrix."""
+import numpy as np
+
+from app.services.face_index import ExactIndex, IVFIndex, create_index
+
+
+def gallery(rows=2000, seed=0):
+    matrix = np.random.default_rng(seed).normal(0, 0.09, size=(rows, 128)).astype(np.float32)
+    return matrix, np.einsum('ij,ij->i', matrix, matrix)
+
+
+def test_ivf_matches_exact_when_probing_every_partition():
+    matrix, sq_norms = gallery()
+    exact, ivf = ExactIndex(), IVFIndex(nlist=16, min_size=0)
+    exact.build(matrix, sq_norms)
+    ivf.build(matrix, sq_norms)
+
+    for query in matrix[:20] + 0.01:
+        assert ivf.search(query, k=1, nprobe=16)[0][0] == exact.search(query, k=1)[0][0]
+
+
+def test_nbytes_counts_only_memory_held_by_the_index():
+    matrix, sq_norms = gallery()
+    exact, ivf = ExactIndex(), IVFIndex(nlist=16, min_size=0)
+    exact.build(matrix, sq_norms)
+    ivf.build(matrix, sq_norms)
+
+    assert exact.nbytes == 0
+    # Centroids and partition lists, far below the 1 MiB float32 matrix
+    assert 0 < ivf.nbytes < matrix.nbytes / 4
+
+
+def test_unknown_index_falls_back_to_exact():
+    assert isinstance(create_index("int8"), ExactIndex)
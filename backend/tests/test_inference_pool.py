@@ -0,0 +1,42 @@
+"""Inference pool restart after a worker process dies."""
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+
+from app.services import inference_pool as inference_pool_module
+from app.services.inference_pool import InferencePool, InferencePoolSaturated
+
+
+class FakeExecutor:
+    def __init__(self, *args, **kwargs):
+        self.shutdowns = 0
+
+    def submit(self, *args):
+        pass
+
+    def shutdown(self, **kwargs):
+        self.shutdowns += 1
+
+
+def test_concurrent_broken_pool_is_replaced_once(monkeypatch):
+    monkeypatch.setattr(inference_pool_module, "ProcessPoolExecutor", FakeExecutor)
+    pool = InferencePool(workers=2, max_queue=8)
+    pool.start()
+    broken = pool._executor
+
+    async def run_in_executor(executor, *args):
+        await asyncio.sleep(0.01)  # every request is in flight when the pool dies
+        if executor is broken:
+            raise BrokenProcessPool()
+        return None, []
+
+    async def run_all():
+        monkeypatch.setattr(asyncio.get_running_loop(), "run_in_executor", run_in_executor)
+        return await asyncio.gather(*[pool.run(len, b"x") for _ in range(5)], return_exceptions=True)
+
+    results = asyncio.run(run_all())
+
+    assert all(isinstance(result, InferencePoolSaturated) for result in results)
+    assert broken.shutdowns == 1
+    assert pool._executor is not broken
+    assert pool._executor.shutdowns == 0
+    assert pool.pending == 0
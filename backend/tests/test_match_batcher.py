@@ -0,0 +1,42 @@
+"""Micro-batching of concurrent recognize matches."""
+import asyncio
+import threading
+
+import numpy as np
+
+from app.services.match_batcher import MatchBatcher
+
+
+def test_lone_request_does_not_wait_for_the_window():
+    batches = []
+    batcher = MatchBatcher(lambda encodings, thresholds: batches.append(len(encodings)) or thresholds, window_ms=10000)
+
+    async def run():
+        return await asyncio.wait_for(batcher.match(np.zeros(128), 0.5), timeout=2)
+
+    assert asyncio.run(run()) == 0.5
+    assert batches == [1]
+
+
+def test_requests_arriving_during_a_match_are_batched_together():
+    batches = []
+    release = threading.Event()
+
+    def match_fn(encodings, thresholds):
+        if not batches:
+            release.wait(2)  # first match still running while the others arrive
+        batches.append(len(encodings))
+        return thresholds
+
+    batcher = MatchBatcher(match_fn, window_ms=10000)
+
+    async def run():
+        first = asyncio.ensure_future(batcher.match(np.zeros(128), 0.1))
+        await asyncio.sleep(0.05)
+        rest = [asyncio.ensure_future(batcher.match(np.zeros(128), t)) for t in (0.2, 0.3, 0.4)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.wait_for(asyncio.gather(first, *rest), timeout=2)
+
+    assert asyncio.run(run()) == [0.1, 0.2, 0.3, 0.4]
+    assert batches == [1, 3]
@@ -0,0 +1,116 @@
+"""Migration 005: merge duplicate attendance rows before the unique constraint."""
+import importlib.util
+from pathlib import Path
+
+import pytest
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+MIGRATION = Path(__file__).resolve().parents[1] / "alembic" / "versions" / "005_unique_attendance_per_day.py"
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location("migration_005", MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'attendance.db'}")
+    with engine.begin() as conn:
+        # attendance_logs as of b1d189d65649 (no unique constraint yet)
+        conn.execute(sa.text(
+            "CREATE TABLE attendance_logs ("
+            "id INTEGER PRIMARY KEY, employee_id INTEGER NOT NULL, date DATE NOT NULL, "
+            "check_in_at DATETIME, check_out_at DATETIME, status VARCHAR(9) NOT NULL, "
+            "confidence_score FLOAT)"
+        ))
+    yield engine
+    engine.dispose()
+
+
+def insert(conn, *rows):
+    conn.execute(
+        sa.text(
+            "INSERT INTO attendance_logs (id, employee_id, date, check_in_at, check_out_at, status, confidence_score) "
+            "VALUES (:id, :employee_id, :date, :check_in_at, :check_out_at, :status, :confidence_score)"
+        ),
+        [
+            dict(zip(("id", "employee_id", "date", "check_in_at", "check_out_at", "status", "confidence_score"), row))
+            for row in rows
+        ]
+    )
+
+
+def upgrade(engine):
+    with engine.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            load_migration().upgrade()
+
+
+def rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(sa.text(
+            "SELECT id, employee_id, date, check_in_at, check_out_at, status, confidence_score "
+            "FROM attendance_logs ORDER BY id"
+        )).fetchall()
+
+
+def test_alfa_merged_with_hadir_takes_hadir_status(engine):
+    with engine.begin() as conn:
+        insert(
+            conn,
+            (1, 7, "2026-10-16", None, None, "ALFA", None),
+            (2, 7, "2026-10-16", "2026-10-16 07:30:00", "2026-10-16 16:00:00", "HADIR", 0.91),
+        )
+
+    upgrade(engine)
+
+    assert rows(engine) == [
+        (1, 7, "2026-10-16", "2026-10-16 07:30:00", "2026-10-16 16:00:00", "HADIR", 0.91),
+    ]
+
+
+def test_status_follows_earliest_check_in(engine):
+    with engine.begin() as conn:
+        insert(
+            conn,
+            (1, 7, "2026-10-16", "2026-10-16 08:40:00", None, "TERLAMBAT", 0.8),
+            (2, 7, "2026-10-16", "2026-10-16 07:50:00", None, "HADIR", 0.95),
+            (3, 7, "2026-10-16", None, "2026-10-16 16:05:00", "ALFA", None),
+        )
+
+    upgrade(engine)
+
+    assert rows(engine) == [
+        (1, 7, "2026-10-16", "2026-10-16 07:50:00", "2026-10-16 16:05:00", "HADIR", 0.95),
+    ]
+
+
+def test_duplicates_without_check_in_keep_oldest_row_status(engine):
+    with engine.begin() as conn:
+        insert(
+            conn,
+            (1, 7, "2026-10-16", None, None, "ALFA", None),
+            (2, 7, "2026-10-16", None, None, "IZIN", None),
+            (3, 8, "2026-10-16", "2026-10-16 07:10:00", None, "HADIR", 0.9),
+        )
+
+    upgrade(engine)
+
+    assert rows(engine) == [
+        (1, 7, "2026-10-16", None, None, "ALFA", None),
+        (3, 8, "2026-10-16", "2026-10-16 07:10:00", None, "HADIR", 0.9),
+    ]
+
+
+def test_unique_constraint_added(engine):
+    upgrade(engine)
+
+    with engine.begin() as conn:
+        insert(conn, (1, 7, "2026-10-16", None, None, "ALFA", None))
+        with pytest.raises(sa.exc.IntegrityError):
+            insert(conn, (2, 7, "2026-10-16", None, None, "HADIR", None))
@@ -9,6 +9,7 @@ import {
   detectFaces,
   updateStabilityTracker,
   drawFaceOverlay,
+  normalizeBoundingBox,
   isWebAssemblySupported,
   type FaceStability,
   type BoundingBox
@@ -16,7 +17,7 @@ import {
 import type { FaceDetector } from '@mediapipe/tasks-vision';
 
 interface CameraViewProps {
-  onCapture: (employee: Employee, confidence: number, attendanceStatus?: 'belum_absen' | 'sudah_check_in' | 'sudah_lengkap') => void;
+  onCapture: (employee: Employee, confidence: number, ticket: string, attendanceStatus?: 'belum_absen' | 'sudah_check_in' | 'sudah_lengkap') => void;
   isPaused?: boolean;
 }
 
@@ -25,6 +26,8 @@ const AUTO_CAPTURE_DELAY = 1000;  // Reduced from 2500ms to 1 second
 const FACE_DETECTION_INTERVAL = 33;  // ~30 FPS, reduced from 500ms
 const MIN_FACE_CONFIDENCE = 0.5;
 const STABILITY_FRAMES_REQUIRED = 5;
+const BURST_FRAME_COUNT = 3;  // Frames sent to /recognize/burst
+const BURST_FRAME_INTERVAL = 120;  // ms between burst frames
 
 export function CameraView({ onCapture, isPaused = false }: CameraViewProps) {
   const videoRef = useRef<HTMLVideoElement>(null);
@@ -175,6 +178,18 @@ export function CameraView({ onCapture, isPaused = false }: CameraViewProps) {
     }
   }, []);
 
+  const captureBurst = useCallback(async (): Promise<string[]> => {
+    const frames: string[] = [];
+    for (let i = 0; i < BURST_FRAME_COUNT; i++) {
+      if (i > 0) {
+        await new Promise((resolve) => setTimeout(resolve, BURST_FRAME_INTERVAL));
+      }
+      const frame = captureImageAsBase64();
+      if (frame) frames.push(frame);
+    }
+    return frames;
+  }, [captureImageAsBase64]);
+
   const triggerAutoCapture = useCallback(async () => {
     if (scanning) return;
     
@@ -182,13 +197,22 @@ export function CameraView({ onCapture, isPaused = false }: CameraViewProps) {
     setCountdown(null);
 
     try {
-      const imageBase64 = captureImageAsBase64();
+      // Several frames per tap: backend aggregates them so one blurry frame doesn't decide
+      const frames = await captureBurst();
       
-      if (!imageBase64) {
+      if (frames.length === 0) {
         throw new Error('Gagal menangkap gambar');
       }
 
-      const result = await api.attendance.recognize(undefined, imageBase64);
+      // Stable box from MediaPipe: backend only verifies/encodes a crop around it
+      const video = videoRef.current;
+      const faceBox = faceStability.lastPosition && video?.videoWidth
+        ? normalizeBoundingBox(faceStability.lastPosition, video.videoWidth, video.videoHeight)
+        : undefined;
+
+      const result = frames.length === BURST_FRAME_COUNT
+        ? await api.attendance.recognizeBurst(frames, faceBox)
+        : await api.attendance.recognize(undefined, frames[0], faceBox);
 
       // Convert backend response to frontend Employee format
       const recognizedEmployee: Employee = {
@@ -202,7 +226,7 @@ export function CameraView({ onCapture, isPaused = false }: CameraViewProps) {
 
       // Don't show success toast yet - waiting for user confirmation
       // Use confidence from backend (already in percentage)
-      onCapture(recognizedEmployee, result.confidence / 100, result.attendance_status);
+      onCapture(recognizedEmployee, result.confidence / 100, result.ticket ?? '', result.attendance_status);
     } catch (error) {
       console.error('Face recognition error:', error);
       
@@ -216,7 +240,7 @@ export function CameraView({ onCapture, isPaused = false }: CameraViewProps) {
       setScanning(false);
       faceDetectedTimeRef.current = null;
     }
-  }, [scanning, onCapture, captureImageAsBase64]);
+  }, [scanning, onCapture, captureBurst, faceStability.lastPosition]);
 
   // Reset state when paused
   useEffect(() => {
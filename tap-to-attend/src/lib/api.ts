@@ -1,4 +1,5 @@
 import axios, { AxiosInstance, AxiosError } from 'axios';
+import type { BoundingBox } from './faceDetection';
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
 
@@ -84,7 +85,7 @@ export interface BackendRecognizeResponse {
     photo: string | null;
   };
   attendance: {
-    id: number;
+    id: number | null;  // null from confirm in write-behind mode (not flushed yet)
     status: string;
     check_in_at: string | null;
     check_out_at: string | null;
@@ -92,6 +93,7 @@ export interface BackendRecognizeResponse {
   message: string;
   confidence: number;
   attendance_status?: 'belum_absen' | 'sudah_check_in' | 'sudah_lengkap';
+  ticket?: string;  // Signed recognition ticket, passed to confirm
 }
 
 // Backend employee list response
@@ -245,10 +247,13 @@ export interface BackendFaceEmbedding {
   created_at: string;
 }
 
-export interface BackendFaceUploadResponse {
-  id: number;
+export interface BackendFaceJobResponse {
+  job_id: string;
+  employee_id: number;
+  status: 'pending' | 'running' | 'done' | 'failed';
+  face_id: number | null;
   photo_url: string;
-  message: string;
+  message: string | null;
 }
 
 // Public settings types
@@ -267,6 +272,10 @@ export interface PublicSettingsResponse {
   today_schedule: PublicTodaySchedule | null;
 }
 
+// Face box hint as "x,y,width,height" (normalized 0-1)
+const formatFaceBox = (box: BoundingBox): string =>
+  [box.x, box.y, box.width, box.height].map((value) => value.toFixed(4)).join(',');
+
 export const api = {
   auth: {
     login: async (credentials: LoginRequest): Promise<LoginResponse> => {
@@ -333,11 +342,12 @@ export const api = {
         return response.data;
       },
 
-      upload: async (employeeId: number, file: File): Promise<BackendFaceUploadResponse> => {
+      // Returns immediately with a job; encoding runs in the background
+      upload: async (employeeId: number, file: File): Promise<BackendFaceJobResponse> => {
         const formData = new FormData();
         formData.append('file', file);
 
-        const response = await apiClient.post<BackendFaceUploadResponse>(
+        const response = await apiClient.post<BackendFaceJobResponse>(
           `/api/v1/employees/${employeeId}/face`,
           formData,
           { headers: { 'Content-Type': 'multipart/form-data' } }
@@ -345,6 +355,23 @@ export const api = {
         return response.data;
       },
 
+      job: async (employeeId: number, jobId: string): Promise<BackendFaceJobResponse> => {
+        const response = await apiClient.get<BackendFaceJobResponse>(
+          `/api/v1/employees/${employeeId}/face/jobs/${jobId}`
+        );
+        return response.data;
+      },
+
+      // Upload and poll the job until encoding finishes
+      uploadAndWait: async (employeeId: number, file: File, intervalMs = 1000): Promise<BackendFaceJobResponse> => {
+        let job = await api.employees.face.upload(employeeId, file);
+        while (job.status === 'pending' || job.status === 'running') {
+          await new Promise((resolve) => setTimeout(resolve, intervalMs));
+          job = await api.employees.face.job(employeeId, job.job_id);
+        }
+        return job;
+      },
+
       delete: async (employeeId: number, faceId: number): Promise<void> => {
         await apiClient.delete(`/api/v1/employees/${employeeId}/face/${faceId}`);
       },
@@ -359,7 +386,9 @@ export const api = {
   },
 
   attendance: {
-    recognize: async (imageFile?: File, imageBase64?: string): Promise<BackendRecognizeResponse> => {
+    // faceBox: optional normalized (0-1) face box from the kiosk detector,
+    // lets the backend skip full-frame detection
+    recognize: async (imageFile?: File, imageBase64?: string, faceBox?: BoundingBox): Promise<BackendRecognizeResponse> => {
       const formData = new FormData();
 
       if (imageFile) {
@@ -369,6 +398,9 @@ export const api = {
       } else {
         throw new Error('Either imageFile or imageBase64 must be provided');
       }
+      if (faceBox) {
+        formData.append('face_box', formatFaceBox(faceBox));
+      }
 
       const response = await apiClient.post<BackendRecognizeResponse>(
         '/api/v1/attendance/recognize',
@@ -378,10 +410,24 @@ export const api = {
       return response.data;
     },
 
-    confirm: async (employeeId: number, confidence: number): Promise<BackendRecognizeResponse> => {
+    recognizeBurst: async (imagesBase64: string[], faceBox?: BoundingBox): Promise<BackendRecognizeResponse> => {
+      const formData = new FormData();
+      imagesBase64.forEach((image) => formData.append('images_base64', image));
+      if (faceBox) {
+        formData.append('face_box', formatFaceBox(faceBox));
+      }
+
+      const response = await apiClient.post<BackendRecognizeResponse>(
+        '/api/v1/attendance/recognize/burst',
+        formData,
+        { headers: { 'Content-Type': 'multipart/form-data' } }
+      );
+      return response.data;
+    },
+
+    confirm: async (ticket: string): Promise<BackendRecognizeResponse> => {
       const formData = new FormData();
-      formData.append('employee_id', employeeId.toString());
-      formData.append('confidence', confidence.toString());
+      formData.append('ticket', ticket);
 
       const response = await apiClient.post<BackendRecognizeResponse>(
         '/api/v1/attendance/confirm',
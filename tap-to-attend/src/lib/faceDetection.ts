@@ -101,6 +101,23 @@ export function detectionToBoundingBox(detection: Detection): BoundingBox {
   };
 }
 
+/**
+ * Normalize a pixel bounding box to 0-1 relative to the frame size
+ * (sent to the backend as a face detection hint)
+ */
+export function normalizeBoundingBox(
+  box: BoundingBox,
+  frameWidth: number,
+  frameHeight: number
+): BoundingBox {
+  return {
+    x: box.x / frameWidth,
+    y: box.y / frameHeight,
+    width: box.width / frameWidth,
+    height: box.height / frameHeight,
+  };
+}
+
 /**
  * Calculate position delta between two bounding boxes
  * Returns normalized value (0-1) relative to frame size
@@ -18,6 +18,7 @@ const Absen = () => {
   const [capturedEmployee, setCapturedEmployee] = useState<{
     employee: Employee;
     confidence: number;
+    ticket: string;
     attendanceStatus?: 'belum_absen' | 'sudah_check_in' | 'sudah_lengkap';
   } | null>(null);
 
@@ -52,18 +53,15 @@ const Absen = () => {
     return now > lateTime;
   };
 
-  const handleCapture = (employee: Employee, confidence: number, attendanceStatus?: 'belum_absen' | 'sudah_check_in' | 'sudah_lengkap') => {
-    setCapturedEmployee({ employee, confidence, attendanceStatus });
+  const handleCapture = (employee: Employee, confidence: number, ticket: string, attendanceStatus?: 'belum_absen' | 'sudah_check_in' | 'sudah_lengkap') => {
+    setCapturedEmployee({ employee, confidence, ticket, attendanceStatus });
   };
 
   const handleConfirmAttendance = async () => {
     if (!capturedEmployee) return;
 
     try {
-      const result = await api.attendance.confirm(
-        parseInt(capturedEmployee.employee.id),
-        capturedEmployee.confidence * 100
-      );
+      const result = await api.attendance.confirm(capturedEmployee.ticket);
 
       toast.success(result.message, {
         description: result.attendance?.status === 'terlambat' ? 'Terlambat' : 'Tepat waktu',
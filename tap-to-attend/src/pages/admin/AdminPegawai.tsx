@@ -243,8 +243,12 @@ export function AdminPegawai() {
 
       try {
         setIsUploadingFace(true);
-        const result = await api.employees.face.upload(selectedEmployee.id, file);
-        toast.success(result.message);
+        const result = await api.employees.face.uploadAndWait(selectedEmployee.id, file);
+        if (result.status === 'done') {
+          toast.success(result.message || 'Foto wajah berhasil disimpan');
+        } else {
+          toast.error(result.message || 'Gagal menyimpan foto wajah');
+        }
         fetchFacePhotos(selectedEmployee.id);
       } catch (error) {
         console.error('Failed to upload face:', error);
@@ -272,8 +276,12 @@ export function AdminPegawai() {
 
     try {
       setIsUploadingFace(true);
-      const result = await api.employees.face.upload(selectedEmployee.id, file);
-      toast.success(result.message);
+      const result = await api.employees.face.uploadAndWait(selectedEmployee.id, file);
+      if (result.status === 'done') {
+        toast.success(result.message || 'Foto wajah berhasil disimpan');
+      } else {
+        toast.error(result.message || 'Gagal mengupload foto wajah');
+      }
       fetchFacePhotos(selectedEmployee.id);
     } catch (error) {
       console.error('Failed to upload face:', error);